@@ -0,0 +1,282 @@
+from lib import *
+import decisionMaker
+import simulator
+import profiler
+import json
+import math
+import tracemalloc
+
+# 盤面を出力せずに意思決定だけを繰り返して，探索の速さとメモリを測るベンチマーク
+# seedを固定した7種1巡のゲームと，決まった盤面の集合(BENCHMARK_BOARDS)を使うので，同じ設定なら毎回同じ盤面で測れる
+# 結果は1つのJSONにまとめて出力し，commitやBEAM_WIDTHなどの設定の間で比較できるようにする
+
+# ゲームの数と1ゲームで置くミノの数（途中で積みあがって置けなくなったらそこで終わる）
+# ゲームごとのseedはBENCHMARK_SEED + ゲームの番号にする
+BENCHMARK_GAME_COUNT = 2
+BENCHMARK_PIECE_COUNT = 50
+BENCHMARK_SEED = 0
+
+# 測定に使う盤面
+# (盤面の下の方の行(上から順に，ブロックがある所を'#'), 現在のミノ, ネクスト, ホールド)
+BENCHMARK_BOARDS = [
+    # 空の盤面
+    (
+        [],
+        MINO.T, [MINO.I, MINO.O, MINO.S, MINO.Z, MINO.L], MINO.NONE
+    ),
+    # 平らで右端に4段の穴
+    (
+        [
+            "#########.",
+            "#########.",
+            "#########.",
+            "#########.",
+        ],
+        MINO.L, [MINO.I, MINO.J, MINO.T, MINO.O, MINO.S], MINO.NONE
+    ),
+    # Tスピンダブルの形
+    (
+        [
+            "###.......",
+            "##...#####",
+            "###.######",
+            "#########.",
+        ],
+        MINO.O, [MINO.T, MINO.S, MINO.L, MINO.Z, MINO.J], MINO.I
+    ),
+    # 屋根の下に空白がある盤面
+    (
+        [
+            "......###.",
+            "###.......",
+            "####...##.",
+            "####.####.",
+            "#########.",
+        ],
+        MINO.J, [MINO.Z, MINO.T, MINO.I, MINO.S, MINO.O], MINO.L
+    ),
+    # でこぼこな中くらいの高さの盤面
+    (
+        [
+            "..#.......",
+            ".##....#..",
+            "###.#..##.",
+            "####.####.",
+            "#.######.#",
+            "##.#######",
+        ],
+        MINO.S, [MINO.T, MINO.J, MINO.O, MINO.I, MINO.Z], MINO.T
+    ),
+    # 下に穴がたくさんある盤面
+    (
+        [
+            "##.#####.#",
+            "#.#######.",
+            ".#####.###",
+            "####.#####",
+            "#.########",
+            "######.###",
+        ],
+        MINO.I, [MINO.L, MINO.O, MINO.T, MINO.Z, MINO.S], MINO.NONE
+    ),
+    # 積みあがった盤面
+    (
+        [
+            "...##.....",
+            "..###.....",
+            "..####..#.",
+            ".#####.##.",
+            "########..",
+            "#####.###.",
+            "#########.",
+            "##.######.",
+            "#########.",
+            "####.####.",
+            "#########.",
+            "###.######",
+            "#########.",
+            "######.###",
+        ],
+        MINO.Z, [MINO.I, MINO.T, MINO.J, MINO.L, MINO.O], MINO.S
+    ),
+]
+
+# BENCHMARK_BOARDSの1つからBoardを作る
+def MakeBenchmarkBoard (rows:List[str], currentMino:MinoInt, followingMinos:List[MinoInt], holdMino:MinoInt) -> Board:
+    mainBoard = [0 for _ in range(BOARD_HEIGHT - len(rows))] + [int(row.replace("#", "1").replace(".", "0"), 2) for row in rows]
+
+    # 各列において，上から順に見ていって，一番最初にブロックがある部分のrowIdxを格納する
+    topRowIdx = [BOARD_HEIGHT for _ in range(BOARD_WIDTH)]
+    for rowIdx in range(BOARD_HEIGHT-1, -1, -1):
+        for colIdx in range(BOARD_WIDTH):
+            if mainBoard[rowIdx] & (0b1000000000 >> colIdx) > 0:
+                topRowIdx[colIdx] = rowIdx
+    return Board(
+        mainBoard,
+        DirectedMino(
+            currentMino,
+            FIRST_MINO_DIRECTION,
+            FIRST_MINO_POS
+        ),
+        list(followingMinos),
+        holdMino,
+        True,
+        topRowIdx
+    )
+
+# 探索の設定を測定を始める時の状態に戻し，キャッシュなどを空にする
+# Holdした後に深くなる設定(firstHold)も元に戻す
+def ResetSearch (searchLimit:int, beamWidth:List[int]):
+    decisionMaker.SEARCH_LIMIT = searchLimit
+    decisionMaker.BEAM_WIDTH = list(beamWidth)
+    decisionMaker.firstHold = True
+    decisionMaker.ClearPlacementCache()
+    decisionMaker.ClearRetainedTree()
+
+# boardで1回意思決定を行い，続けて実行する経路のリストを返す
+# useDecideがTrueのときはDecideで1手だけ決める
+def DecideBenchmark (board:Board, useDecide:bool) -> List[PathInt]:
+    profiler.StartDecision()
+    if useDecide:
+        _, _, path = decisionMaker.Decide(board)
+        multiPath = [path]
+    else:
+        multiPath = decisionMaker.MultiDecide(board)
+    profiler.FinishDecision()
+    return multiPath
+
+# boardで1回意思決定を行い，(かかった時間(s), 展開で生成した状態の数)を返す
+def TimeDecision (board:Board, useDecide:bool) -> Tuple[float, int]:
+    stateCount = decisionMaker.expandedStateCount
+    decideTimer = Timer()
+    DecideBenchmark(board, useDecide)
+    return decideTimer.Stop(), decisionMaker.expandedStateCount - stateCount
+
+# seedのゲームを盤面を出力せずにpieceCount個置くまで進めて，意思決定ごとの(時間(s), 状態の数)のリストと，ゲームの結果を返す
+def RunBenchmarkGame (seed:int, pieceCount:int, useDecide:bool) -> Tuple[List[Tuple[float, int]], Dict]:
+    stateCounts = []
+    def DecideAndCount (board:Board) -> List[PathInt]:
+        stateCount = decisionMaker.expandedStateCount
+        multiPath = DecideBenchmark(board, useDecide)
+        stateCounts.append(decisionMaker.expandedStateCount - stateCount)
+        return multiPath
+
+    simulator.SeedMinoGenerator(seed)
+    summary = simulator.PlayHeadlessGame(DecideAndCount, pieceCount)
+    return list(zip(summary["decideTimes"], stateCounts)), summary
+
+# 小さい方から割合q(0~1)の位置にある値（nearest-rank法）
+def Percentile (sortedValues:List[float], q:float) -> float:
+    return sortedValues[max(0, math.ceil(q * len(sortedValues)) - 1)]
+
+# 意思決定ごとの(時間(s), 状態の数)のリストをまとめる
+# 探索を並列に行うときは，他のプロセスで生成した状態を数えられないので状態の数はNoneにする
+def SummarizeDecisions (decisions:List[Tuple[float, int]]) -> Dict[str, Union[float, int, None]]:
+    latencies = sorted(elapsedTime for elapsedTime, _ in decisions)
+    totalTime = sum(latencies)
+    stateCount = None if decisionMaker.searchPool is not None else sum(count for _, count in decisions)
+    if not latencies:
+        return {"decisions": 0, "seconds": 0}
+    return {
+        "decisions": len(latencies),
+        "seconds": totalTime,
+        "decisionsPerSecond": len(latencies) / totalTime if totalTime > 0 else None,
+        "nodes": stateCount,
+        "nodesPerSecond": stateCount / totalTime if stateCount is not None and totalTime > 0 else None,
+        "latencyMean": totalTime / len(latencies),
+        "latencyP50": Percentile(latencies, 0.50),
+        "latencyP95": Percentile(latencies, 0.95),
+        "latencyP99": Percentile(latencies, 0.99),
+        "latencyMax": latencies[-1],
+    }
+
+# BENCHMARK_BOARDSのそれぞれで1回ずつ意思決定を行い，tracemallocでメモリを測る
+# 時間の測定とは別に行う（tracemallocを動かしている間は遅くなるため）
+# ピークのバイト数と，意思決定の後も残っているメモリブロックの数（置き場所のキャッシュなど）を返す
+def MeasureBoardsMemory (searchLimit:int, beamWidth:List[int], useDecide:bool) -> Dict[str, Union[float, int]]:
+    peakBytes = []
+    retainedBlocks = []
+    tracemalloc.start()
+    try:
+        for boardSetting in BENCHMARK_BOARDS:
+            ResetSearch(searchLimit, beamWidth)
+            board = MakeBenchmarkBoard(*boardSetting)
+            startBlocks = len(tracemalloc.take_snapshot().traces)
+            startMemory, _ = tracemalloc.get_traced_memory()
+            tracemalloc.reset_peak()
+            TimeDecision(board, useDecide)
+            _, peakMemory = tracemalloc.get_traced_memory()
+            peakBytes.append(peakMemory - startMemory)
+            retainedBlocks.append(len(tracemalloc.take_snapshot().traces) - startBlocks)
+    finally:
+        tracemalloc.stop()
+
+    ResetSearch(searchLimit, beamWidth)
+    stateMemory = decisionMaker.MeasureStateMemory(MakeBenchmarkBoard(*BENCHMARK_BOARDS[0]))
+    return {
+        "peakBytesMax": max(peakBytes),
+        "peakBytesMean": sum(peakBytes) / len(peakBytes),
+        "retainedBlocksMean": sum(retainedBlocks) / len(retainedBlocks),
+        "bytesPerNode": stateMemory["bytesPerNode"],
+    }
+
+# ベンチマークを行い，結果の辞書を返す
+# 探索の設定(quickSearch, globalBeamなど)はdecisionMakerに設定されているものを使い，SEARCH_LIMITとBEAM_WIDTHは測定ごとにbeamWidthから決める
+def RunBenchmark (
+    beamWidth:List[int],
+    gameCount:int=BENCHMARK_GAME_COUNT,
+    pieceCount:int=BENCHMARK_PIECE_COUNT,
+    seed:int=BENCHMARK_SEED,
+    useDecide:bool=False,
+    measureMemory:bool=True
+) -> Dict:
+    searchLimit = len(beamWidth) + 1
+    decisionMaker.ClearMoveGenStats()
+    try:
+        # seedを固定したゲーム
+        gameDecisions = []
+        gameSummaries = []
+        for gameIdx in range(gameCount):
+            ResetSearch(searchLimit, beamWidth)
+            decisions, summary = RunBenchmarkGame(seed + gameIdx, pieceCount, useDecide)
+            gameDecisions += decisions
+            gameSummaries.append(summary)
+
+        # 決まった盤面（キャッシュは盤面ごとに空にする）
+        boardDecisions = []
+        for boardSetting in BENCHMARK_BOARDS:
+            ResetSearch(searchLimit, beamWidth)
+            boardDecisions.append(TimeDecision(MakeBenchmarkBoard(*boardSetting), useDecide))
+        moveGenStats = decisionMaker.GetMoveGenStats()
+
+        memory = MeasureBoardsMemory(searchLimit, beamWidth, useDecide) if measureMemory else None
+    finally:
+        ResetSearch(searchLimit, beamWidth)
+
+    return {
+        "config": dict(
+            decisionMaker.DescribeSearchConfig(),
+            useDecide=useDecide,
+            seed=seed,
+            games=gameCount,
+            piecesPerGame=pieceCount
+        ),
+        "games": dict(
+            SummarizeDecisions(gameDecisions),
+            pieces=sum(summary["pieces"] for summary in gameSummaries),
+            toppedOut=sum(1 for summary in gameSummaries if summary["toppedOut"])
+        ),
+        "boards": SummarizeDecisions(boardDecisions),
+        "total": SummarizeDecisions(gameDecisions + boardDecisions),
+        "memory": memory,
+        "moveGen": moveGenStats,
+    }
+
+# ベンチマークを行い，結果を1行のJSONとして出力する（outputPathを与えた時はそのファイルの最後に追記する）
+def PrintBenchmark (beamWidth:List[int], outputPath:Union[str, None]=None, **kwargs):
+    line = json.dumps(RunBenchmark(beamWidth, **kwargs))
+    if outputPath is None:
+        print(line, flush=True)
+    else:
+        with open(outputPath, "a") as f:
+            f.write(line + "\n")
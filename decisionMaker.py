@@ -1,38 +1,121 @@
 from lib import *
 import evaluator
 from functools import total_ordering
+from concurrent.futures import wait
+from collections import OrderedDict
 import heapq
+import tracemalloc
 
 # 回転するミノを考えるかどうか
 quickSearch = False
 
+# 幅優先探索で到達できる置き場所をすべて列挙するかどうか
+completeSearch = False
+
+# 深さ(初手を1とする)ごとの置き場所の求め方(MOVEGEN)
+# リストより深いところでは最後のものを使い，空のときは全ての深さでquickSearchとcompleteSearchに従う
+moveGenPolicies = []
+
+# 置き場所の求め方ごとに，置き場所を求めた回数，調べたミノの状態の数，見つけた置き場所の数を数える
+moveGenStats = [[0, 0, 0] for _ in MOVEGEN_NAMES]
+
 #時間が立たないともらえない報酬は割引する。
 EVAL_TAU = 0.9
 
+# 1つの深さで同じ状態をまとめるための置換表の大きさ
+TRANSPOSITION_TABLE_SIZE = 4096
+
+# 1つの深さの盤面の評価をnumpyでまとめて行うかどうか
+batchEval = False
+
+# 置き場所の計算結果をLRUで保持するキャッシュの上限
+# 保持する(盤面, ミノ)の数と，保持する置き場所の総数のどちらかを超えたら古いものから捨てる（0のときはキャッシュしない）
+PLACEMENT_CACHE_SIZE = 8192
+PLACEMENT_CACHE_MOVE_COUNT = 400000
+
+# 初手ごとに探索せず，全ての初手を1つのbeamで探索するかどうか
+globalBeam = False
+# 1つのbeamで探索するときのbeamの幅はBEAM_WIDTHのGLOBAL_BEAM_SCALE倍にする
+# SEARCH_LIMIT 4, BEAM_WIDTH [3,3,3]でランダムな盤面75個を探索し，初手ごとの探索と一番よい評価値を比べると
+#   10倍: 状態の数は27%，評価値が悪くなった盤面は19個，よくなった盤面は13個
+#   30倍: 状態の数は69%，評価値が悪くなった盤面は6個，よくなった盤面は21個
+# だったので30倍にしている（60倍にしても悪くなる盤面は残るので，初手ごとの探索より悪くなることはある）
+GLOBAL_BEAM_SCALE = 30
+
 # Beam Search用のclass
+# 探索では大量に作られるので，__slots__で属性を固定してメモリを減らす
+# 初手からの経路のリストは持たず，parentをたどってGetAccumPathで組み立てる
 @total_ordering
 class State():
+    __slots__ = (
+        "board", "mino", "path", "tau", "parent",
+        "boardHash", "transpositionKey", "accumPathValue", "isDuplicate",
+        "features", "joinedMainBoard", "eval", "score", "backToBack", "ren"
+    )
+
     #　評価値の計算だけ行う
-    def __init__(self, board:Board, mino:DirectedMino, path:List[MoveInt], accumPathValue:int, accumScore:int, accumPath:List[List[MoveInt]], tau=EVAL_TAU):
+    # parentは展開元の状態（初手のときはNone）
+    # boardHashはboard.mainBoardのハッシュ（Noneのときは計算する）
+    # transpositionTableに同じ状態でaccumPathValueがよいものがすでにある場合は，盤面の評価を省略してisDuplicateをTrueにする
+    # featuresはboardの評価用の特徴量（Noneのときは計算する）
+    # evalBoardがFalseのときは盤面の評価を省略し，後でまとめて評価した値をSetBoardEvalで受け取る
+    def __init__(self, board:Board, mino:DirectedMino, path:PathInt, accumPathValue:int, accumScore:int, parent=None, tau=EVAL_TAU, boardHash=None, transpositionTable=None, features=None, evalBoard=True):
         self.board = board
         self.mino = mino 
         self.path = path
-        self.accumPath = accumPath + [path]
         self.tau = tau
+        self.parent = parent
+        self.features = None
+        self.joinedMainBoard = None
+        if boardHash is None:
+            boardHash = HashMainBoard(board.mainBoard)
+        if features is None and evalBoard:
+            features = evaluator.CalcBoardFeatures(board.mainBoard, 0, board.topRowIdx)
         
         # ライン消去
         JoinDirectedMinoToBoardUncopy(mino, board.mainBoard, board.topRowIdx)
         clearedRowCount = ClearLinesCalc(board.mainBoard)
+
+        # 遷移後の盤面のハッシュ
+        # ラインが消えない時はミノが占領する行だけ更新する
+        if clearedRowCount == 0:
+            self.boardHash = HashJoinedMainBoard(boardHash, board.mainBoard, mino)
+        else:
+            self.boardHash = HashClearedMainBoard(board.mainBoard)
         
-        # 評価値の計算
-        isTspin = evaluator.IsTSpin(board.mainBoard, mino, path)
-        isTspinmini = isTspin and evaluator.IsTSpinMini(board.mainBoard, mino, path)
-        self.accumPathValue = accumPathValue + self.tau * evaluator.EvalPath(path, clearedRowCount, board.mainBoard, mino, board.backToBack, board.ren)
-        self.eval = self.accumPathValue + self.tau * evaluator.EvalMainBoard(board.mainBoard, clearedRowCount, board.topRowIdx)
+        # 置換表のキー
+        # (盤面, holdしているミノ, ネクストを何個消費したか)が同じであれば同じ状態とみなす
+        consumedMinoCount = board.followingMinos.count(MINO.NONE) + 1
+        if GetFirstMove(path) is MOVE.HOLD:
+            holdMino = board.currentMino.mino
+            if board.holdMino is MINO.NONE:
+                consumedMinoCount += 1
+        else:
+            holdMino = board.holdMino
+        self.transpositionKey = HashSearchState(self.boardHash, holdMino, consumedMinoCount)
         
-        # スコアの計算
-        self.score, self.backToBack, self.ren = evaluator.Score(isTspin, isTspinmini, clearedRowCount, board.backToBack, board.ren)
-        self.score += accumScore
+        # 評価値の計算
+        # Tスピンの種類は置き場所を求めたときにminoに記録してある
+        self.accumPathValue = accumPathValue + self.tau * evaluator.EvalPath(path, clearedRowCount, mino.spin, board.backToBack, board.ren)
+
+        self.isDuplicate = False
+        if transpositionTable is not None:
+            sameState = transpositionTable.get(self.transpositionKey)
+            if sameState is not None and sameState.accumPathValue >= self.accumPathValue:
+                self.isDuplicate = True
+
+        if not self.isDuplicate:
+            if evalBoard:
+                # 評価用の特徴量はミノが占領する列だけ更新する
+                self.features = evaluator.UpdateBoardFeatures(features, board.mainBoard, clearedRowCount, board.topRowIdx, mino)
+                self.eval = self.accumPathValue + self.tau * evaluator.EvalBoardFeatures(self.features, clearedRowCount)
+            else:
+                # まとめて評価するために，ミノを埋め込んだ盤面を取っておく
+                self.joinedMainBoard = list(board.mainBoard)
+            
+            # スコアの計算
+            self.score, self.backToBack, self.ren = evaluator.Score(mino.spin, clearedRowCount, board.backToBack, board.ren)
+            self.score += accumScore
 
         # Boardを元に戻す
         DeleteDirectedMinoFromBoardUncopy(mino, board.mainBoard, board.topRowIdx)
@@ -42,15 +125,24 @@ class State():
 
     def __lt__(self, other):
         return self.eval < other.eval
+
+    # まとめて評価した盤面の評価値を受け取る
+    def SetBoardEval(self, boardEval:int):
+        self.eval = self.accumPathValue + self.tau * boardEval
+        self.joinedMainBoard = None
     
     # 実際に遷移する
     def Transit(self):
         # ライン消去
         joinedBoard, joinedTopRowIdx = JoinDirectedMinoToBoard(self.mino, self.board.mainBoard, self.board.topRowIdx)
-        newMainBoard, newTopRowIdx, _ = ClearLines(joinedBoard, joinedTopRowIdx)
+        newMainBoard, newTopRowIdx, clearedRowCount = ClearLines(joinedBoard, joinedTopRowIdx)
+
+        # ラインが消えた時は特徴量を計算し直す
+        if clearedRowCount > 0 and self.features is not None:
+            self.features = evaluator.CalcBoardFeatures(newMainBoard, 0, newTopRowIdx)
 
         # ミノを置いた後の盤面の生成
-        if self.path[0] is MOVE.HOLD:
+        if GetFirstMove(self.path) is MOVE.HOLD:
             self.board = BoardAfterHold(self.board)
     
         clearedBoard = Board(
@@ -72,13 +164,24 @@ class State():
         self.board = clearedBoard
 
     #　ありうる次の盤面をすべて生成する。
-    def NextStates(self):
-        possibleMoves = GetNextMoves(self.board)
-        nextStates = [State(self.board, nextMino, nextPath, self.accumPathValue, self.board.score, self.accumPath, self.tau * EVAL_TAU) for nextMino, nextPath in possibleMoves]
-        return nextStates
+    # evalBoardがFalseのときは盤面の評価を省略する（EvalStatesBatchでまとめて評価する）
+    # policyは置き場所の求め方（Noneのときは初手と同じ求め方にする）
+    def NextStates(self, transpositionTable=None, evalBoard=True, policy=None):
+        possibleMoves = GetNextMoves(self.board, self.boardHash, policy)
+        features = self.features
+        if features is None and evalBoard:
+            features = evaluator.CalcBoardFeatures(self.board.mainBoard, 0, self.board.topRowIdx)
+        return [State(self.board, nextMino, nextPath, self.accumPathValue, self.board.score, self, self.tau * EVAL_TAU, self.boardHash, transpositionTable, features, evalBoard) for nextMino, nextPath in possibleMoves]
+
+# 盤面の評価を省略した状態の盤面をnumpyでまとめて評価する
+def EvalStatesBatch(states:List[State]):
+    boardEvals = evaluator.EvalMainBoardBatch([state.joinedMainBoard for state in states])
+    for state, boardEval in zip(states, boardEvals):
+        state.SetBoardEval(boardEval)
 
 # minoを今の位置からdirectionを変えずに左右に動かして得られるminoのリストを返す
-def GetSideMovedMinos (board:Board, mino:DirectedMino) -> List[Tuple[DirectedMino, List[MoveInt]]]:
+# 経路はprefixPathの後に左右移動を続けたものにする
+def GetSideMovedMinos (board:Board, mino:DirectedMino, prefixPath:PathInt=EMPTY_PATH) -> List[Tuple[DirectedMino, PathInt]]:
     sideMovedMinos = []
 
     # 左に動かしていく
@@ -88,14 +191,8 @@ def GetSideMovedMinos (board:Board, mino:DirectedMino) -> List[Tuple[DirectedMin
     while True:
         x -= 1
         count += 1
-        newMino = DirectedMino(
-            mino.mino,
-            mino.direction,
-            (x,y)
-        )
-        occupiedPositions = GetOccupiedPositions(newMino)
-        if isValidPlace(board.mainBoard, occupiedPositions):
-            sideMovedMinos.append((newMino, [MOVE.LEFT for _ in range(count)]))
+        if IsValidPosition(board.mainBoard, mino.mino, mino.direction, x, y):
+            sideMovedMinos.append((DirectedMino(mino.mino, mino.direction, (x,y)), AppendMoves(prefixPath, MOVE.LEFT, count)))
         else:
             break
     
@@ -105,85 +202,70 @@ def GetSideMovedMinos (board:Board, mino:DirectedMino) -> List[Tuple[DirectedMin
     while True:
         x += 1
         count += 1
-        newMino = DirectedMino(
-            mino.mino,
-            mino.direction,
-            (x,y)
-        )
-        occupiedPositions = GetOccupiedPositions(newMino)
-        if isValidPlace(board.mainBoard, occupiedPositions):
-            sideMovedMinos.append((newMino, [MOVE.RIGHT for _ in range(count)]))
+        if IsValidPosition(board.mainBoard, mino.mino, mino.direction, x, y):
+            sideMovedMinos.append((DirectedMino(mino.mino, mino.direction, (x,y)), AppendMoves(prefixPath, MOVE.RIGHT, count)))
         else:
             break
     
     return sideMovedMinos
 
 # minoを今の位置で1回だけ回転を試みた場合に得られるminoのリストに，回転を全く試みない場合を足して返す
-def GetRotatedMinos (board:Board, mino:DirectedMino) -> List[Tuple[DirectedMino, List[MoveInt]]]:
+def GetRotatedMinos (board:Board, mino:DirectedMino) -> List[Tuple[DirectedMino, PathInt]]:
     rotatedMinos = []
 
     # 回転なし
-    rotatedMinos.append((mino, []))
+    rotatedMinos.append((mino, EMPTY_PATH))
 
     # 左回転
     directedMino = Rotate(mino, MOVE.L_ROT, board.mainBoard)
     if directedMino is not None:
-        rotatedMinos.append((directedMino, [MOVE.L_ROT]))
+        rotatedMinos.append((directedMino, MakePath(MOVE.L_ROT)))
     
     # 右回転
     directedMino = Rotate(mino, MOVE.R_ROT, board.mainBoard)
     if directedMino is not None:
-        rotatedMinos.append((directedMino, [MOVE.R_ROT]))
+        rotatedMinos.append((directedMino, MakePath(MOVE.R_ROT)))
     
     return rotatedMinos
 
-def AddToReachableNodes (encodedNode, path:List[MoveInt], reachableNodes:Dict[int, List[MoveInt]]) -> None:
+def AddToReachableNodes (encodedNode, path:PathInt, reachableNodes:Dict[int, PathInt]) -> None:
     if encodedNode not in reachableNodes: # まだreachableNodesに登録されていないものは，登録する
         reachableNodes[encodedNode] = path
     else:
         # すでに登録されていた場合，pathが今までのものより短ければ登録する
         oldPath = reachableNodes[encodedNode]
-        if len(path) < len(oldPath):
+        if GetPathLength(path) < GetPathLength(oldPath):
             reachableNodes[encodedNode] = path
 
-# MOVE.DROPを使うことにより，pathの簡易化を行う
-def SimplifyPath (path:List[MoveInt]) -> List[MoveInt]:
-    # 最後には必ずMOVE.DROPをつける
-    # 最後にMOVE.DROPをつけるので，最後の連続するMOVE.DOWNは消去できる
-    count = 0
-    while count < len(path):
-        if path[-(count + 1)] is MOVE.DOWN:
-            count += 1
-        else:
-            break
-    simplifiedPath = path[:len(path) - count] + [MOVE.DROP]
-    return simplifiedPath
-
-# MOVE.DROPを使うことにより，pathの簡易化を行う
-# 引数自体を変更する
-def SimplifyPathUncopy (path:List[MoveInt]):
-    # 最後には必ずMOVE.DROPをつける
-    # 最後にMOVE.DROPをつけるので，最後の連続するMOVE.DOWNは消去できる
-    while path:
-        if path[-1] is MOVE.DOWN:
-            path.pop()
-        else:
-            break
-    path.append(MOVE.DROP)
-        
+# 置き場所のTミノに，Tスピンの種類と経路の最後の回転で使ったkickの番号を記録する
+# 探索中に盤面ごとに判定し直さずに，記録した値を評価やスコアの計算に使う
+def SetSpinOfPlacement (mainBoard:List[int], placedMino:DirectedMino, path:PathInt, kickIdx:Union[int, None]):
+    if placedMino.mino is not MINO.T:
+        return
+    placedMino.spin = evaluator.GetSpin(mainBoard, placedMino, path, kickIdx)
+    placedMino.kickIdx = kickIdx
+
 # boardとそこに置きたいminoを入力して，
-# (ミノがおける場所，そこにたどり着く方法)
+# (ミノがおける場所，そこにたどり着く方法(PathInt))
 # という形式のタプルの配列を返す
+# policyはMOVEGEN.COMPLETE以外の置き場所の求め方
 def GetPossibleMoves(
     board:Board,
     directedMino:DirectedMino,
-) -> List[Tuple[DirectedMino, List[MoveInt]]]:
+    policy:MoveGenInt=MOVEGEN.FULL,
+) -> List[Tuple[DirectedMino, PathInt]]:
 
     # 到達できるミノをエンコードしたものと，到達するための経路を結ぶ辞書
     reachableNodes = {
-        EncodeDirectedMino(directedMino) : []
+        EncodeDirectedMino(directedMino) : EMPTY_PATH
     }
 
+    # 同じ状態からの回転の結果を使い回すためのメモ
+    rotationMemo = {}
+
+    # 回転で到達したミノをエンコードしたものと，その回転で使ったkickの番号を結ぶ辞書（Tスピンの判定に使う）
+    reachableKicks = {}
+
     # 4方角の全てのミノを最上部で左右に動かす
 
     undroppedMinos = []
@@ -195,123 +277,47 @@ def GetPossibleMoves(
         reachableNodes[EncodeDirectedMino(mino)] = path
     undroppedMinos += sideMovedMinos
 
-    if quickSearch: # quickSearchモードの場合、Tミノ以外は形がおなじものであれば考えない
-        if directedMino.mino not in {MINO.O}:
-            # 右に1回転したもの
-            rightRotatedDirectedMino = Rotate(directedMino, MOVE.R_ROT, board.mainBoard)
-            if rightRotatedDirectedMino is not None:
-                sideMovedMinos = GetSideMovedMinos(board, rightRotatedDirectedMino)
-                for mino, path in sideMovedMinos:
-                    path.insert(0, MOVE.R_ROT)
-                    reachableNodes[EncodeDirectedMino(mino)] = path
-                undroppedMinos += sideMovedMinos
-                if directedMino.mino not in {MINO.S, MINO.Z, MINO.I}:
-                    # 右に2回転(180回転)したもの
-                    upsideDownRotatedDirectedMino = Rotate(rightRotatedDirectedMino, MOVE.R_ROT, board.mainBoard)
-                    if upsideDownRotatedDirectedMino is not None:
-                        sideMovedMinos = GetSideMovedMinos(board, upsideDownRotatedDirectedMino)
-                        for mino, path in sideMovedMinos:
-                            path.insert(0, MOVE.R_ROT)
-                            path.insert(0, MOVE.R_ROT)
-                            reachableNodes[EncodeDirectedMino(mino)] = path
-                        undroppedMinos += sideMovedMinos
-            if directedMino.mino not in {MINO.S, MINO.Z, MINO.I}:
-                # 左に1回転したもの
-                leftRotatedDirectedMino = Rotate(directedMino, MOVE.L_ROT, board.mainBoard)
-                if leftRotatedDirectedMino is not None:
-                    sideMovedMinos = GetSideMovedMinos(board, leftRotatedDirectedMino)
-                    for mino, path in sideMovedMinos:
-                        path.insert(0, MOVE.L_ROT)
-                        reachableNodes[EncodeDirectedMino(mino)] = path
-                    undroppedMinos += sideMovedMinos
-    else:
+    # HARD_DROP, T_SPIN, QUICKでは，形がおなじになる向きは考えない
+    skipSameShape = policy is not MOVEGEN.FULL
+    if not (skipSameShape and directedMino.mino is MINO.O):
         # 右に1回転したもの
-        rightRotatedDirectedMino = Rotate(directedMino, MOVE.R_ROT, board.mainBoard)
+        rightRotatedDirectedMino = RotateWithMemo(directedMino, MOVE.R_ROT, board.mainBoard, rotationMemo)
         if rightRotatedDirectedMino is not None:
-            sideMovedMinos = GetSideMovedMinos(board, rightRotatedDirectedMino)
+            sideMovedMinos = GetSideMovedMinos(board, rightRotatedDirectedMino, MakePath(MOVE.R_ROT))
             for mino, path in sideMovedMinos:
-                path.insert(0, MOVE.R_ROT)
                 reachableNodes[EncodeDirectedMino(mino)] = path
             undroppedMinos += sideMovedMinos
-            # 右に2回転(180回転)したもの
-            upsideDownRotatedDirectedMino = Rotate(rightRotatedDirectedMino, MOVE.R_ROT, board.mainBoard)
-            if upsideDownRotatedDirectedMino is not None:
-                sideMovedMinos = GetSideMovedMinos(board, upsideDownRotatedDirectedMino)
+            if not (skipSameShape and directedMino.mino in {MINO.S, MINO.Z, MINO.I}):
+                # 右に2回転(180回転)したもの
+                upsideDownRotatedDirectedMino = RotateWithMemo(rightRotatedDirectedMino, MOVE.R_ROT, board.mainBoard, rotationMemo)
+                if upsideDownRotatedDirectedMino is not None:
+                    sideMovedMinos = GetSideMovedMinos(board, upsideDownRotatedDirectedMino, MakePath(MOVE.R_ROT, 2))
+                    for mino, path in sideMovedMinos:
+                        reachableNodes[EncodeDirectedMino(mino)] = path
+                    undroppedMinos += sideMovedMinos
+        if not (skipSameShape and directedMino.mino in {MINO.S, MINO.Z, MINO.I}):
+            # 左に1回転したもの
+            leftRotatedDirectedMino = RotateWithMemo(directedMino, MOVE.L_ROT, board.mainBoard, rotationMemo)
+            if leftRotatedDirectedMino is not None:
+                sideMovedMinos = GetSideMovedMinos(board, leftRotatedDirectedMino, MakePath(MOVE.L_ROT))
                 for mino, path in sideMovedMinos:
-                    path.insert(0, MOVE.R_ROT)
-                    path.insert(0, MOVE.R_ROT)
                     reachableNodes[EncodeDirectedMino(mino)] = path
                 undroppedMinos += sideMovedMinos
-        # 左に1回転したもの
-        leftRotatedDirectedMino = Rotate(directedMino, MOVE.L_ROT, board.mainBoard)
-        if leftRotatedDirectedMino is not None:
-            sideMovedMinos = GetSideMovedMinos(board, leftRotatedDirectedMino)
-            for mino, path in sideMovedMinos:
-                path.insert(0, MOVE.L_ROT)
-                reachableNodes[EncodeDirectedMino(mino)] = path
-            undroppedMinos += sideMovedMinos
     
     # ミノを全て下に落とす
 
+    droppedMinos = []
     for mino, path in undroppedMinos:
         dropCount = DropFromTop(board.mainBoard,  board.topRowIdx, mino)
         mino.pos = (mino.pos[0], mino.pos[1] + dropCount)
-        path += [MOVE.DOWN for _ in range(dropCount)]
+        path = AppendMoves(path, MOVE.DOWN, dropCount)
         reachableNodes[EncodeDirectedMino(mino)] = path
-    droppedMinos = undroppedMinos # リネーム
+        droppedMinos.append((mino, path))
 
     # 回転できるところまで回転する
 
-    if quickSearch:
-        if directedMino.mino == MINO.T:
-            while droppedMinos:
-                mino, path = droppedMinos.pop()
-                rightRotatedMino = mino
-                leftRotatedMino = mino
-                hasRightRotateEnded = False
-                hasLeftRotateEnded = False
-                rightRotateCount = 1
-                leftRotateCount = 1
-                while True:
-                    # 回転数が少なくなるように、R_ROT, L_ROTを交互に実行する
-                    if not hasRightRotateEnded:
-                        rightRotatedMino = Rotate(rightRotatedMino, MOVE.R_ROT, board.mainBoard)
-                        if rightRotatedMino is not None and EncodeDirectedMino(rightRotatedMino) not in reachableNodes: # 回転可能かつまだ到達してない部分
-                            reachableNodes[EncodeDirectedMino(rightRotatedMino)] = path + [MOVE.R_ROT for _ in range(rightRotateCount)]
-                            rightRotateCount += 1
-
-                            # 回転中下に1つ落とせるなら落としたものを追加で考える (todo: 1つ以上落とせる場合もなくはなさそう、計算の時間と相談)
-                            oneDroppedDirectedMino = DirectedMino(
-                                rightRotatedMino.mino,
-                                rightRotatedMino.direction,
-                                (rightRotatedMino.pos[0], rightRotatedMino.pos[1] + 1)
-                            )
-                            if isValidPlace(board.mainBoard, GetOccupiedPositions(oneDroppedDirectedMino)):
-                                droppedMinos.append((oneDroppedDirectedMino, path + [MOVE.R_ROT for _ in range(rightRotateCount-1)] + [MOVE.DOWN]))
-                        else:
-                            hasRightRotateEnded = True
-                    
-                    if not hasLeftRotateEnded:
-                        leftRotatedMino = Rotate(leftRotatedMino, MOVE.L_ROT, board.mainBoard)
-                        if leftRotatedMino is not None and EncodeDirectedMino(leftRotatedMino) not in reachableNodes: # 回転可能かつまだ到達してない部分
-                            reachableNodes[EncodeDirectedMino(leftRotatedMino)] = path + [MOVE.L_ROT for _ in range(leftRotateCount)]
-                            leftRotateCount += 1
-
-                            # 回転中下に1つ落とせるなら落としたものを追加で考える (todo: 1つ以上落とせる場合もなくはなさそう、計算の時間と相談)
-                            oneDroppedDirectedMino = DirectedMino(
-                                leftRotatedMino.mino,
-                                leftRotatedMino.direction,
-                                (leftRotatedMino.pos[0], leftRotatedMino.pos[1] + 1)
-                            )
-                            if isValidPlace(board.mainBoard, GetOccupiedPositions(oneDroppedDirectedMino)):
-                                droppedMinos.append((oneDroppedDirectedMino, path + [MOVE.L_ROT for _ in range(leftRotateCount-1)] + [MOVE.DOWN]))
-                        else:
-                            hasLeftRotateEnded = True
-                    
-                    # どちらの方向にも回転できなくなったら終了
-                    if hasRightRotateEnded and hasLeftRotateEnded:
-                        break
-    else:
+    # FULLでは全てのミノ，T_SPINとQUICKではTミノだけ回転する
+    if policy is MOVEGEN.FULL or (policy is not MOVEGEN.HARD_DROP and directedMino.mino is MINO.T):
         while droppedMinos:
             mino, path = droppedMinos.pop()
             rightRotatedMino = mino
@@ -323,36 +329,38 @@ def GetPossibleMoves(
             while True:
                 # 回転数が少なくなるように、R_ROT, L_ROTを交互に実行する
                 if not hasRightRotateEnded:
-                    rightRotatedMino = Rotate(rightRotatedMino, MOVE.R_ROT, board.mainBoard)
+                    rightRotatedMino = RotateWithMemo(rightRotatedMino, MOVE.R_ROT, board.mainBoard, rotationMemo)
                     if rightRotatedMino is not None and EncodeDirectedMino(rightRotatedMino) not in reachableNodes: # 回転可能かつまだ到達してない部分
-                        reachableNodes[EncodeDirectedMino(rightRotatedMino)] = path + [MOVE.R_ROT for _ in range(rightRotateCount)]
+                        reachableNodes[EncodeDirectedMino(rightRotatedMino)] = AppendMoves(path, MOVE.R_ROT, rightRotateCount)
+                        reachableKicks[EncodeDirectedMino(rightRotatedMino)] = rightRotatedMino.kickIdx
                         rightRotateCount += 1
 
                         # 回転中下に1つ落とせるなら落としたものを追加で考える (todo: 1つ以上落とせる場合もなくはなさそう、計算の時間と相談)
-                        oneDroppedDirectedMino = DirectedMino(
-                            rightRotatedMino.mino,
-                            rightRotatedMino.direction,
-                            (rightRotatedMino.pos[0], rightRotatedMino.pos[1] + 1)
-                        )
-                        if isValidPlace(board.mainBoard, GetOccupiedPositions(oneDroppedDirectedMino)):
-                            droppedMinos.append((oneDroppedDirectedMino, path + [MOVE.R_ROT for _ in range(rightRotateCount-1)] + [MOVE.DOWN]))
+                        if IsValidPosition(board.mainBoard, rightRotatedMino.mino, rightRotatedMino.direction, rightRotatedMino.pos[0], rightRotatedMino.pos[1] + 1):
+                            oneDroppedDirectedMino = DirectedMino(
+                                rightRotatedMino.mino,
+                                rightRotatedMino.direction,
+                                (rightRotatedMino.pos[0], rightRotatedMino.pos[1] + 1)
+                            )
+                            droppedMinos.append((oneDroppedDirectedMino, AppendMoves(AppendMoves(path, MOVE.R_ROT, rightRotateCount-1), MOVE.DOWN)))
                     else:
                         hasRightRotateEnded = True
                 
                 if not hasLeftRotateEnded:
-                    leftRotatedMino = Rotate(leftRotatedMino, MOVE.L_ROT, board.mainBoard)
+                    leftRotatedMino = RotateWithMemo(leftRotatedMino, MOVE.L_ROT, board.mainBoard, rotationMemo)
                     if leftRotatedMino is not None and EncodeDirectedMino(leftRotatedMino) not in reachableNodes: # 回転可能かつまだ到達してない部分
-                        reachableNodes[EncodeDirectedMino(leftRotatedMino)] = path + [MOVE.L_ROT for _ in range(leftRotateCount)]
+                        reachableNodes[EncodeDirectedMino(leftRotatedMino)] = AppendMoves(path, MOVE.L_ROT, leftRotateCount)
+                        reachableKicks[EncodeDirectedMino(leftRotatedMino)] = leftRotatedMino.kickIdx
                         leftRotateCount += 1
 
                         # 回転中下に1つ落とせるなら落としたものを追加で考える (todo: 1つ以上落とせる場合もなくはなさそう、計算の時間と相談)
-                        oneDroppedDirectedMino = DirectedMino(
-                            leftRotatedMino.mino,
-                            leftRotatedMino.direction,
-                            (leftRotatedMino.pos[0], leftRotatedMino.pos[1] + 1)
-                        )
-                        if isValidPlace(board.mainBoard, GetOccupiedPositions(oneDroppedDirectedMino)):
-                            droppedMinos.append((oneDroppedDirectedMino, path + [MOVE.L_ROT for _ in range(leftRotateCount-1)] + [MOVE.DOWN]))
+                        if IsValidPosition(board.mainBoard, leftRotatedMino.mino, leftRotatedMino.direction, leftRotatedMino.pos[0], leftRotatedMino.pos[1] + 1):
+                            oneDroppedDirectedMino = DirectedMino(
+                                leftRotatedMino.mino,
+                                leftRotatedMino.direction,
+                                (leftRotatedMino.pos[0], leftRotatedMino.pos[1] + 1)
+                            )
+                            droppedMinos.append((oneDroppedDirectedMino, AppendMoves(AppendMoves(path, MOVE.L_ROT, leftRotateCount-1), MOVE.DOWN)))
                     else:
                         hasLeftRotateEnded = True
                 
@@ -361,84 +369,548 @@ def GetPossibleMoves(
                     break
 
     # 結果出力
-    possibleMoves = []
     # 方向は異なるが占領する場所は同じになるミノが存在するので，これらを重複して数えないために利用する
     # 例えばzミノはNとSで位置をずらせば同じ場所を占領するようになる
-    encodedPlacesList = set()
+    # 前計算したglobalCanonicalPlacementsで置き場所ごとのidにして，idと(ミノ, 経路)を結ぶ辞書で1つにまとめる
+    placements = {}
     for key in reachableNodes:
-        path = reachableNodes[key]
-        SimplifyPathUncopy(path)
+        path = SimplifyPath(reachableNodes[key])
         decodedMino = DecodeDirectedMino(key)
-        encodedPlaces = EncodePlacesOccupiedByDirectedMino(decodedMino)
-        if encodedPlaces in encodedPlacesList:
-            # possibleMovesの中から同じ位置を占領することになるdirectedMinoを探索
-            sameMino, samePath = None, None
-            for mino, path in possibleMoves:
-                if (
-                    EncodePlacesOccupiedByDirectedMino(mino) == encodedPlaces
-                ):
-                    sameMino, samePath = mino, path
-                    break
-            # 今回考えているpathの方が短かったら入れ替え
-            possibleMoves.remove((sameMino, samePath))
-            possibleMoves.append((decodedMino, path))
-        else:
-            if CanPut(board.mainBoard, GetOccupiedPositions(decodedMino)): # 空中に浮いたりしていないことをチェック
-                possibleMoves.append((
-                    decodedMino,
-                    path
-                ))
-                encodedPlacesList.add(encodedPlaces)
-    
+        SetSpinOfPlacement(board.mainBoard, decodedMino, path, reachableKicks.get(key))
+        # T_SPINでは，落とした後に回転して着いた場所はTスピンになるものだけを残す
+        if policy is MOVEGEN.T_SPIN and key in reachableKicks and decodedMino.spin is SPIN.NONE:
+            continue
+        placementIdx = globalCanonicalPlacements[key]
+        if placementIdx in placements:
+            # 今回考えているpathの方が短かったら入れ替え，どちらの場合も順番は後ろにする
+            sameMino, samePath = placements.pop(placementIdx)
+            if GetPathLength(path) < GetPathLength(samePath):
+                placements[placementIdx] = (decodedMino, path)
+            else:
+                placements[placementIdx] = (sameMino, samePath)
+        elif CanPut(board.mainBoard, decodedMino): # 空中に浮いたりしていないことをチェック
+            placements[placementIdx] = (decodedMino, path)
+
+    possibleMoves = list(placements.values())
+    CountMoveGen(policy, len(reachableNodes), len(possibleMoves))
+    return possibleMoves
+
+# GetPossibleMovesと同じ形式で，到達できるミノの置き場所をすべて返す
+# ミノの状態(方角と中心位置)をEncodeDirectedMinoと同じ方法で整数にして，幅優先探索を行う
+# 操作はLEFT, RIGHT, R_ROT, L_ROTと，1マスだけ下に動かす操作(DOWN)，置ける場所まで下に落とす操作(DOWNを押し続ける)の6種類で，
+# それぞれ1回の入力と数える
+# 最後のDROPはどの置き場所でも1回なので，各状態からDROPで落ちた先をその状態までの経路で到達した置き場所とする
+# 状態は入力回数の少ない順に取り出されるので，置き場所ごとに入力回数が最小の経路が得られる
+# 経路は親へのポインタだけを持っておき，最後に重複を除いた置き場所についてだけ復元する
+# 一番高いブロックより上の空中では回転でkickが起きず，どの高さでも同じ動きしかできないので，
+# 1マスだけ下に動かす操作は，動かした先でミノか回転のkickがブロックのある行に届きうる時だけ行う
+# 空中からは，ブロックのある行に届きうる一番上の高さまで一度に下に動かす
+def GetPossibleMovesBFS(
+    board:Board,
+    directedMino:DirectedMino,
+) -> List[Tuple[DirectedMino, PathInt]]:
+    mainBoard = board.mainBoard
+    mino = directedMino.mino
+    startDirection = directedMino.direction
+    startPos0, startPos1 = directedMino.pos
+
+    # 出現位置に置けない場合はどこにも動かせないので，GetPossibleMovesと同じようにその場でDROPする置き場所だけを返す
+    if not IsValidPosition(mainBoard, mino, startDirection, startPos0, startPos1):
+        return [(DirectedMino(mino, startDirection, directedMino.pos), MakePath(MOVE.DROP))]
+
+    # EncodeDirectedMinoからminoの部分を除いたもの
+    posSize = BOARD_HEIGHT + 2
+    directionSize = (BOARD_WIDTH + 2) * posSize
+    minoOffset = mino * 4 * directionSize
+    startCode = (startDirection * (BOARD_WIDTH + 2) + startPos0 + 1) * posSize + startPos1 + 1
+
+    visited = bytearray(4 * directionSize)
+    parentCodes = [0] * (4 * directionSize)
+    parentMoves = bytearray(4 * directionSize)
+    parentKicks = bytearray(4 * directionSize) # 回転で到達した時に使ったkickの番号
+    visited[startCode] = 1
+    queue = [startCode]
+
+    # 置き場所のid(globalCanonicalPlacements)と，(DROPする前の状態のcode, 置き場所のcode)を結ぶ辞書
+    landedCodes = {}
+
+    # ミノか回転のkickがブロックのある行に届きうる一番上のpos1
+    # ミノの中心から一番下のマスまでの距離と，回転のkickで下に動く距離の最大値だけ，一番高いブロックより上になる
+    minTopRowIdx = BOARD_HEIGHT
+    for rowIdx in range(BOARD_HEIGHT):
+        if mainBoard[rowIdx]:
+            minTopRowIdx = rowIdx
+            break
+    maxBottomOffset = max(BOARD_HEIGHT - 1 - globalCollisionPos1Range[mino][direction][1] for direction in range(4))
+    maxKickOffset = max(
+        offset1
+        for move in (MOVE.R_ROT, MOVE.L_ROT)
+        for direction in range(4)
+        for _, offset1, _ in globalRotationTable[GetRotationTableIdx(mino, direction, move)][1]
+    )
+    nearPos1 = minTopRowIdx - maxBottomOffset - maxKickOffset
+
+    queueIdx = 0
+    while queueIdx < len(queue):
+        code = queue[queueIdx]
+        queueIdx += 1
+        rest, pos1 = divmod(code, posSize)
+        direction, pos0 = divmod(rest, BOARD_WIDTH + 2)
+        pos0 -= 1
+        pos1 -= 1
+
+        nextNodes = []
+
+        # ここからDROPした先が置き場所になる
+        dropCount = DropPosition(mainBoard, mino, direction, pos0, pos1)
+        placementIdx = globalCanonicalPlacements[minoOffset + code + dropCount]
+        if placementIdx not in landedCodes: # 先に見つかった方が入力回数が少ない
+            landedCodes[placementIdx] = (code, code + dropCount)
+
+        # 置ける場所まで下に落とすか，途中まで下に動かす（落とした後に回転などを続けるため）
+        if dropCount > 0:
+            nextNodes.append((code + dropCount, MOVE.DOWN, 0))
+        if pos1 + 1 >= nearPos1:
+            if dropCount > 1:
+                nextNodes.append((code + 1, MOVE.DOWN, 0))
+        elif nearPos1 - pos1 < dropCount:
+            nextNodes.append((code + nearPos1 - pos1, MOVE.DOWN, 0))
+
+        # 左右に動かす
+        if IsValidPosition(mainBoard, mino, direction, pos0 - 1, pos1):
+            nextNodes.append((code - posSize, MOVE.LEFT, 0))
+        if IsValidPosition(mainBoard, mino, direction, pos0 + 1, pos1):
+            nextNodes.append((code + posSize, MOVE.RIGHT, 0))
+
+        # 回転させる
+        for move in (MOVE.R_ROT, MOVE.L_ROT):
+            rotated = RotatePosition(mino, direction, pos0, pos1, move, mainBoard)
+            if rotated is not None:
+                newDirection, newPos0, newPos1, kickIdx = rotated
+                nextNodes.append(((newDirection * (BOARD_WIDTH + 2) + newPos0 + 1) * posSize + newPos1 + 1, move, kickIdx))
+
+        for nextCode, move, kickIdx in nextNodes:
+            if not visited[nextCode]:
+                visited[nextCode] = 1
+                parentCodes[nextCode] = code
+                parentMoves[nextCode] = move
+                parentKicks[nextCode] = kickIdx
+                queue.append(nextCode)
+
+    # 結果出力
+    # 置き場所ごとに，親をたどって経路を復元する
+    # 経路の最後の回転で使ったkickの番号も，親をたどる途中で求める
+    possibleMoves = []
+    for code, landedCode in landedCodes.values():
+        path = EMPTY_PATH
+        kickIdx = None
+        nowCode = code
+        while nowCode != startCode:
+            parentCode = parentCodes[nowCode]
+            move = parentMoves[nowCode]
+            if move is MOVE.DOWN:
+                # 下に落とす操作はcodeの差が落とした個数になる
+                path = PrependMoves(path, MOVE.DOWN, nowCode - parentCode)
+            else:
+                path = PrependMoves(path, move)
+                if kickIdx is None and (move is MOVE.R_ROT or move is MOVE.L_ROT):
+                    kickIdx = parentKicks[nowCode]
+            nowCode = parentCode
+        path = SimplifyPath(path)
+        placedMino = DecodeDirectedMino(minoOffset + landedCode)
+        SetSpinOfPlacement(mainBoard, placedMino, path, kickIdx)
+        possibleMoves.append((placedMino, path))
+
+    CountMoveGen(MOVEGEN.COMPLETE, len(queue), len(possibleMoves))
+    return possibleMoves
+
+# 置き場所を求めた結果をpolicyごとに数える
+def CountMoveGen (policy:MoveGenInt, nodeCount:int, placementCount:int):
+    stats = moveGenStats[policy]
+    stats[0] += 1
+    stats[1] += nodeCount
+    stats[2] += placementCount
+
+# 置き場所の求め方ごとに，置き場所を求めた回数，調べたミノの状態の数，見つけた置き場所の数を返す（キャッシュから返した分は含まない）
+def GetMoveGenStats () -> Dict[str, Dict[str, int]]:
+    return {
+        MOVEGEN_NAMES[policy]: {"calls": calls, "nodes": nodes, "placements": placements}
+        for policy, (calls, nodes, placements) in enumerate(moveGenStats)
+    }
+
+def ClearMoveGenStats ():
+    for stats in moveGenStats:
+        stats[:] = [0, 0, 0]
+
+# moveGenPoliciesが空のときに，全ての深さで使う置き場所の求め方
+def GetDefaultMoveGenPolicy () -> MoveGenInt:
+    if completeSearch:
+        return MOVEGEN.COMPLETE
+    if quickSearch:
+        return MOVEGEN.QUICK
+    return MOVEGEN.FULL
+
+# 深さply(初手を1とする)で使う置き場所の求め方
+def GetMoveGenPolicy (ply:int) -> MoveGenInt:
+    if not moveGenPolicies:
+        return GetDefaultMoveGenPolicy()
+    return moveGenPolicies[min(ply, len(moveGenPolicies)) - 1]
+
+# 置き場所のキャッシュ
+# placementCache[(盤面のハッシュ, ミノの種類, 方向, 位置, 置き場所の求め方)] = (盤面, 置き場所のリスト)
+# ハッシュの衝突で違う盤面の結果を返さないように，盤面も保持して比較する
+placementCache = OrderedDict()
+placementCacheMoveCount = 0
+placementCacheHits = 0
+placementCacheMisses = 0
+
+# キャッシュを空にする
+def ClearPlacementCache ():
+    global placementCacheMoveCount, placementCacheHits, placementCacheMisses
+    placementCache.clear()
+    placementCacheMoveCount = 0
+    placementCacheHits = 0
+    placementCacheMisses = 0
+
+# キャッシュのヒット数，ミス数，保持している(盤面, ミノ)の数と置き場所の総数を返す
+def GetPlacementCacheStats () -> Dict[str, int]:
+    return {
+        "hits": placementCacheHits,
+        "misses": placementCacheMisses,
+        "entries": len(placementCache),
+        "moves": placementCacheMoveCount
+    }
+
+# 置き場所の求め方policyに応じて，ミノの置き場所を求める関数を選ぶ（Noneのときは初手と同じ求め方にする）
+def GetPossibleMovesUncached(board:Board, directedMino:DirectedMino, policy:Union[MoveGenInt, None]=None) -> List[Tuple[DirectedMino, PathInt]]:
+    if policy is None:
+        policy = GetMoveGenPolicy(1)
+    if policy is MOVEGEN.COMPLETE:
+        return GetPossibleMovesBFS(board, directedMino)
+    return GetPossibleMoves(board, directedMino, policy)
+
+# 置き場所の求め方policyに応じて，ミノの置き場所を求める（同じ盤面とミノの結果はキャッシュから返す）
+# boardHashはboard.mainBoardのハッシュ（Noneのときは計算する）
+# 返り値はキャッシュ自体なので，変更したい場合はcopyすること。
+def GetPossibleMovesBySetting(board:Board, directedMino:DirectedMino, boardHash:Union[int, None]=None, policy:Union[MoveGenInt, None]=None) -> List[Tuple[DirectedMino, PathInt]]:
+    global placementCacheMoveCount, placementCacheHits, placementCacheMisses
+    if policy is None:
+        policy = GetMoveGenPolicy(1)
+    if PLACEMENT_CACHE_SIZE <= 0:
+        return GetPossibleMovesUncached(board, directedMino, policy)
+
+    if boardHash is None:
+        boardHash = HashMainBoard(board.mainBoard)
+    key = (boardHash, directedMino.mino, directedMino.direction, directedMino.pos, policy)
+    cached = placementCache.get(key)
+    if cached is not None and cached[0] == board.mainBoard:
+        placementCacheHits += 1
+        placementCache.move_to_end(key)
+        return cached[1]
+
+    placementCacheMisses += 1
+    possibleMoves = GetPossibleMovesUncached(board, directedMino, policy)
+    if cached is not None:
+        placementCacheMoveCount -= len(cached[1])
+    placementCache[key] = (list(board.mainBoard), possibleMoves)
+    placementCache.move_to_end(key)
+    placementCacheMoveCount += len(possibleMoves)
+
+    # 上限を超えたら，一番長く使われていないものから捨てる
+    while len(placementCache) > PLACEMENT_CACHE_SIZE or placementCacheMoveCount > PLACEMENT_CACHE_MOVE_COUNT:
+        _, (_, removedMoves) = placementCache.popitem(last=False)
+        placementCacheMoveCount -= len(removedMoves)
+
     return possibleMoves
 
 # 今のBoardからHoldも含めたミノの操作をすべて見つける。
-def GetNextMoves(board:Board) -> List[Tuple[DirectedMino, List[MoveInt]]]:
+# Holdしても同じ種類のミノを置くことになる時は，置き場所を求め直さない
+# boardHashはboard.mainBoardのハッシュ（Noneのときは計算する）
+# policyは置き場所の求め方（Noneのときは初手と同じ求め方にする）
+def GetNextMoves(board:Board, boardHash:Union[int, None]=None, policy:Union[MoveGenInt, None]=None) -> List[Tuple[DirectedMino, PathInt]]:
+    if boardHash is None and PLACEMENT_CACHE_SIZE > 0:
+        boardHash = HashMainBoard(board.mainBoard)
+    if policy is None:
+        policy = GetMoveGenPolicy(1)
     boardAfterHold = BoardAfterHold(board)
+    possibleMoves = GetPossibleMovesBySetting(board, board.currentMino, boardHash, policy)
+
+    if boardAfterHold.currentMino.mino is board.currentMino.mino:
+        # holdしているミノも同じ種類の時は，holdしない場合と全く同じ状態になるので省く
+        if board.holdMino is not MINO.NONE:
+            return list(possibleMoves)
+        holdPossibleMoves = possibleMoves
+    else:
+        holdPossibleMoves = GetPossibleMovesBySetting(boardAfterHold, boardAfterHold.currentMino, boardHash, policy)
     
-    NextMoves = GetPossibleMoves(board, board.currentMino) + \
-                [(mino, [MOVE.HOLD] + path) for mino, path in GetPossibleMoves(boardAfterHold, boardAfterHold.currentMino)]
+    NextMoves = possibleMoves + \
+                [(mino, PrependMoves(path, MOVE.HOLD)) for mino, path in holdPossibleMoves]
 
     return NextMoves
 
 
+# ExpandStatesで生成した状態の数（ベンチマークで探索の速さを測るのに使う）
+expandedStateCount = 0
+
+# 状態のリストをそれぞれ1手ずつ展開して，次の深さの状態のリストを返す
+# 違う順番で置いたりholdしたりして同じ状態になったものは，accumPathValueが一番よいものだけを残す
+# plyは次の深さ(初手を1とする)で，置き場所の求め方を選ぶのに使う
+def ExpandStates (states:List[State], ply:int) -> List[State]:
+    global expandedStateCount
+    policy = GetMoveGenPolicy(ply)
+    transpositionTable = {}
+    next_states = {}
+    for now_state in states:
+        nextStates = now_state.NextStates(transpositionTable, not batchEval, policy)
+        expandedStateCount += len(nextStates)
+        for next_state in nextStates:
+            if next_state.isDuplicate:
+                continue
+            key = next_state.transpositionKey
+            if key in next_states and next_states[key].accumPathValue >= next_state.accumPathValue:
+                continue
+            next_states[key] = next_state
+            if key in transpositionTable or len(transpositionTable) < TRANSPOSITION_TABLE_SIZE:
+                transpositionTable[key] = next_state
+
+    next_states = list(next_states.values())
+    if batchEval:
+        EvalStatesBatch(next_states)
+    return next_states
+
+# 状態の親をたどって，先頭の状態（初手）を返す
+def GetRootState (state:State) -> State:
+    while state.parent is not None:
+        state = state.parent
+    return state
+
+# 状態の親をたどって，先頭の状態（初手）からの経路のリストを返す
+def GetAccumPath (state:State) -> List[PathInt]:
+    accumPath = []
+    while state is not None:
+        accumPath.append(state.path)
+        state = state.parent
+    accumPath.reverse()
+    return accumPath
+
 SEARCH_LIMIT = None # initialized in gameStateManager
 BEAM_WIDTH = None # initialized in gameStateManager
+SEARCH_TIME_LIMIT = None # 1回の意思決定にかけてよい時間(s)。Noneのときは時間制限なし
 firstHold = True
-def Search (board:Board, mino:DirectedMino, path:List[MOVE], limit:int) -> Tuple[int, List[List[MOVE]]]:
+# beamWidthsを与えた時はBEAM_WIDTHの代わりにそれを使う
+# deadline(time.time()の値)を過ぎた時は探索を打ち切ってNoneを返す
+# frontierにリストを与えた時は，最後に残ったbeamの状態をそこに追加する
+def Search (board:Board, mino:DirectedMino, path:PathInt, limit:int, beamWidths:Union[List[int], None]=None, deadline:Union[float, None]=None, frontier:Union[List[State], None]=None) -> Union[Tuple[int, List[PathInt]], None]:
     global BEAM_WIDTH
+    if beamWidths is None:
+        beamWidths = BEAM_WIDTH
 
     state_queue = []
     heapq.heapify(state_queue)
-    init_state = State(board, mino, path, 0, board.score, [])
+    init_state = State(board, mino, path, 0, board.score)
     init_state.Transit()
     heapq.heappush(state_queue, init_state)
 
-    for beamWidth in BEAM_WIDTH:
-        next_state_queue = []
-        heapq.heapify(next_state_queue)
-        while len(state_queue) > 0:
+    for depth, beamWidth in enumerate(beamWidths):
+        # 時間切れ
+        if deadline is not None and time.time() > deadline:
+            return None
 
-            now_state = heapq.heappop(state_queue)
-            for next_state in now_state.NextStates():
-                heapq.heappush(next_state_queue, next_state)
-            
-            while len(next_state_queue) > beamWidth:
-                heapq.heappop(next_state_queue)
+        next_states = ExpandStates([heapq.heappop(state_queue) for _ in range(len(state_queue))], depth + 2)
+
+        # 次に置ける場所がない場合
+        if not next_states:
+            return float('-inf'), GetAccumPath(init_state)
 
-        state_queue = next_state_queue
+        state_queue = heapq.nlargest(beamWidth, next_states)
+        heapq.heapify(state_queue)
         # 実際に遷移
         for state in state_queue:
             state.Transit()
     
+    if frontier is not None:
+        frontier += state_queue
+
     while len(state_queue) > 1:
         heapq.heappop(state_queue)
 
     final_state = heapq.heappop(state_queue)
-    return final_state.eval, final_state.accumPath
+    return final_state.eval, GetAccumPath(final_state)
+
+# 初手を並列に探索するためのプロセスプール（Noneのときは直列に探索する）
+searchPool = None
+searchProcessCount = 0
+# 1つのプロセスに何回に分けて初手を渡すか
+SEARCH_CHUNKS_PER_PROCESS = 2
+
+# 探索用のプロセスで最初に1回だけ行う前計算
+def InitSearchWorker ():
+    InitGetOccupiedPositions()
+    InitCollisionTable()
+
+# プロセスを起動させておくためだけの関数
+def WarmUpSearchWorker (_):
+    return None
+
+# 探索用のプロセスプールを作って，全てのプロセスを起動しておく
+def InitSearchPool (processCount:int):
+    global searchPool, searchProcessCount
+    if processCount <= 1:
+        return
+    searchPool = ProcessPoolExecutor(processCount, initializer=InitSearchWorker)
+    searchProcessCount = processCount
+    list(searchPool.map(WarmUpSearchWorker, range(processCount)))
+
+# 探索の設定をプロセス間でやりとりするためにまとめる
+# 評価関数の重みも含める（自己対戦などで重みを差し替えた時に，他のプロセスでも同じ重みで探索するため）
+def GetSearchConfig ():
+    return (SEARCH_LIMIT, list(BEAM_WIDTH), quickSearch, completeSearch, list(moveGenPolicies), TRANSPOSITION_TABLE_SIZE, batchEval, globalBeam, GLOBAL_BEAM_SCALE, PLACEMENT_CACHE_SIZE, PLACEMENT_CACHE_MOVE_COUNT, evaluator.GetEvalWeights())
+
+# 結果を記録するときのために，探索の設定を名前付きでまとめる
+def DescribeSearchConfig () -> Dict:
+    return {
+        "searchLimit": SEARCH_LIMIT,
+        "beamWidth": list(BEAM_WIDTH) if BEAM_WIDTH is not None else None,
+        "quickSearch": quickSearch,
+        "completeSearch": completeSearch,
+        "moveGenPolicies": [MOVEGEN_NAMES[policy] for policy in moveGenPolicies],
+        "globalBeam": globalBeam,
+        "batchEval": batchEval,
+        "processCount": searchProcessCount,
+        "timeLimit": SEARCH_TIME_LIMIT,
+    }
+
+def SetSearchConfig (config):
+    global SEARCH_LIMIT, BEAM_WIDTH, quickSearch, completeSearch, moveGenPolicies, TRANSPOSITION_TABLE_SIZE, batchEval, globalBeam, GLOBAL_BEAM_SCALE, PLACEMENT_CACHE_SIZE, PLACEMENT_CACHE_MOVE_COUNT
+    SEARCH_LIMIT, BEAM_WIDTH, quickSearch, completeSearch, moveGenPolicies, TRANSPOSITION_TABLE_SIZE, batchEval, globalBeam, GLOBAL_BEAM_SCALE, PLACEMENT_CACHE_SIZE, PLACEMENT_CACHE_MOVE_COUNT, evalWeights = config
+    evaluator.SetEvalWeights(evalWeights)
+
+# 受け取った初手をそれぞれ順番に探索する
+# 1つでも時間切れになった場合はNoneを返す
+def SearchRootMovesSerial (board:Board, rootMoves:List[Tuple[DirectedMino, PathInt]], beamWidths:Union[List[int], None], deadline:Union[float, None]) -> Union[List[Tuple[float, List[PathInt]]], None]:
+    results = []
+    for mino, path in rootMoves:
+        result = Search(board, mino, path, SEARCH_LIMIT-1, beamWidths, deadline)
+        if result is None:
+            return None
+        results.append(result)
+    return results
+
+# 探索用のプロセスで，受け取った初手をそれぞれ探索する
+def SearchRootMovesWorker (args) -> Union[List[Tuple[float, List[PathInt]]], None]:
+    config, board, rootMoves, beamWidths, deadline = args
+    SetSearchConfig(config)
+    return SearchRootMovesSerial(board, rootMoves, beamWidths, deadline)
+
+# 初手ごとに探索して，(評価値, 初手からの経路のリスト)のリストを初手と同じ順番で返す
+# プロセスプールがあるときは，初手を順番を保ったまま分割して並列に探索する
+# deadlineまでに全ての初手の探索が終わらなかった場合はNoneを返す
+def SearchRootMoves (board:Board, possibleMoves:List[Tuple[DirectedMino, PathInt]], beamWidths:Union[List[int], None]=None, deadline:Union[float, None]=None) -> Union[List[Tuple[float, List[PathInt]]], None]:
+    if searchPool is None:
+        return SearchRootMovesSerial(board, possibleMoves, beamWidths, deadline)
+
+    config = GetSearchConfig()
+    chunkSize = -(-len(possibleMoves) // (searchProcessCount * SEARCH_CHUNKS_PER_PROCESS))
+    futures = [
+        searchPool.submit(SearchRootMovesWorker, (config, board, possibleMoves[i:i + chunkSize], beamWidths, deadline))
+        for i in range(0, len(possibleMoves), chunkSize)
+    ]
+    _, notDone = wait(futures, None if deadline is None else max(0, deadline - time.time()))
+    if notDone:
+        for future in notDone:
+            future.cancel()
+        return None
+
+    results = []
+    for future in futures:
+        chunkResult = future.result()
+        if chunkResult is None:
+            return None
+        results += chunkResult
+    return results
+
+# deadlineまでの時間で，深さを1つずつ増やしながら初手ごとの探索を行う
+# 全ての初手の探索が終わった一番深い結果を返す（初手だけの評価は時間に関わらず必ず行う）
+def SearchRootMovesUntil (board:Board, possibleMoves:List[Tuple[DirectedMino, PathInt]], deadline:float) -> List[Tuple[float, List[PathInt]]]:
+    results = SearchRootMoves(board, possibleMoves, [])
+    for depth in range(1, len(BEAM_WIDTH) + 1):
+        deeperResults = SearchRootMoves(board, possibleMoves, BEAM_WIDTH[:depth], deadline)
+        if deeperResults is None:
+            break
+        results = deeperResults
+    return results
+
+# deadlineが与えられていない時は，SEARCH_TIME_LIMITから探索を打ち切る時刻を決める
+def GetDeadline (deadline:Union[float, None]) -> Union[float, None]:
+    if deadline is None and SEARCH_TIME_LIMIT is not None:
+        return time.time() + SEARCH_TIME_LIMIT
+    return deadline
+
+# 時間制限の有無に応じて，初手ごとの探索を行う
+def SearchRootMovesWithDeadline (board:Board, possibleMoves:List[Tuple[DirectedMino, PathInt]], deadline:Union[float, None]) -> List[Tuple[float, List[PathInt]]]:
+    deadline = GetDeadline(deadline)
+    if deadline is None:
+        return SearchRootMoves(board, possibleMoves)
+    return SearchRootMovesUntil(board, possibleMoves, deadline)
+
+# 初手の状態を作る
+# holdするかどうかや経路が違っても同じ(盤面, hold, ネクスト)になる初手は，accumPathValueが一番よいものだけを残す
+def GetRootStates (board:Board, possibleMoves:List[Tuple[DirectedMino, PathInt]]) -> List[State]:
+    features = evaluator.CalcBoardFeatures(board.mainBoard, 0, board.topRowIdx)
+    rootStates = {}
+    for mino, path in possibleMoves:
+        rootState = State(board, mino, path, 0, board.score, features=features)
+        key = rootState.transpositionKey
+        if key in rootStates and rootStates[key].accumPathValue >= rootState.accumPathValue:
+            continue
+        rootStates[key] = rootState
+    return list(rootStates.values())
+
+# 同じ状態になる初手をまとめて，初手ごとに探索する初手を返す
+def CollapseRootMoves (board:Board, possibleMoves:List[Tuple[DirectedMino, PathInt]]) -> List[Tuple[DirectedMino, PathInt]]:
+    return [(rootState.mino, rootState.path) for rootState in GetRootStates(board, possibleMoves)]
+
+# 全ての初手を1つのbeamに入れて探索し，一番評価値がよい末端の状態を返す
+# 各深さで初手に関係なくbeamの幅だけ残すので，初手ごとに探索するより少ない状態数で済む
+# 初手はGetRootStateで末端の状態からたどって求める
+# deadline(time.time()の値)を過ぎた時は，そこまでに探索できた深さの中で一番よい状態を返す
+# frontierにリストを与えた時は，最後の深さまで探索できた場合にその深さのbeamの状態（Transit済み）を追加する
+def SearchGlobalBeam (board:Board, possibleMoves:List[Tuple[DirectedMino, PathInt]], beamWidths:Union[List[int], None]=None, deadline:Union[float, None]=None, frontier:Union[List[State], None]=None) -> Union[State, None]:
+    if beamWidths is None:
+        beamWidths = BEAM_WIDTH
+    beamWidths = [GLOBAL_BEAM_SCALE * beamWidth for beamWidth in beamWidths]
+
+    state_queue = GetRootStates(board, possibleMoves)
+    if not state_queue:
+        return None
+    if beamWidths:
+        state_queue = heapq.nlargest(beamWidths[0], state_queue)
+
+    for depth, beamWidth in enumerate(beamWidths):
+        # 時間切れ
+        if deadline is not None and time.time() > deadline:
+            return max(state_queue)
+
+        for state in state_queue:
+            state.Transit()
+        next_states = ExpandStates(state_queue, depth + 2)
+
+        # 次に置ける場所がない場合
+        if not next_states:
+            return max(state_queue)
+
+        state_queue = heapq.nlargest(beamWidth, next_states)
+
+    if frontier is not None and beamWidths:
+        for state in state_queue:
+            state.Transit()
+        frontier += state_queue
+
+    return max(state_queue)
 
 # 実際に手を決める関数
-def Decide (board:Board) -> Tuple[float, DirectedMino, List[MoveInt]]:
+# deadline(time.time()の値)を与えた時は，それまでに探索できた一番深い結果から手を決める
+def Decide (board:Board, deadline:Union[float, None]=None) -> Tuple[float, DirectedMino, PathInt]:
     global SEARCH_LIMIT, BEAM_WIDTH, firstHold
 
     try:
@@ -446,64 +918,261 @@ def Decide (board:Board) -> Tuple[float, DirectedMino, List[MoveInt]]:
 
         # 評価値計算
         maxValue, maxMino, maxPath = -10000000000, None, None
-        for mino, path in possibleMoves:
-            # 評価値計算
-            value, _ = Search(board, mino, path, SEARCH_LIMIT-1)
-            if value >= maxValue:
-                maxMino, maxPath = mino, path
-                maxValue = value
+        if globalBeam:
+            bestState = SearchGlobalBeam(board, possibleMoves, None, GetDeadline(deadline))
+            if bestState is not None:
+                rootState = GetRootState(bestState)
+                maxValue, maxMino, maxPath = bestState.eval, rootState.mino, rootState.path
+        else:
+            possibleMoves = CollapseRootMoves(board, possibleMoves)
+            for (mino, path), (value, _) in zip(possibleMoves, SearchRootMovesWithDeadline(board, possibleMoves, deadline)):
+                if value >= maxValue:
+                    maxMino, maxPath = mino, path
+                    maxValue = value
 
+        # 全ての初手で次の状態がなく評価値が-infになった時は，最初の置き場所にする
+        # 置き場所が1つもない時は負けなので，assertionで負けを認める
         if maxMino is None or maxPath is None:
             Warn("Cannot decide path.")
+            assert possibleMoves
             maxMino, maxPath = possibleMoves[0]
     
     # 実行するなかでassertionが出てしまったら、負けを認める
     except AssertionError:
         print("I Lost...")
-        return -100000000000, None, [MOVE.DROP]
+        return -100000000000, None, MakePath(MOVE.DROP)
     
     # 1回Holdしたら、あとは5手先読みできるようになる。
-    if maxPath[0] is MOVE.HOLD and firstHold:
+    if GetFirstMove(maxPath) is MOVE.HOLD and firstHold:
         SEARCH_LIMIT += 1
         BEAM_WIDTH.append(3)
         firstHold = False
     
     return maxValue, maxMino, maxPath
 
-# 複数手を決める関数
-def MultiDecide(board:Board) -> List[List[MoveInt]]:
-    global SEARCH_LIMIT, BEAM_WIDTH, firstHold
+# 最後に探索で選んだ手の評価値（意思決定を記録するときに使う）
+lastSearchValue = None
 
-    try:
-        possibleMoves = GetNextMoves(board)
+# 複数手の探索だけを行い，(評価値, 初手からの経路のリスト)を返す
+# 探索の設定(SEARCH_LIMIT, BEAM_WIDTHなど)は変更しない
+# 1つのbeamで探索するときにfrontierにリストを与えた時は，最後の深さのbeamの状態をそこに追加する
+def SearchMultiPath(board:Board, deadline:Union[float, None]=None, frontier:Union[List[State], None]=None) -> Tuple[float, List[PathInt]]:
+    global lastSearchValue
+    possibleMoves = GetNextMoves(board)
 
-        # 評価値計算
-        maxValue, maxMino, maxMultiPath = -10000000000, None, None
-        for mino, path in possibleMoves:
-            # 評価値計算
-            value, multipath = Search(board, mino, path, SEARCH_LIMIT-1)
+    # 評価値計算
+    maxValue, maxMino, maxMultiPath = -10000000000, None, None
+    if globalBeam:
+        bestState = SearchGlobalBeam(board, possibleMoves, None, GetDeadline(deadline), frontier)
+        if bestState is not None:
+            maxValue, maxMino, maxMultiPath = bestState.eval, GetRootState(bestState).mino, GetAccumPath(bestState)
+    else:
+        possibleMoves = CollapseRootMoves(board, possibleMoves)
+        for (mino, path), (value, multipath) in zip(possibleMoves, SearchRootMovesWithDeadline(board, possibleMoves, deadline)):
             if value >= maxValue:
                 maxMino, maxMultiPath = mino, multipath
                 maxValue = value
-        
-        if maxMino is None or maxMultiPath is None:
-            Warn("Cannot decide path.")
-            maxMino, maxMultiPath = possibleMoves[0]
-        
-        # 1回Holdしたら、あとは5手先読みできるようになる。
-        if firstHold:
-            for path in maxMultiPath:
-                if path[0] is MOVE.HOLD:
-                    SEARCH_LIMIT += 1
-                    BEAM_WIDTH.append(3)
-                    firstHold = False
-                    break
+    
+    # 全ての初手で次の状態がなく評価値が-infになった時は，最初の置き場所だけの経路のリストにする
+    # 置き場所が1つもない時は負けなので，assertionで呼び出し元に負けを認めさせる
+    if maxMino is None or maxMultiPath is None:
+        Warn("Cannot decide path.")
+        assert possibleMoves
+        maxMino, maxPath = possibleMoves[0]
+        maxMultiPath = [maxPath]
+
+    lastSearchValue = maxValue
+    return maxValue, maxMultiPath
+
+# 探索で得られた経路のリストから，実際に実行する経路のリストを決める
+def CommitMultiPath(maxMultiPath:List[PathInt]) -> List[PathInt]:
+    global SEARCH_LIMIT, BEAM_WIDTH, firstHold
+
+    # 1回Holdしたら、あとは5手先読みできるようになる。
+    if firstHold:
+        for path in maxMultiPath:
+            if GetFirstMove(path) is MOVE.HOLD:
+                SEARCH_LIMIT += 1
+                BEAM_WIDTH.append(3)
+                firstHold = False
+                break
 
-        maxMultiPath = maxMultiPath[:SEARCH_LIMIT]
+    return maxMultiPath[:SEARCH_LIMIT]
+
+# 複数手を決める関数
+# deadline(time.time()の値)を与えた時は，それまでに探索できた一番深い結果から手を決める
+def MultiDecide(board:Board, deadline:Union[float, None]=None) -> List[PathInt]:
+    try:
+        _, maxMultiPath = SearchMultiPath(board, deadline)
+        maxMultiPath = CommitMultiPath(maxMultiPath)
     
     # 実行するなかでassertionが出てしまったら、負けを認める
     except AssertionError:
         print("I Lost...")
-        return [[MOVE.DROP]]
+        return [MakePath(MOVE.DROP)]
+
+    return maxMultiPath
+
+# 探索木の再利用
+# 決めた経路の初手を実行した後の盤面が予測通りであれば，前回の探索の末端を新しく見えたネクストで1手だけ延ばして手を決める
+# retainedStatesは実行する予定の初手の下にある探索の末端の状態（Transit済み）
+# 全ての状態の親をたどった先頭は，実行する予定の初手の状態になっている
+retainedStates = []
+retainedSearchLimit = None
+
+# 保持している探索木を捨てる
+def ClearRetainedTree ():
+    global retainedStates, retainedSearchLimit
+    retainedStates = []
+    retainedSearchLimit = None
 
-    return maxMultiPath
\ No newline at end of file
+# 保持している探索木で予測した，初手を実行した後の盤面を返す
+def GetRetainedBoard () -> Union[Board, None]:
+    if not retainedStates:
+        return None
+    return GetRootState(retainedStates[0]).board
+
+# 先読みでわからなかったミノのうち，最初のものをminoにする
+def RevealMino (board:Board, mino:MinoInt):
+    if board.currentMino.mino is MINO.NONE:
+        board.currentMino = DirectedMino(mino, FIRST_MINO_DIRECTION, FIRST_MINO_POS)
+    elif MINO.NONE in board.followingMinos:
+        board.followingMinos[board.followingMinos.index(MINO.NONE)] = mino
+
+# 先頭の状態（実行した初手）を探索木から取り除き，その次の状態を新しい先頭にする
+# 評価値は新しい盤面から探索し直した時と同じ値になるように，初手の分を引いて割引率で割る
+# 新しく見えたネクストnewMinoを全ての状態の盤面に反映する
+def RebaseRetainedStates (states:List[State], newMino:MinoInt):
+    rootState = GetRootState(states[0])
+    baseValue = rootState.accumPathValue
+
+    # 先頭以外の全ての状態を集める
+    treeStates = {}
+    for state in states:
+        while state is not rootState and id(state) not in treeStates:
+            treeStates[id(state)] = state
+            state = state.parent
+
+    for state in treeStates.values():
+        if state.parent is rootState:
+            state.parent = None
+        state.accumPathValue = (state.accumPathValue - baseValue) / EVAL_TAU
+        state.eval = (state.eval - baseValue) / EVAL_TAU
+        state.tau /= EVAL_TAU
+        RevealMino(state.board, newMino)
+
+# 全探索で決めた経路の初手について，もう一度探索して末端の状態を保持する
+# deadlineまでに探索が終わらなかった場合は何も保持しない
+def RetainSearchTree (board:Board, multiPath:List[PathInt], deadline:Union[float, None]=None):
+    global retainedStates, retainedSearchLimit
+    ClearRetainedTree()
+    # 初手しか読まない時は保持しない
+    if not BEAM_WIDTH:
+        return
+    for mino, path in GetNextMoves(board):
+        if path == multiPath[0]:
+            frontier = []
+            if Search(board, mino, path, SEARCH_LIMIT-1, BEAM_WIDTH, deadline, frontier) is None:
+                return
+            retainedStates = frontier
+            retainedSearchLimit = SEARCH_LIMIT
+            return
+
+# 1つのbeamで探索した最後の深さの状態のうち，一番よい状態と同じ初手の下にある状態を保持する
+def RetainFrontier (frontier:List[State]):
+    global retainedStates, retainedSearchLimit
+    bestRootState = GetRootState(max(frontier))
+    retainedStates = [state for state in frontier if GetRootState(state) is bestRootState]
+    retainedSearchLimit = SEARCH_LIMIT
+
+# boardが保持している探索木の予測と一致すれば，末端を1手延ばして経路のリストを返す
+# 一致しない場合や延ばせない場合はNoneを返す
+def ExtendRetainedTree (board:Board) -> Union[List[PathInt], None]:
+    global retainedStates, lastSearchValue
+    predictedBoard = GetRetainedBoard()
+    if (
+        predictedBoard is None or
+        retainedSearchLimit != SEARCH_LIMIT or
+        board.mainBoard != predictedBoard.mainBoard or
+        board.currentMino.mino != predictedBoard.currentMino.mino or
+        board.holdMino != predictedBoard.holdMino or
+        board.followingMinos[:-1] != predictedBoard.followingMinos[:-1]
+    ):
+        ClearRetainedTree()
+        return None
+
+    RebaseRetainedStates(retainedStates, board.followingMinos[-1])
+
+    # 末端を1手延ばす（初手を1として，延ばした状態の深さはlen(BEAM_WIDTH) + 1になる）
+    next_states = ExpandStates(retainedStates, len(BEAM_WIDTH) + 1)
+    if not next_states:
+        ClearRetainedTree()
+        return None
+
+    state_queue = heapq.nlargest(BEAM_WIDTH[-1], next_states)
+    for state in state_queue:
+        state.Transit()
+    bestState = state_queue[0]
+    lastSearchValue = bestState.eval
+
+    # 選んだ初手の下にある状態だけを残す
+    bestRootState = GetRootState(bestState)
+    retainedStates = [state for state in state_queue if GetRootState(state) is bestRootState]
+    return GetAccumPath(bestState)
+
+# 探索木を再利用しながら複数手を決める関数
+# 予測した盤面と一致しない時は全探索を行う
+def MultiDecideWithTreeReuse(board:Board, deadline:Union[float, None]=None) -> List[PathInt]:
+    deadline = GetDeadline(deadline)
+
+    try:
+        maxMultiPath = ExtendRetainedTree(board)
+        if maxMultiPath is None:
+            frontier = []
+            _, maxMultiPath = SearchMultiPath(board, deadline, frontier)
+            if frontier:
+                RetainFrontier(frontier)
+            else:
+                RetainSearchTree(board, maxMultiPath, deadline)
+        maxMultiPath = CommitMultiPath(maxMultiPath)
+    
+    # 実行するなかでassertionが出てしまったら、負けを認める
+    except AssertionError:
+        print("I Lost...")
+        ClearRetainedTree()
+        return [MakePath(MOVE.DROP)]
+
+    return maxMultiPath
+
+# 探索木の1つの状態あたりのメモリ使用量を測る
+# 1つのbeamでboardから探索し，最後の深さの状態から親をたどれる状態（探索が終わっても残る探索木）が確保しているメモリをtracemallocで測る
+# 置き場所のキャッシュが増えた分を含めないように，測っている間はキャッシュを使わない
+# 状態の数，探索木のバイト数，1つの状態あたりのバイト数を返す
+def MeasureStateMemory (board:Board) -> Dict[str, float]:
+    global PLACEMENT_CACHE_SIZE
+    placementCacheSize = PLACEMENT_CACHE_SIZE
+    PLACEMENT_CACHE_SIZE = 0
+    isTracing = tracemalloc.is_tracing()
+    if not isTracing:
+        tracemalloc.start()
+    try:
+        startMemory, _ = tracemalloc.get_traced_memory()
+        frontier = []
+        SearchGlobalBeam(board, GetNextMoves(board), None, None, frontier)
+        treeMemory = tracemalloc.get_traced_memory()[0] - startMemory
+    finally:
+        if not isTracing:
+            tracemalloc.stop()
+        PLACEMENT_CACHE_SIZE = placementCacheSize
+
+    treeStates = set()
+    for state in frontier:
+        while state is not None and id(state) not in treeStates:
+            treeStates.add(id(state))
+            state = state.parent
+
+    return {
+        "nodes": len(treeStates),
+        "bytes": treeMemory,
+        "bytesPerNode": treeMemory / max(1, len(treeStates))
+    }
@@ -0,0 +1,253 @@
+from lib import *
+import decisionMaker
+import evaluator
+import selfPlay
+import json
+import math
+from concurrent.futures import as_completed
+
+# 評価関数の重み(params/eval.py)を，seedを固定した自己対戦の結果をもとに交差エントロピー法で調整する
+# 重みのベクトルを正規分布からいくつか取り出し，それぞれで同じseedのゲームを行って，
+# スコアの平均が高かった上位のベクトルの平均と標準偏差で次の世代の分布を作る
+# 全ての候補で同じseedのゲームを行うので，候補の間の差はゲームの運ではなく重みの差になる
+
+# 調整する重み（名前, リストの重みのときは何番目か）
+# EVAL_ROUGHNESS_VALは表なので，EVAL_RENは今は全て0なので調整しない
+TUNE_WEIGHTS = [
+    ("EVAL_HEIGHT_UPPER_THAN10", None),
+    ("EVAL_HEIGHT_UPPER_THAN5", None),
+    ("EVAL_HEIGHT", None),
+    ("EVAL_ROUGHNESS", None),
+    ("EVAL_BLANK_UNDER_BLOCK", None),
+    ("EVAL_LINE_CLEAR", 1),
+    ("EVAL_LINE_CLEAR", 2),
+    ("EVAL_LINE_CLEAR", 3),
+    ("EVAL_LINE_CLEAR", 4),
+    ("EVAL_T_SPIN_SINGLE", None),
+    ("EVAL_T_SPIN_DOUBLE", None),
+    ("EVAL_T_SPIN_TRIPLE", None),
+    ("EVAL_T_SPIN_MINI_SINGLE", None),
+    ("EVAL_T_SPIN_MINI_DOUBLE", None),
+    ("EVAL_TETRIS_PATTERN", None),
+    ("EVAL_BACKTOBACK", None),
+    ("EVAL_PERFECT_CLEAR", None),
+    ("EVAL_SOFTDROP", None),
+]
+
+# 世代の数と1世代の候補の数（そのうち1つは今の分布の平均）
+TUNE_GENERATION_COUNT = 20
+TUNE_POPULATION = 12
+# 次の世代の分布を作るのに使う上位の候補の割合
+TUNE_ELITE_FRACTION = 0.25
+# 最初の標準偏差（重みの大きさに対する割合）と，標準偏差の下限
+# 重みの大きさは，0に近い重みも動けるように最低でもTUNE_MIN_SCALEとする
+TUNE_INITIAL_SIGMA = 0.3
+TUNE_MIN_SIGMA = 1.0
+TUNE_MIN_SCALE = 10
+# 新しい標準偏差を前の世代の標準偏差とどれだけ混ぜるか（1のときは新しい標準偏差だけを使う）
+TUNE_SMOOTHING = 0.7
+
+# 出力するパラメータファイル
+TUNE_OUTPUT_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "params", "evalTuned.py")
+
+# 重みの辞書から調整する重みのベクトルを取り出す
+def WeightsToVector (weights:Dict[str, Union[int, List[int]]]) -> List[int]:
+    return [weights[name] if idx is None else weights[name][idx] for name, idx in TUNE_WEIGHTS]
+
+# ベクトルを整数に丸めて，baseWeightsの調整する重みを置き換えた辞書を返す
+def VectorToWeights (vector:List[float], baseWeights:Dict[str, Union[int, List[int]]]) -> Dict[str, Union[int, List[int]]]:
+    weights = {name: list(value) if isinstance(value, list) else value for name, value in baseWeights.items()}
+    for (name, idx), value in zip(TUNE_WEIGHTS, vector):
+        if idx is None:
+            weights[name] = int(round(value))
+        else:
+            weights[name][idx] = int(round(value))
+    return weights
+
+# 候補のキャッシュやチェックポイントで使う，ベクトルのキー
+def VectorKey (vector:List[int]) -> str:
+    return json.dumps(vector)
+
+# 自己対戦の集計結果から候補の良さを求める（高いほど良い）
+# 1ゲームで置くミノの数は決まっているので，積みあがって途中で終わったゲームはスコアが低くなる
+def CandidateFitness (aggregate:Dict) -> float:
+    if aggregate["games"] == 0:
+        return -math.inf
+    return aggregate["scoreMean"]
+
+# 平均mean，標準偏差sigmaの分布から，generation世代目の候補をpopulation個取り出す
+# 1つ目は平均そのものにする
+# 乱数はseedとgenerationから決めるので，途中から再開しても同じ候補になる
+def SampleCandidates (mean:List[float], sigma:List[float], population:int, seed:int, generation:int) -> List[List[int]]:
+    rand = random.Random(seed * 1000003 + generation)
+    candidates = [[int(round(m)) for m in mean]]
+    while len(candidates) < population:
+        candidates.append([int(round(rand.gauss(m, s))) for m, s in zip(mean, sigma)])
+    return candidates
+
+# 上位の候補の平均と標準偏差から，次の世代の分布を作る
+def UpdateDistribution (eliteVectors:List[List[int]], sigma:List[float]) -> Tuple[List[float], List[float]]:
+    eliteCount = len(eliteVectors)
+    newMean = [sum(values) / eliteCount for values in zip(*eliteVectors)]
+    newSigma = []
+    for values, m, s in zip(zip(*eliteVectors), newMean, sigma):
+        eliteSigma = math.sqrt(sum((value - m) ** 2 for value in values) / eliteCount)
+        newSigma.append(max(TUNE_MIN_SIGMA, TUNE_SMOOTHING * eliteSigma + (1 - TUNE_SMOOTHING) * s))
+    return newMean, newSigma
+
+# 候補のベクトルのそれぞれで，seedsのゲームを行い，{キー: 集計結果}を返す
+# poolがNoneのときは順番に行う
+# 全ての候補の全てのゲームをまとめてプロセスプールに渡すので，候補の数より多いプロセスも使える
+def EvaluateCandidates (vectors:List[List[int]], baseWeights:Dict, seeds:List[int], pieceCount:int, reuseTree:bool, pool) -> Dict[str, Dict]:
+    baseConfig = decisionMaker.GetSearchConfig()
+    tasks = []
+    try:
+        for vector in vectors:
+            evaluator.SetEvalWeights(VectorToWeights(vector, baseWeights))
+            config = decisionMaker.GetSearchConfig()
+            tasks += [(VectorKey(vector), (config, seed, pieceCount, reuseTree)) for seed in seeds]
+
+        results = {VectorKey(vector): [] for vector in vectors}
+        if pool is None:
+            for key, task in tasks:
+                try:
+                    results[key].append(selfPlay.SelfPlayWorker(task))
+                except Exception as e:
+                    results[key].append({"seed": task[1], "error": repr(e)})
+        else:
+            futures = {pool.submit(selfPlay.SelfPlayWorker, task): (key, task[1]) for key, task in tasks}
+            for future in as_completed(futures):
+                key, seed = futures[future]
+                try:
+                    results[key].append(future.result())
+                except Exception as e:
+                    results[key].append({"seed": seed, "error": repr(e)})
+    finally:
+        # 候補の重みが残らないように戻す
+        decisionMaker.SetSearchConfig(baseConfig)
+
+    return {key: selfPlay.AggregateSelfPlayResults(gameResults) for key, gameResults in results.items()}
+
+# 評価関数の重みを，params/eval.pyと同じ形式のファイルに書き出す
+def WriteEvalParams (path:str, weights:Dict[str, Union[int, List[int]]]):
+    lines = ["# evalTuner.pyで調整した評価関数の重み\n"]
+    for name in evaluator.EVAL_WEIGHT_NAMES:
+        lines.append("%s = %r\n" % (name, weights[name]))
+    WriteFileAtomically(path, "".join(lines))
+
+# 途中で中断されても壊れたファイルが残らないように，一時ファイルに書いてから置き換える
+def WriteFileAtomically (path:str, content:str):
+    tmpPath = path + ".tmp"
+    with open(tmpPath, "w") as f:
+        f.write(content)
+    os.replace(tmpPath, path)
+
+# チェックポイントを読み込む（ファイルがない時はNoneを返す）
+# 設定が違うチェックポイントから再開すると結果が比べられなくなるので，エラーにする
+def LoadCheckpoint (path:Union[str, None], settings:Dict) -> Union[Dict, None]:
+    if path is None or not os.path.exists(path):
+        return None
+    with open(path) as f:
+        checkpoint = json.load(f)
+    if checkpoint["settings"] != settings:
+        Error("Checkpoint %s was made with different settings." % path)
+    return checkpoint
+
+# 評価関数の重みを調整する
+# 今の評価関数の重みから始めて，1世代ごとにチェックポイントと，それまでで一番良かった重みのパラメータファイルを書き出す
+# checkpointPathのファイルがあるときは，その続きから再開する（評価済みの候補はゲームを行わずに結果を使う）
+# 1世代ごとにonGeneration(世代の結果)を呼ぶ
+def RunTuner (
+    seeds:List[int],
+    pieceCount:int=selfPlay.SELF_PLAY_PIECE_COUNT,
+    generationCount:int=TUNE_GENERATION_COUNT,
+    population:int=TUNE_POPULATION,
+    processCount:int=1,
+    reuseTree:bool=False,
+    seed:int=0,
+    checkpointPath:Union[str, None]=None,
+    outputPath:str=TUNE_OUTPUT_PATH,
+    onGeneration:Union[Callable[[Dict], None], None]=None
+) -> Dict:
+    assert pieceCount > 0 and population >= 2
+    baseWeights = evaluator.GetEvalWeights()
+    settings = {
+        "seeds": list(seeds),
+        "pieceCount": pieceCount,
+        "population": population,
+        "seed": seed,
+        "reuseTree": reuseTree,
+        "weights": ["%s[%d]" % (name, idx) if idx is not None else name for name, idx in TUNE_WEIGHTS],
+        "searchConfig": decisionMaker.DescribeSearchConfig(),
+    }
+    checkpoint = LoadCheckpoint(checkpointPath, settings)
+    if checkpoint is None:
+        initialVector = WeightsToVector(baseWeights)
+        checkpoint = {
+            "settings": settings,
+            "baseWeights": baseWeights,
+            "generation": 0,
+            "mean": initialVector,
+            "sigma": [TUNE_INITIAL_SIGMA * max(abs(value), TUNE_MIN_SCALE) for value in initialVector],
+            "cache": {},
+            "best": None,
+            "history": [],
+        }
+    baseWeights = checkpoint["baseWeights"]
+    cache = checkpoint["cache"]
+    eliteCount = max(1, int(population * TUNE_ELITE_FRACTION))
+
+    pool = ProcessPoolExecutor(processCount, initializer=selfPlay.InitSelfPlayWorker) if processCount > 1 else None
+    try:
+        while checkpoint["generation"] < generationCount:
+            generation = checkpoint["generation"]
+            candidates = SampleCandidates(checkpoint["mean"], checkpoint["sigma"], population, seed, generation)
+
+            newVectors = []
+            for vector in candidates:
+                if VectorKey(vector) not in cache and vector not in newVectors:
+                    newVectors.append(vector)
+            cache.update(EvaluateCandidates(newVectors, baseWeights, seeds, pieceCount, reuseTree, pool))
+
+            ranked = sorted(candidates, key=lambda vector: CandidateFitness(cache[VectorKey(vector)]), reverse=True)
+            bestVector = ranked[0]
+            bestFitness = CandidateFitness(cache[VectorKey(bestVector)])
+            if checkpoint["best"] is None or bestFitness > checkpoint["best"]["fitness"]:
+                checkpoint["best"] = {"vector": bestVector, "fitness": bestFitness, "generation": generation}
+                WriteEvalParams(outputPath, VectorToWeights(bestVector, baseWeights))
+
+            checkpoint["mean"], checkpoint["sigma"] = UpdateDistribution(ranked[:eliteCount], checkpoint["sigma"])
+            checkpoint["generation"] = generation + 1
+            record = {
+                "generation": generation,
+                "evaluated": len(newVectors),
+                "meanFitness": CandidateFitness(cache[VectorKey(candidates[0])]),
+                "bestFitness": bestFitness,
+                "bestVector": bestVector,
+                "bestSoFar": checkpoint["best"]["fitness"],
+            }
+            checkpoint["history"].append(record)
+            if checkpointPath is not None:
+                WriteFileAtomically(checkpointPath, json.dumps(checkpoint))
+            if onGeneration is not None:
+                onGeneration(record)
+    finally:
+        if pool is not None:
+            # 中断された時は，まだ始まっていないゲームを取り消してから終了する
+            pool.shutdown(wait=True, cancel_futures=True)
+
+    best = checkpoint["best"]
+    return {
+        "generations": checkpoint["generation"],
+        "bestFitness": best["fitness"] if best is not None else None,
+        "bestGeneration": best["generation"] if best is not None else None,
+        "bestWeights": VectorToWeights(best["vector"], baseWeights) if best is not None else None,
+        "outputPath": outputPath,
+    }
+
+# 調整を行い，世代ごとの結果と最後の結果を1行ずつJSONで出力する
+def PrintTuner (seeds:List[int], **kwargs):
+    def WriteLine (record:Dict):
+        print(json.dumps(record), flush=True)
+
+    WriteLine(RunTuner(seeds, onGeneration=WriteLine, **kwargs))
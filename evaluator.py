@@ -1,68 +1,189 @@
 from lib import *
 from params.eval import *
+import runpy
 
-# 盤面自体の評価関数
-# mainBoardはミノを埋め込んだだけでまだRowを消していない盤面
-def EvalMainBoard (mainBoard, cleardRowCount:int, topRowIdx:List[int]) -> float:
-    # 凸凹具合を見る
-    # 前の列との差分をみて，その差分の合計を凸凹具合とする
-    
-    # 各列において，上から順に見ていって，一番最初にブロックがある部分のrowIdxを格納する
-    roughness = 0
-    for i in range(len(topRowIdx) - 1):
-        roughness += EVAL_ROUGHNESS_VAL[abs(topRowIdx[i] - topRowIdx[i+1])]
+# 盤面の評価をまとめて行う時だけnumpyを使う
+try:
+    import numpy as np
+except ImportError:
+    np = None
 
-    # ブロックの下にある空白をカウントする
-    # T-spinをさせるためにブロックの下にあるがT-spinできそうなところはカウントしない
+# 評価関数の重み（params/eval.pyのEVAL_で始まる変数）の名前
+# 評価関数はこのモジュールのグローバル変数として重みを読むので，SetEvalWeightsで差し替えられる
+EVAL_WEIGHT_NAMES = sorted(name for name in list(globals()) if name.startswith("EVAL_"))
+
+# 今の評価関数の重みを辞書で返す（リストの重みはcopyする）
+def GetEvalWeights () -> Dict[str, Union[int, List[int]]]:
+    weights = {}
+    for name in EVAL_WEIGHT_NAMES:
+        value = globals()[name]
+        weights[name] = list(value) if isinstance(value, list) else value
+    return weights
+
+# 評価関数の重みを差し替える（weightsに含まれない重みはそのまま）
+def SetEvalWeights (weights:Dict[str, Union[int, List[int]]]):
+    for name, value in weights.items():
+        if name not in EVAL_WEIGHT_NAMES:
+            Error("Unknown eval weight: %s" % name)
+        globals()[name] = list(value) if isinstance(value, list) else value
+
+# params/eval.pyと同じ形式のファイルから評価関数の重みを読み込んで辞書で返す
+def LoadEvalWeights (path:str) -> Dict[str, Union[int, List[int]]]:
+    return {name: value for name, value in runpy.run_path(path).items() if name in EVAL_WEIGHT_NAMES}
+
+# 盤面の評価に使う特徴量
+# ミノを置いた時は，ミノが占領する列（とその影響を受ける列）だけを更新する
+class BoardFeatures():
+    def __init__(self, topRowIdx:List[int], roughness:int, blankCounts:List[int], blankUnderBlockCols:List[int], blankUnderBlock:int, minTopRowIdx:int, lowestTopRowIdxs:Tuple[int, int]):
+        self.topRowIdx = topRowIdx # 各列の一番上のブロックのrowIdx
+        self.roughness = roughness # 隣り合う列の高さの差の評価の合計
+        self.blankCounts = blankCounts # 各列の一番上のブロックより下にある空白の数
+        self.blankUnderBlockCols = blankUnderBlockCols # 列ごとのブロックの下にある空白のカウント
+        self.blankUnderBlock = blankUnderBlock
+        self.minTopRowIdx = minTopRowIdx # 一番高い列のrowIdx
+        self.lowestTopRowIdxs = lowestTopRowIdxs # 一番低い列と2番目に低い列のrowIdx
+
+# colIdx列目について，ブロックの下にある空白をカウントする
+# T-spinをさせるためにブロックの下にあるがT-spinできそうなところはカウントしない
+# colIdx-2列目からcolIdx+2列目までの状態に依存する
+def CountBlankUnderBlockOfCol (mainBoard:List[int], cleardRowCount:int, topRowIdx:List[int], colIdx:int) -> int:
     blankUnderBlock = 0
     continuousBlank = 0
     colBlockCount = 0
-    for colIdx in range(BOARD_WIDTH):
-        for rowIdx in range(topRowIdx[colIdx] + cleardRowCount, BOARD_HEIGHT):
-            # ブロックがある
-            if mainBoard[rowIdx] & (0b1000000000 >> colIdx) != 0:
-                colBlockCount += 1
-                continuousBlank = 0
+    for rowIdx in range(topRowIdx[colIdx] + cleardRowCount, BOARD_HEIGHT):
+        # ブロックがある
+        if mainBoard[rowIdx] & (0b1000000000 >> colIdx) != 0:
+            colBlockCount += 1
+            continuousBlank = 0
+            continue
+        
+        if continuousBlank == 0:
+            continuousBlank = 1
+
+            # 上にブロックが2個以上あるときはダメ
+            if colBlockCount >= 2:
+                blankUnderBlock += 1
+                continue
+
+            # 隣の高さはこのマスより低い
+            if ((colIdx - 1 >= 0 and rowIdx < topRowIdx[colIdx - 1]) and 
+                (colIdx - 2 >= 0 and mainBoard[rowIdx] & (0b1000000000 >> (colIdx - 2)) == 0)):
+                continue
+
+            # 隣の高さはこのマスより低い
+            if ((colIdx + 1 < BOARD_WIDTH and rowIdx < topRowIdx[colIdx + 1]) and 
+                (colIdx + 2 < BOARD_WIDTH and mainBoard[rowIdx] & (0b1000000000 >> (colIdx + 2)) == 0)):
                 continue
             
-            if continuousBlank == 0:
-                continuousBlank = 1
-
-                # 上にブロックが2個以上あるときはダメ
-                if colBlockCount >= 2:
-                    blankUnderBlock += 1
-                    continue
-
-                # 隣の高さはこのマスより低い
-                if ((colIdx - 1 >= 0 and rowIdx < topRowIdx[colIdx - 1]) and 
-                    (colIdx - 2 >= 0 and mainBoard[rowIdx] & (0b1000000000 >> (colIdx - 2)) == 0)):
-                    continue
-
-                # 隣の高さはこのマスより低い
-                if ((colIdx + 1 < BOARD_WIDTH and rowIdx < topRowIdx[colIdx + 1]) and 
-                    (colIdx + 2 < BOARD_WIDTH and mainBoard[rowIdx] & (0b1000000000 >> (colIdx + 2)) == 0)):
-                    continue
-                
-                # 空白を見つけた時は
-                # その上にあるブロックの数だけ、評価値に影響を与えることにする。
-                blankUnderBlock += colBlockCount
+            # 空白を見つけた時は
+            # その上にあるブロックの数だけ、評価値に影響を与えることにする。
+            blankUnderBlock += colBlockCount
+        else:
+            # 空白を見つけた時は
+            # その上にあるブロックの数だけ、評価値に影響を与えることにする。
+            blankUnderBlock += colBlockCount
+
+    return blankUnderBlock
+
+# 一番低い列と2番目に低い列のrowIdxを返す
+def GetLowestTopRowIdxs (topRowIdx:List[int]) -> Tuple[int, int]:
+    lowest, secondLowest = -1, -1
+    for rowIdx in topRowIdx:
+        if rowIdx > lowest:
+            lowest, secondLowest = rowIdx, lowest
+        elif rowIdx > secondLowest:
+            secondLowest = rowIdx
+    return lowest, secondLowest
+
+# 盤面全体から特徴量を計算する
+# mainBoardはミノを埋め込んだだけでまだRowを消していない盤面
+def CalcBoardFeatures (mainBoard:List[int], cleardRowCount:int, topRowIdx:List[int]) -> BoardFeatures:
+    # 凸凹具合を見る
+    # 前の列との差分をみて，その差分の合計を凸凹具合とする
+    roughness = 0
+    for i in range(BOARD_WIDTH - 1):
+        roughness += EVAL_ROUGHNESS_VAL[abs(topRowIdx[i] - topRowIdx[i+1])]
+    blankCounts = [
+        sum(1 for rowIdx in range(topRowIdx[colIdx], BOARD_HEIGHT) if mainBoard[rowIdx] & (0b1000000000 >> colIdx) == 0)
+        for colIdx in range(BOARD_WIDTH)
+    ]
+    blankUnderBlockCols = [CountBlankUnderBlockOfCol(mainBoard, cleardRowCount, topRowIdx, colIdx) for colIdx in range(BOARD_WIDTH)]
+    return BoardFeatures(
+        list(topRowIdx),
+        roughness,
+        blankCounts,
+        blankUnderBlockCols,
+        sum(blankUnderBlockCols),
+        min(topRowIdx),
+        GetLowestTopRowIdxs(topRowIdx)
+    )
+
+# ミノを置く前の盤面の特徴量featuresから，directedMinoを埋め込んだ後の盤面の特徴量を計算する
+# joinedMainBoard, joinedTopRowIdxはミノを埋め込んだだけでまだRowを消していない盤面
+# ラインが消える時は，ブロックの下の空白のカウントだけ全ての列で計算し直す
+def UpdateBoardFeatures (features:BoardFeatures, joinedMainBoard:List[int], cleardRowCount:int, joinedTopRowIdx:List[int], directedMino:DirectedMino) -> BoardFeatures:
+    topRowIdx = list(joinedTopRowIdx)
+    oldTopRowIdx = features.topRowIdx
+
+    # ミノが占領する列ごとのブロックの数
+    # 一番上のブロックより下の空白の数は，(列の高さ) - (ブロックの数)の変化から求まる
+    blankCounts = list(features.blankCounts)
+    minCol, maxCol = BOARD_WIDTH, -1
+    for pos0, _ in GetOccupiedPositions(directedMino):
+        blankCounts[pos0] -= 1
+        if pos0 < minCol:
+            minCol = pos0
+        if pos0 > maxCol:
+            maxCol = pos0
+
+    # ミノを置くと列は高くなるだけなので，一番低い2列のどちらかが高くなった時だけ計算し直す
+    minTopRowIdx = features.minTopRowIdx
+    lowestTopRowIdxs = features.lowestTopRowIdxs
+    isLowestChanged = False
+    for colIdx in range(minCol, maxCol + 1):
+        blankCounts[colIdx] += oldTopRowIdx[colIdx] - topRowIdx[colIdx]
+        if topRowIdx[colIdx] < minTopRowIdx:
+            minTopRowIdx = topRowIdx[colIdx]
+        if oldTopRowIdx[colIdx] >= lowestTopRowIdxs[1]:
+            isLowestChanged = True
+    if isLowestChanged:
+        lowestTopRowIdxs = GetLowestTopRowIdxs(topRowIdx)
+
+    # 高さが変わった列に隣り合う部分だけ凸凹具合を計算し直す
+    roughness = features.roughness
+    for i in range(max(minCol - 1, 0), min(maxCol, BOARD_WIDTH - 2) + 1):
+        roughness += EVAL_ROUGHNESS_VAL[abs(topRowIdx[i] - topRowIdx[i+1])] - EVAL_ROUGHNESS_VAL[abs(oldTopRowIdx[i] - oldTopRowIdx[i+1])]
+
+    # ブロックの下の空白のカウントは左右2列の状態に依存するので，その範囲を計算し直す
+    # 一番上のブロックより下に空白がない列は，他の列によらず0になる
+    # ミノが占領していない列が左右の列に依存するのは，一番上のブロックのすぐ下が空白の時だけ
+    if cleardRowCount == 0:
+        blankUnderBlockCols = list(features.blankUnderBlockCols)
+        blankUnderBlock = features.blankUnderBlock
+        for colIdx in range(max(minCol - 2, 0), min(maxCol + 2, BOARD_WIDTH - 1) + 1):
+            if blankCounts[colIdx] == 0:
+                blankUnderBlockCol = 0
+            elif minCol <= colIdx <= maxCol or joinedMainBoard[topRowIdx[colIdx] + 1] & (0b1000000000 >> colIdx) == 0:
+                blankUnderBlockCol = CountBlankUnderBlockOfCol(joinedMainBoard, cleardRowCount, topRowIdx, colIdx)
             else:
-                # 空白を見つけた時は
-                # その上にあるブロックの数だけ、評価値に影響を与えることにする。
-                blankUnderBlock += colBlockCount
+                continue
+            blankUnderBlock += blankUnderBlockCol - blankUnderBlockCols[colIdx]
+            blankUnderBlockCols[colIdx] = blankUnderBlockCol
+    else:
+        blankUnderBlockCols = [CountBlankUnderBlockOfCol(joinedMainBoard, cleardRowCount, topRowIdx, colIdx) for colIdx in range(BOARD_WIDTH)]
+        blankUnderBlock = sum(blankUnderBlockCols)
 
-        continuousBlank = 0
-        colBlockCount = 0
-    
-    topRowIdxSorted = copy.copy(topRowIdx)
-    topRowIdxSorted.sort()
+    return BoardFeatures(topRowIdx, roughness, blankCounts, blankUnderBlockCols, blankUnderBlock, minTopRowIdx, lowestTopRowIdxs)
+
+# 特徴量から盤面自体の評価値を計算する
+def EvalBoardFeatures (features:BoardFeatures, cleardRowCount:int) -> float:
     # 盤面の高さを見る
-    height = BOARD_HEIGHT - topRowIdxSorted[0] - cleardRowCount
+    height = BOARD_HEIGHT - features.minTopRowIdx - cleardRowCount
     
     # 高さが一番低い列が他の列に対して3以上の高さの差がある、かつブロックの下に隙間がない時、
     # テトリスできる可能性が高い。
     tetris = 0
-    if abs(topRowIdxSorted[-1] - topRowIdxSorted[-2]) >= 3 and blankUnderBlock == 0:
+    if abs(features.lowestTopRowIdxs[0] - features.lowestTopRowIdxs[1]) >= 3 and features.blankUnderBlock == 0:
         tetris = EVAL_TETRIS_PATTERN
     
     # 高さが10以上のときはラインを消すことを最優先にしてもらう。
@@ -76,116 +197,180 @@ def EvalMainBoard (mainBoard, cleardRowCount:int, topRowIdx:List[int]) -> float:
     else:
         heightEval += EVAL_PERFECT_CLEAR
     
-    return tetris + heightEval + roughness * EVAL_ROUGHNESS + blankUnderBlock * EVAL_BLANK_UNDER_BLOCK
+    return tetris + heightEval + features.roughness * EVAL_ROUGHNESS + features.blankUnderBlock * EVAL_BLANK_UNDER_BLOCK
+
+# 盤面自体の評価関数
+# mainBoardはミノを埋め込んだだけでまだRowを消していない盤面
+def EvalMainBoard (mainBoard, cleardRowCount:int, topRowIdx:List[int]) -> float:
+    return EvalBoardFeatures(CalcBoardFeatures(mainBoard, cleardRowCount, topRowIdx), cleardRowCount)
 
-# Tスピンの判定
-def IsTSpin (joinedMainBoard:List[int], directedMino:DirectedMino, moveList:List[MoveInt]) -> bool:
+# 複数の盤面の評価をnumpyでまとめて行う（EvalMainBoardと全く同じ値を返す）
+# mainBoardsはミノを埋め込んだだけでまだRowを消していない盤面のリスト
+# 消えるライン数も盤面から求める
+def EvalMainBoardBatch (mainBoards:List[List[int]]) -> List[int]:
+    if np is None:
+        Error("numpy is required for batch evaluation.")
+    if not mainBoards:
+        return []
+
+    boards = np.array(mainBoards, dtype=np.uint16)
+    boardCount = len(mainBoards)
+    clearedRowCounts = (boards == 0b1111111111).sum(axis=1)
+
+    # 全ての盤面で空の上の部分は計算しない
+    nonEmptyRows = np.flatnonzero(boards.any(axis=0))
+    firstRowIdx = nonEmptyRows[0] if len(nonEmptyRows) > 0 else BOARD_HEIGHT - 1
+    boards = boards[:, firstRowIdx:]
+    rows = np.arange(firstRowIdx, BOARD_HEIGHT).reshape(1, -1, 1)
+
+    # blocks[i][rowIdx][colIdx]はブロックがあるかどうか
+    blocks = ((boards[:, :, np.newaxis] >> np.arange(BOARD_WIDTH - 1, -1, -1, dtype=np.uint16)) & 1).astype(bool)
+
+    # 各列において，上から順に見ていって，一番最初にブロックがある部分のrowIdx
+    topRowIdx = np.where(blocks.any(axis=1), blocks.argmax(axis=1) + firstRowIdx, BOARD_HEIGHT)
+
+    # 凸凹具合を見る
+    roughness = np.array(EVAL_ROUGHNESS_VAL)[np.abs(np.diff(topRowIdx, axis=1))].sum(axis=1)
+
+    # ブロックの下にある空白をカウントする
+    # 各列でtopRowIdx + clearedRowCountより下の部分を見る
+    startRowIdx = (topRowIdx + clearedRowCounts[:, np.newaxis])[:, np.newaxis, :]
+    isInRange = rows >= startRowIdx
+    blanks = ~blocks & isInRange
+    # 空白の上にある(見ている範囲の)ブロックの数
+    colBlockCounts = np.cumsum(blocks & isInRange, axis=1)
+    # 連続する空白の最初かどうか
+    isAboveBlock = np.zeros_like(blocks)
+    isAboveBlock[:, 1:, :] = blocks[:, :-1, :]
+    isFirstBlank = blanks & ((rows == startRowIdx) | isAboveBlock)
+    # 隣の列の高さがこのマスより低く，その隣が空白の時はT-spinできそうなのでカウントしない
+    leftTopRowIdx = np.zeros_like(topRowIdx)
+    leftTopRowIdx[:, 1:] = topRowIdx[:, :-1]
+    isLeftBlank = np.zeros_like(blocks)
+    isLeftBlank[:, :, 2:] = ~blocks[:, :, :-2]
+    rightTopRowIdx = np.zeros_like(topRowIdx)
+    rightTopRowIdx[:, :-1] = topRowIdx[:, 1:]
+    isRightBlank = np.zeros_like(blocks)
+    isRightBlank[:, :, :-2] = ~blocks[:, :, 2:]
+    isTSpinnable = ((rows < leftTopRowIdx[:, np.newaxis, :]) & isLeftBlank) | ((rows < rightTopRowIdx[:, np.newaxis, :]) & isRightBlank)
+    firstBlankCounts = np.where(colBlockCounts >= 2, 1, np.where(isTSpinnable, 0, colBlockCounts))
+    blankUnderBlock = (np.where(isFirstBlank, firstBlankCounts, colBlockCounts) * blanks).reshape(boardCount, -1).sum(axis=1)
+
+    # 盤面の高さを見る
+    sortedTopRowIdx = np.sort(topRowIdx, axis=1)
+    height = BOARD_HEIGHT - sortedTopRowIdx[:, 0] - clearedRowCounts
+
+    # 高さが一番低い列が他の列に対して3以上の高さの差がある、かつブロックの下に隙間がない時、
+    # テトリスできる可能性が高い。
+    tetris = np.where((np.abs(sortedTopRowIdx[:, -1] - sortedTopRowIdx[:, -2]) >= 3) & (blankUnderBlock == 0), EVAL_TETRIS_PATTERN, 0)
+
+    # 高さが10以上のときはラインを消すことを最優先にしてもらう。
+    heightEval = np.select(
+        [height >= 10, height >= 5, height >= 1],
+        [height * EVAL_HEIGHT_UPPER_THAN10, height * EVAL_HEIGHT_UPPER_THAN5, height * EVAL_HEIGHT],
+        EVAL_PERFECT_CLEAR
+    )
+
+    return (tetris + heightEval + roughness * EVAL_ROUGHNESS + blankUnderBlock * EVAL_BLANK_UNDER_BLOCK).tolist()
+
+# Tスピンの判定に使う，Tミノの4隅のbitmaskの前計算
+# 盤面の行を左右に1マスずつ広げて，盤面の外を埋まっているとみなした12bitの行で判定する
+# globalTSpinCornerMasks[direction][pos0] = (4隅の列のmask, 上の行の凸側の隅のmask, 下の行の凸側の隅のmask)
+TSPIN_WALL_ROW = 0b100000000001
+TSPIN_OUTSIDE_ROW = 0b111111111111
+def BuildTSpinCornerMasks () -> List[List[Tuple[int, int, int]]]:
+    cornerMasks = []
+    for direction in range(4):
+        cornerMasksOfDirection = []
+        for pos0 in range(BOARD_WIDTH):
+            left = 0b100000000000 >> pos0 # pos0 - 1列目
+            right = 0b100000000000 >> (pos0 + 2) # pos0 + 1列目
+            if direction is DIRECTION.N:
+                frontMasks = (left | right, 0)
+            elif direction is DIRECTION.E:
+                frontMasks = (right, right)
+            elif direction is DIRECTION.S:
+                frontMasks = (0, left | right)
+            else:
+                frontMasks = (left, left)
+            cornerMasksOfDirection.append((left | right,) + frontMasks)
+        cornerMasks.append(cornerMasksOfDirection)
+    return cornerMasks
+
+globalTSpinCornerMasks = BuildTSpinCornerMasks()
+
+# Tスピンの種類の判定
+# mainBoardはミノを置く前でも置いた後でもよい（4隅はTミノと重ならないため）
+# kickIdxはpathの最後の回転で何番目のkickを使ったか
+# pathの最後の操作や含まれる操作は，listに戻さずに判定する
+def GetSpin (mainBoard:List[int], directedMino:DirectedMino, path:PathInt, kickIdx:Union[int, None]) -> SpinInt:
     """
     T-Spinの判定条件
     ①ミノ固定時にTミノの4隅が3つ以上埋まっていること
     ②最後の動作が回転であること
+
+    T-Spin Miniの判定条件
+    ①T-Spinの条件を満たしていること
+    ②ミノ固定時のTミノの4隅のうち，凸側の1つが空いていること
+    ③SRSにおける回転補正の4番目(回転中心移動が(±1, ±2))でないこと
     """
 
     # 前提条件：directedMinoがTミノであること
     if directedMino.mino is not MINO.T:
-        return False
+        return SPIN.NONE
+
+    # T-Spinの②の判定
+    if GetLastMove(path) is not MOVE.DROP:
+        Error("Invalid MoveList from GetSpin.")
+    lastMove = GetLastMove(RemoveLastMove(path))
+    if lastMove is None: # DROPしかないので最後が回転ではない
+        return SPIN.NONE
+    if lastMove is not MOVE.L_ROT and lastMove is not MOVE.R_ROT: # L_ROTでもR_ROTでもない場合は最後が回転ではない
+        return SPIN.NONE
+    if not PathContainsMove(path, MOVE.DOWN): # ただのROT→DROPというような経路を除く
+        return SPIN.NONE
 
-    # ①の判定
-    count = 0
+    # T-Spinの①の判定
     pos0, pos1 = directedMino.pos
-    if pos0 - 1 < 0 or pos1 - 1 < 0 or joinedMainBoard[pos1-1] & (0b1000000000 >> (pos0-1)) > 0: # 左上
-        count += 1
-    if pos0 - 1 < 0 or pos1 + 1 >= BOARD_HEIGHT or joinedMainBoard[pos1+1] & (0b1000000000 >> (pos0-1)) > 0: # 左下
-        count += 1
-    if pos0 + 1 >= BOARD_WIDTH or pos1 + 1 >= BOARD_HEIGHT or joinedMainBoard[pos1+1] & (0b1000000000 >> (pos0+1)) > 0: # 右下
-        count += 1
-    if pos0 + 1 >= BOARD_WIDTH or pos1 - 1 < 0 or joinedMainBoard[pos1-1] & (0b1000000000 >> (pos0+1)) > 0: # 右上
-        count += 1
-    if count <= 2:
-        return False
-
-    # ②の判定
-    if moveList[-1] is MOVE.DROP:
-        if len(moveList) < 2: # DROPしかないので最後が回転ではない
-            return False
-        if moveList[-2] is not MOVE.L_ROT and moveList[-2] is not MOVE.R_ROT: # L_ROTでもR_ROTでもない場合は最後が回転ではない
-            return False
-        if MOVE.DOWN not in moveList: # ただのROT→DROPというようなmoveListを除く
-            return False
-    else:
-        Error("Invalid MoveList from IsTSpin.")
+    cornerMask, upperFrontMask, lowerFrontMask = globalTSpinCornerMasks[directedMino.direction][pos0]
+    upperRow = (mainBoard[pos1-1] << 1) | TSPIN_WALL_ROW if pos1 >= 1 else TSPIN_OUTSIDE_ROW
+    lowerRow = (mainBoard[pos1+1] << 1) | TSPIN_WALL_ROW if pos1 + 1 < BOARD_HEIGHT else TSPIN_OUTSIDE_ROW
+    upperCorners = upperRow & cornerMask
+    lowerCorners = lowerRow & cornerMask
+    if upperCorners != cornerMask and lowerCorners != cornerMask: # 上下どちらかの2隅が埋まっていないと3つ以上にならない
+        return SPIN.NONE
+    if not upperCorners or not lowerCorners:
+        return SPIN.NONE
 
-    return True
+    # T-Spin Miniの②の判定
+    if upperRow & upperFrontMask == upperFrontMask and lowerRow & lowerFrontMask == lowerFrontMask:
+        return SPIN.FULL
 
-# Tスピン-miniであるかどうかの判定
-# Tスピンであることは前提として判定を省略する
-def IsTSpinMini (joinedMainBoard:List[int], directedMino:DirectedMino, moveList:List[MoveInt]) -> bool:
-    """
-    T-Spin Miniの判定条件
-    ①T-Spinの条件を満たしていること
-    ②ミノ固定時のTミノの4隅のうち，凸側の1つが空いていること
-    ③SRSにおける回転補正の4番目(回転中心移動が(±1, ±2))でないこと
-    """
+    # T-Spin Miniの③の判定
+    if kickIdx == 4:
+        return SPIN.FULL
 
-    # ②の判定
-    pos0, pos1 = directedMino.pos
-    if directedMino.direction is DIRECTION.N:
-        if (
-            (pos0 - 1 < 0 or pos1 - 1 < 0 or joinedMainBoard[pos1-1] & (0b1000000000 >> (pos0-1)) > 0) and # 左上が空いていない
-            (pos0 + 1 >= BOARD_WIDTH or pos1 - 1 < 0 or joinedMainBoard[pos1-1] & (0b1000000000 >> (pos0+1)) > 0) # 右上が空いていない
-        ):
-            return False
-    elif directedMino.direction is DIRECTION.E:
-        if (
-            (pos0 + 1 >= BOARD_WIDTH or pos1 + 1 >= BOARD_HEIGHT or joinedMainBoard[pos1+1] & (0b1000000000 >> (pos0+1)) > 0) and # 右下が空いていない
-            (pos0 + 1 >= BOARD_WIDTH or pos1 - 1 < 0 or joinedMainBoard[pos1-1] & (0b1000000000 >> (pos0+1)) > 0) # 右上が空いていない
-        ):
-            return False
-    elif directedMino.direction is DIRECTION.S:
-        if (
-            (pos0 + 1 >= BOARD_WIDTH or pos1 + 1 >= BOARD_HEIGHT or joinedMainBoard[pos1+1] & (0b1000000000 >> (pos0+1)) > 0) and # 右下が空いていない
-            (pos0 - 1 < 0 or pos1 + 1 >= BOARD_HEIGHT or joinedMainBoard[pos1+1] & (0b1000000000 >> (pos0-1)) > 0) # 左下が空いていない
-        ):
-            return False
-    else:
-        if (
-            (pos0 - 1 < 0 or pos1 - 1 < 0 or joinedMainBoard[pos1-1] & (0b1000000000 >> (pos0-1)) > 0) and # 左上が空いていない
-            (pos0 - 1 < 0 or pos1 + 1 >= BOARD_HEIGHT or joinedMainBoard[pos1+1] & (0b1000000000 >> (pos0-1)) > 0) # 左下が空いていない
-        ):
-            return False
-    
-    # ③の判定
-    lastRotate = moveList[-2] # DROPの前の最後の回転を取得
-    reversedLastRotate = MOVE.R_ROT if lastRotate is MOVE.L_ROT else MOVE.L_ROT
-    # joinedMainBoardからdirectedMinoの部分のブロックを消去
-    occupiedPositions = GetOccupiedPositions(directedMino)
-    deletedMainBoard = copy.copy(joinedMainBoard)
-    for pos0, pos1 in occupiedPositions:
-        deletedMainBoard[pos1] &= 0b1111111111 ^ (0b1000000000 >> pos0)
-    # 回転補正が4番目であるならMiniではない
-    if GetRotateNum(directedMino, reversedLastRotate, deletedMainBoard) == 4:
-        return False
-    
-    return True
+    return SPIN.MINI
 
 # 経路・ライン数の評価関数
-def EvalPath (moveList:List[MoveInt], clearedRowCount:int, joinedMainBoard:List[int], directedMino:DirectedMino, backToBack:bool, ren:int) -> float:
+# spinは置き場所を求めたときに記録したTスピンの種類
+def EvalPath (path:PathInt, clearedRowCount:int, spin:SpinInt, backToBack:bool, ren:int) -> float:
     t_spin = 0
     isBackToBack = False 
 
-    if IsTSpin(joinedMainBoard, directedMino, moveList):
-        if IsTSpinMini(joinedMainBoard, directedMino, moveList):
-            if clearedRowCount == 1:
-                t_spin = EVAL_T_SPIN_MINI_SINGLE
-            elif clearedRowCount == 2:
-                t_spin = EVAL_T_SPIN_MINI_DOUBLE
-        else:
-            if clearedRowCount == 1:
-                t_spin = EVAL_T_SPIN_SINGLE
-            elif clearedRowCount == 2:
-                t_spin = EVAL_T_SPIN_DOUBLE
-            elif clearedRowCount == 3:
-                t_spin = EVAL_T_SPIN_TRIPLE
+    if spin is SPIN.MINI:
+        if clearedRowCount == 1:
+            t_spin = EVAL_T_SPIN_MINI_SINGLE
+        elif clearedRowCount == 2:
+            t_spin = EVAL_T_SPIN_MINI_DOUBLE
+        isBackToBack = True
+    elif spin is SPIN.FULL:
+        if clearedRowCount == 1:
+            t_spin = EVAL_T_SPIN_SINGLE
+        elif clearedRowCount == 2:
+            t_spin = EVAL_T_SPIN_DOUBLE
+        elif clearedRowCount == 3:
+            t_spin = EVAL_T_SPIN_TRIPLE
         isBackToBack = True
     
     if clearedRowCount == 4:
@@ -193,7 +378,7 @@ def EvalPath (moveList:List[MoveInt], clearedRowCount:int, joinedMainBoard:List[
 
     isBackToBack = isBackToBack and backToBack
 
-    evalSoftDrop = EVAL_SOFTDROP if MOVE.DROP in moveList else 0
+    evalSoftDrop = EVAL_SOFTDROP if PathContainsMove(path, MOVE.DROP) else 0
     evalRen = EVAL_REN[ren] if ren < len(EVAL_REN) else EVAL_REN[-1]
 
     eval = t_spin + \
@@ -203,20 +388,21 @@ def EvalPath (moveList:List[MoveInt], clearedRowCount:int, joinedMainBoard:List[
            evalSoftDrop
     return eval
 
-def Score(isTspin:bool, isTspinmini:bool, clearedRowCount:int, backToBack:bool, ren:int) -> Tuple[int, bool, int]:
+# spinは置き場所を求めたときに記録したTスピンの種類
+def Score(spin:SpinInt, clearedRowCount:int, backToBack:bool, ren:int) -> Tuple[int, bool, int]:
     score = 0
     isTspinOrTetris = False
 
-    if isTspin:
-        if isTspinmini:
-            score += SCORE_T_SPIN_MINI
-        else:
-            if clearedRowCount == 1:
-                score += SCORE_T_SPIN_SINGLE
-            elif clearedRowCount == 2:
-                score += SCORE_T_SPIN_DOUBLE
-            elif clearedRowCount == 3:
-                score += SCORE_T_SPIN_TRIPLE
+    if spin is SPIN.MINI:
+        score += SCORE_T_SPIN_MINI
+        isTspinOrTetris = True
+    elif spin is SPIN.FULL:
+        if clearedRowCount == 1:
+            score += SCORE_T_SPIN_SINGLE
+        elif clearedRowCount == 2:
+            score += SCORE_T_SPIN_DOUBLE
+        elif clearedRowCount == 3:
+            score += SCORE_T_SPIN_TRIPLE
         isTspinOrTetris = True
 
     if clearedRowCount == 1:
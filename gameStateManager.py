@@ -18,6 +18,8 @@ from params.eval import *
 
 # GetOccupiedPositionsの前計算
 InitGetOccupiedPositions()
+# ミノの当たり判定用のbitmaskの前計算（GetOccupiedPositionsを利用する）
+InitCollisionTable()
 
 import boardWatcher
 import decisionMaker
@@ -25,6 +27,13 @@ import minoMover
 import simulator
 import evaluator
 import openTemplateMaker
+import ponderer
+import benchmark
+import selfPlay
+import evalTuner
+import profiler
+import gameTrace
+import perft
 
 # 探索の深さの設定
 INIT_SEARCH_LIMIT = 4
@@ -32,14 +41,74 @@ INIT_BEAM_WIDTH = [3,3,3]
 
 # 実行時引数の設定
 import argparse
+import functools
+import json
 parser = argparse.ArgumentParser()
-parser.add_argument("mode", help="Select mode (app/sim)")
+parser.add_argument("mode", help="Select mode (app/sim/bench/selfplay/tune/replay/perft)")
 parser.add_argument("-q", "--quickSearch", help="Reduce the number of search nodes, and speed up calculation.", action="store_true")
 parser.add_argument("-m", "--multiPlay", help="Play with AI in multiplayer-mode.", action="store_true")
+parser.add_argument("-c", "--completeSearch", help="Find every reachable placement (including tucks and spins after soft drop) by breadth-first search.", action="store_true")
+parser.add_argument("-p", "--processCount", help="Search root moves in parallel with this number of worker processes (0 or 1 means serial search).", type=int, default=0)
+parser.add_argument("-t", "--timeLimit", help="Time limit (s) for one decision. In app mode it is counted from when the current mino appears.", type=float, default=None)
+parser.add_argument("-r", "--reuseTree", help="Decide one mino at a time, reusing the search tree of the previous decision when the board is as predicted.", action="store_true")
+parser.add_argument("-b", "--batchEval", help="Evaluate all boards of one search depth at once with numpy (numpy is required).", action="store_true")
+parser.add_argument("-g", "--globalBeam", help="Search all root moves in one beam that is pruned globally at every depth, instead of one beam per root move.", action="store_true")
+parser.add_argument("--moveGen", help="Comma-separated placement generation policies for each search depth, from the first mino (%s). Deeper depths use the last one. Overrides -q and -c." % "/".join(MOVEGEN_NAMES), default=None)
+parser.add_argument("--beamWidth", help="Comma-separated beam width for each search depth after the first mino (e.g. 3,3,3). The search depth is one more than the number of widths.", default=None)
+parser.add_argument("--benchGames", help="Number of seeded games in bench mode.", type=int, default=benchmark.BENCHMARK_GAME_COUNT)
+parser.add_argument("--benchPieces", help="Number of minos placed in each game in bench mode.", type=int, default=benchmark.BENCHMARK_PIECE_COUNT)
+parser.add_argument("--benchSeed", help="Seed of the first game in bench mode (the following games use the next seeds).", type=int, default=benchmark.BENCHMARK_SEED)
+parser.add_argument("--benchDecide", help="Decide one mino at a time with Decide instead of MultiDecide in bench mode.", action="store_true")
+parser.add_argument("--benchNoMemory", help="Skip the tracemalloc memory measurement in bench mode.", action="store_true")
+parser.add_argument("--benchOutput", help="Append the JSON result of bench mode to this file instead of printing it.", default=None)
+parser.add_argument("--fastForward", help="In sim mode, place this number of minos (0 means until topping out) without drawing or waiting, then print a summary of the game as JSON.", type=int, default=None)
+parser.add_argument("--seed", help="Seed of the mino generator in sim mode. In selfplay and tune modes, the seed of the first game (game i uses seed + i, default 0).", type=int, default=None)
+parser.add_argument("--selfPlayGames", help="Number of seeded games in selfplay mode (for each candidate in tune mode).", type=int, default=1)
+parser.add_argument("--selfPlayPieces", help="Maximum number of minos placed in each game in selfplay and tune modes.", type=int, default=selfPlay.SELF_PLAY_PIECE_COUNT)
+parser.add_argument("--selfPlayProcesses", help="Play games of selfplay and tune modes in parallel with this number of worker processes (0 means the number of CPUs, 1 means serial).", type=int, default=1)
+parser.add_argument("--selfPlayOutput", help="Append the JSON lines of selfplay mode to this file instead of printing them.", default=None)
+parser.add_argument("--evalParams", help="Load the eval weights from this file (same format as params/eval.py) instead of params/eval.py.", default=None)
+parser.add_argument("--tuneGenerations", help="Number of generations in tune mode.", type=int, default=evalTuner.TUNE_GENERATION_COUNT)
+parser.add_argument("--tunePopulation", help="Number of candidate weight vectors in each generation in tune mode.", type=int, default=evalTuner.TUNE_POPULATION)
+parser.add_argument("--tuneCheckpoint", help="Checkpoint file of tune mode. If it exists, tuning resumes from it.", default=None)
+parser.add_argument("--tuneOutput", help="Write the best eval weights found in tune mode to this file.", default=evalTuner.TUNE_OUTPUT_PATH)
+parser.add_argument("--profile", help="Write one JSON line of search counters and per-phase timings for each decision to this file ('-' for stdout).", default=None)
+parser.add_argument("--profileHistogram", help="With --profile, also write a histogram of the time of each call for every phase.", action="store_true")
+parser.add_argument("--trace", help="In app mode, append every observed board and decision to this binary trace file. In replay mode, the trace file to replay.", default=None)
+parser.add_argument("--perftDepth", help="Number of minos placed from each board in perft mode.", type=int, default=perft.PERFT_DEPTH)
+parser.add_argument("--perftMoveGen", help="Comma-separated placement generation policies counted in perft mode (default: all).", default=None)
+parser.add_argument("--perftRecord", help="In perft mode, also print the counts in the format of perft.PERFT_EXPECTED.", action="store_true")
+parser.add_argument("--ponder", help="While inputting the last planned move, search the next board for every possible new mino with this number of worker processes (app mode, 0 means no pondering).", type=int, default=0)
 args = parser.parse_args()
 
 if args.quickSearch:
     decisionMaker.quickSearch = True
+if args.completeSearch:
+    decisionMaker.completeSearch = True
+if args.moveGen is not None:
+    for name in args.moveGen.split(","):
+        if name not in MOVEGEN_NAMES:
+            Error("Unknown placement generation policy: %s (choose from %s)" % (name, "/".join(MOVEGEN_NAMES)))
+        decisionMaker.moveGenPolicies.append(MOVEGEN_NAMES.index(name))
+if args.globalBeam:
+    decisionMaker.globalBeam = True
+if args.batchEval:
+    if evaluator.np is None:
+        Error("numpy is not installed. Install numpy to use --batchEval.")
+    decisionMaker.batchEval = True
+if args.evalParams is not None:
+    evaluator.SetEvalWeights(evaluator.LoadEvalWeights(args.evalParams))
+if args.profile is not None:
+    profiler.EnableProfiler(args.profile if args.profile != "-" else None, args.profileHistogram)
+if args.processCount > 1:
+    decisionMaker.InitSearchPool(args.processCount)
+if args.timeLimit is not None:
+    decisionMaker.SEARCH_TIME_LIMIT = args.timeLimit
+if args.ponder > 0:
+    ponderer.InitPonder(args.ponder)
+if args.beamWidth is not None:
+    INIT_BEAM_WIDTH = [int(width) for width in args.beamWidth.split(",")]
+    INIT_SEARCH_LIMIT = len(INIT_BEAM_WIDTH) + 1
 
 # -------------
 #
@@ -48,10 +117,22 @@ if args.quickSearch:
 # -------------
 
 # simulator上で思考を再現する（無限ループ）
+# --fastForwardを与えた時は，盤面を出力せずに決まった数のミノを置くまで進めて，ゲームの結果をJSONで出力する
 def PytrisSimulator ():
     # 初期化
     decisionMaker.SEARCH_LIMIT = INIT_SEARCH_LIMIT
     decisionMaker.BEAM_WIDTH = INIT_BEAM_WIDTH
+    if args.seed is not None:
+        simulator.SeedMinoGenerator(args.seed)
+
+    if args.fastForward is not None:
+        summary = simulator.PlayHeadlessGame(
+            functools.partial(simulator.DecideMultiPath, reuseTree=args.reuseTree),
+            args.fastForward if args.fastForward > 0 else None
+        )
+        del summary["decideTimes"]
+        print(json.dumps(summary), flush=True)
+        return
 
     print("\n\nPy-tris Simulator\n\n")
 
@@ -73,10 +154,10 @@ def PytrisSimulator ():
         # 思考ルーチン
         value, mino, path = decisionMaker.Decide(board)
 
-        board, isTspin, isTspinmini = simulator.PutMino(path, board)
+        board, spin = simulator.PutMino(path, board)
 
         newMainBoard, newTopRowIdx, clearedRowCount = simulator.ClearLinesOfBoard(board)
-        scoreAdd, backToBack, ren = evaluator.Score(isTspin, isTspinmini, clearedRowCount, board.backToBack, board.ren)
+        scoreAdd, backToBack, ren = evaluator.Score(spin, clearedRowCount, board.backToBack, board.ren)
 
         board = Board(
             newMainBoard,
@@ -100,30 +181,10 @@ def PytrisSimulator ():
         assert len(board.followingMinos) == FOLLOWING_MINOS_COUNT
 
         # 思考ルーチン
-        multipath = openTemplateMaker.GetCustomTemplateMove(board)
-        if not multipath:
-            multipath = decisionMaker.MultiDecide(board)
+        multipath = simulator.DecideMultiPath(board, args.reuseTree)
 
         for path in multipath:
-            board, isTspin, isTspinmini = simulator.PutMino(path, board)
-
-            newMainBoard, newTopRowIdx, clearedRowCount = simulator.ClearLinesOfBoard(board)
-            scoreAdd, backToBack, ren = evaluator.Score(isTspin, isTspinmini, clearedRowCount, board.backToBack, board.ren)
-
-            board = Board(
-                newMainBoard,
-                None,
-                board.followingMinos,
-                board.holdMino,
-                True,
-                newTopRowIdx,
-                board.score + scoreAdd,
-                backToBack,
-                ren,
-                board.minoBagContents
-            )
-
-            board = simulator.AddFollowingMino(board)
+            board, _, _ = simulator.PlayPath(board, path)
         
 
 
@@ -177,6 +238,9 @@ def PytrisMover ():
             continue
             
         print("Start!")
+        gameTrace.RecordGameStart()
+        ponderer.ResetPonder()
+        decisionMaker.ClearRetainedTree()
 
         # ゲーム開始
         while True:
@@ -188,12 +252,15 @@ def PytrisMover ():
             while True:
                 if previousFollowingMinos != boardWatcher.GetFollowingMinos():
                     previousFollowingMinos = boardWatcher.GetFollowingMinos()
+                    ponderer.ObserveFollowingMinos(previousFollowingMinos)
                     break
             
             # 現在のミノが出てくるまで待つ
             while True:
                 if boardWatcher.GetCurrentMino() is not None:
                     break
+            # 時間制限はミノが出てきた時から数える
+            deadline = None if args.timeLimit is None else time.time() + args.timeLimit
             
             # 各列において，上から順に見ていって，一番最初にブロックがある部分のrowIdxを格納する
             mainBoard = boardWatcher.GetMainBoard()
@@ -220,12 +287,30 @@ def PytrisMover ():
                 0
             )
 
+            gameTrace.RecordSnapshot(board)
+
             # 思考ルーチン
             decideTimer = Timer()
             if not paths:
+                profiler.StartDecision()
+                decisionMaker.lastSearchValue = None
+                source = gameTrace.TRACE_SOURCE_TEMPLATE
                 multiPath = openTemplateMaker.GetCustomTemplateMove(board)
                 if not multiPath:
-                    multiPath = decisionMaker.MultiDecide(board)
+                    # 先読みしていた盤面と一致すれば，その結果を使う
+                    source = gameTrace.TRACE_SOURCE_PONDER
+                    multiPath = ponderer.TakePonderResult(board, deadline)
+                    if multiPath:
+                        multiPath = decisionMaker.CommitMultiPath(multiPath)
+                if not multiPath:
+                    source = gameTrace.TRACE_SOURCE_SEARCH
+                    if args.reuseTree:
+                        # 探索木を再利用するときは，1手ずつ決める
+                        multiPath = decisionMaker.MultiDecideWithTreeReuse(board, deadline)[:1]
+                    else:
+                        multiPath = decisionMaker.MultiDecide(board, deadline)
+                profiler.FinishDecision()
+                gameTrace.RecordDecision(multiPath, decideTimer.Stop(), decisionMaker.lastSearchValue, source)
                 paths += multiPath
 
             print("Making Decition in {}s".format(decideTimer.Stop()), flush=True)
@@ -237,14 +322,30 @@ def PytrisMover ():
                 path = paths.pop(0)
                 currentMino = boardWatcher.GetMinoTypeOfCurrentMino()
 
+                # 最後の経路を実行している間に，次の盤面での探索を始めておく
+                if not paths:
+                    ponderer.StartPonder(
+                        Board(
+                            mainBoard,
+                            DirectedMino(
+                                currentMino,
+                                FIRST_MINO_DIRECTION,
+                                FIRST_MINO_POS
+                            ),
+                            previousFollowingMinos,
+                            boardWatcher.GetHoldMino()
+                        ),
+                        path
+                    )
+
                 # 最初に実行するのがHOLDの時は別に実行する
-                if path[0] is MOVE.HOLD:
+                if GetFirstMove(path) is MOVE.HOLD:
                     time.sleep(0.1) # 安定のためにHOLDの前後にsleepを入れる
                     Move(MOVE.HOLD)
                     time.sleep(0.1)
 
                     # pathからHOLDを取り除く
-                    path = path[1:]
+                    path = RemoveFirstMove(path)
 
                     # 次のミノが出てくるまで待機
                     while True:
@@ -275,6 +376,7 @@ def PytrisMover ():
                     while True:
                         if previousFollowingMinos != boardWatcher.GetFollowingMinos():
                             previousFollowingMinos = boardWatcher.GetFollowingMinos()
+                            ponderer.ObserveFollowingMinos(previousFollowingMinos)
                             break
 
                         # ゲーム開始待機状態に戻ったら、次のゲームに移行する
@@ -306,6 +408,66 @@ def main():
         PytrisSimulator()
     elif args.mode == "app":
         # 実機確認モード
+        if args.trace is not None:
+            gameTrace.StartTrace(args.trace)
         PytrisMover()
+    elif args.mode == "bench":
+        # 探索の速さを測るベンチマーク
+        benchmark.PrintBenchmark(
+            INIT_BEAM_WIDTH,
+            args.benchOutput,
+            gameCount=args.benchGames,
+            pieceCount=args.benchPieces,
+            seed=args.benchSeed,
+            useDecide=args.benchDecide,
+            measureMemory=not args.benchNoMemory
+        )
+    elif args.mode == "selfplay":
+        # seedを固定したゲームを並列に行い，結果を集計する
+        decisionMaker.SEARCH_LIMIT = INIT_SEARCH_LIMIT
+        decisionMaker.BEAM_WIDTH = list(INIT_BEAM_WIDTH)
+        firstSeed = args.seed if args.seed is not None else 0
+        selfPlay.PrintSelfPlay(
+            [firstSeed + gameIdx for gameIdx in range(args.selfPlayGames)],
+            args.selfPlayOutput,
+            pieceCount=args.selfPlayPieces,
+            processCount=args.selfPlayProcesses if args.selfPlayProcesses > 0 else os.cpu_count(),
+            reuseTree=args.reuseTree
+        )
+    elif args.mode == "tune":
+        # 自己対戦の結果をもとに評価関数の重みを調整する
+        decisionMaker.SEARCH_LIMIT = INIT_SEARCH_LIMIT
+        decisionMaker.BEAM_WIDTH = list(INIT_BEAM_WIDTH)
+        firstSeed = args.seed if args.seed is not None else 0
+        evalTuner.PrintTuner(
+            [firstSeed + gameIdx for gameIdx in range(args.selfPlayGames)],
+            pieceCount=args.selfPlayPieces,
+            generationCount=args.tuneGenerations,
+            population=args.tunePopulation,
+            processCount=args.selfPlayProcesses if args.selfPlayProcesses > 0 else os.cpu_count(),
+            reuseTree=args.reuseTree,
+            seed=firstSeed,
+            checkpointPath=args.tuneCheckpoint,
+            outputPath=args.tuneOutput
+        )
+    elif args.mode == "replay":
+        # appモードで記録した盤面で意思決定をやり直す
+        if args.trace is None:
+            Error("Give the trace file to replay with --trace.")
+        gameTrace.PrintReplay(
+            args.trace,
+            INIT_SEARCH_LIMIT,
+            INIT_BEAM_WIDTH,
+            reuseTree=args.reuseTree,
+            timeLimit=args.timeLimit
+        )
+    elif args.mode == "perft":
+        # 置き場所の求め方の検証と速さの測定
+        policyNames = None if args.perftMoveGen is None else args.perftMoveGen.split(",")
+        for name in policyNames or []:
+            if name not in MOVEGEN_NAMES:
+                Error("Unknown placement generation policy: %s (choose from %s)" % (name, "/".join(MOVEGEN_NAMES)))
+        if not perft.PrintPerft(args.perftDepth, policyNames, args.perftRecord):
+            Error("Perft counts differ from perft.PERFT_EXPECTED, or some placements are missing or cannot be input.")
     else:
         Error("Invalid mode inputted.")
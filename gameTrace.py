@@ -0,0 +1,285 @@
+from lib import *
+import decisionMaker
+import simulator
+import benchmark
+import json
+import math
+import struct
+
+# appモードで読み取った盤面と，それに対する意思決定を追記型のバイナリファイルに記録し，後から同じ盤面で意思決定をやり直す
+# 本番で遅かった盤面や悪い手を打った盤面を，盤面を読み取らずに全速力で再現したり，ベンチマークしたりするために使う
+#
+# ファイルの形式
+# 最初にTRACE_MAGICがあり，その後にレコードが続く（1つのレコードは1byteの種類と内容）
+# 時刻はセッションを始めた時からのミリ秒で，整数はLEB128の可変長で書く
+#   TRACE_SESSION:  開始時刻(float64), 探索の設定のJSONの長さ, JSON
+#   TRACE_GAME:     時刻
+#   TRACE_SNAPSHOT: 時刻, 前の盤面から変わった行のmask, 変わった行(uint16)の並び,
+#                   (現在のミノ << 4 | holdのミノ), ネクストの数, ネクスト(1byteに2つずつ)
+#   TRACE_DECISION: 時刻, 思考時間(float32, s), 評価値(float64, ないときはNaN), どこで決めたか, 経路の数, 経路の並び
+# 盤面はセッションの最初は全て空として，前のスナップショットからの差分で書く
+# 書き込むたびにflushするので，途中で落ちても最後のレコード以外は読める
+TRACE_MAGIC = b"PYTRIS-TRACE\x01"
+TRACE_SESSION = 0
+TRACE_GAME = 1
+TRACE_SNAPSHOT = 2
+TRACE_DECISION = 3
+
+# 経路をどこで決めたか
+TRACE_SOURCE_TEMPLATE = 0
+TRACE_SOURCE_PONDER = 1
+TRACE_SOURCE_SEARCH = 2
+TRACE_SOURCE_NAMES = ["template", "ponder", "search"]
+
+# 記録中のファイル（Noneのときは記録しない）
+traceFile = None
+traceStartTime = None
+tracePreviousMainBoard = None
+
+def EncodeVarint (value:int) -> bytes:
+    encoded = bytearray()
+    while True:
+        byte = value & 0x7f
+        value >>= 7
+        if value:
+            encoded.append(byte | 0x80)
+        else:
+            encoded.append(byte)
+            return bytes(encoded)
+
+# data[pos:]から可変長の整数を読み，(整数, 次の位置)を返す
+def DecodeVarint (data:bytes, pos:int) -> Tuple[int, int]:
+    value = 0
+    shift = 0
+    while True:
+        byte = data[pos]
+        pos += 1
+        value |= (byte & 0x7f) << shift
+        if byte < 0x80:
+            return value, pos
+        shift += 7
+
+# pathで与えたファイルに記録を始める（ファイルがある時は最後に追記する）
+def StartTrace (path:str):
+    global traceFile, traceStartTime, tracePreviousMainBoard
+    traceFile = open(path, "ab")
+    if traceFile.tell() == 0:
+        traceFile.write(TRACE_MAGIC)
+    traceStartTime = time.time()
+    tracePreviousMainBoard = [0 for _ in range(BOARD_HEIGHT)]
+    config = json.dumps(decisionMaker.DescribeSearchConfig()).encode()
+    WriteRecord(TRACE_SESSION, struct.pack("<d", traceStartTime) + EncodeVarint(len(config)) + config)
+
+def WriteRecord (recordType:int, content:bytes):
+    traceFile.write(bytes([recordType]) + content)
+    traceFile.flush()
+
+def EncodeTimestamp () -> bytes:
+    return EncodeVarint(int((time.time() - traceStartTime) * 1000))
+
+# 新しいゲームが始まったときに呼ぶ（記録していない時は何もしない）
+def RecordGameStart ():
+    if traceFile is None:
+        return
+    WriteRecord(TRACE_GAME, EncodeTimestamp())
+
+# 読み取った盤面を記録する（記録していない時は何もしない）
+def RecordSnapshot (board:Board):
+    global tracePreviousMainBoard
+    if traceFile is None:
+        return
+    changedRowMask = 0
+    changedRows = []
+    for rowIdx, row in enumerate(board.mainBoard):
+        if row != tracePreviousMainBoard[rowIdx]:
+            changedRowMask |= 1 << rowIdx
+            changedRows.append(row)
+    tracePreviousMainBoard = list(board.mainBoard)
+
+    followingMinos = list(board.followingMinos)
+    packedMinos = bytearray()
+    for i in range(0, len(followingMinos), 2):
+        low = followingMinos[i + 1] if i + 1 < len(followingMinos) else MINO.NONE
+        packedMinos.append(followingMinos[i] << 4 | low)
+    WriteRecord(
+        TRACE_SNAPSHOT,
+        EncodeTimestamp() +
+        EncodeVarint(changedRowMask) +
+        struct.pack("<%dH" % len(changedRows), *changedRows) +
+        bytes([board.currentMino.mino << 4 | board.holdMino]) +
+        EncodeVarint(len(followingMinos)) +
+        bytes(packedMinos)
+    )
+
+# 意思決定の結果を記録する（記録していない時は何もしない）
+# evalValueは探索で得られた評価値（テンプレなどで決めて評価値がない時はNone），sourceはTRACE_SOURCE_*
+def RecordDecision (multiPath:List[PathInt], latency:float, evalValue:Union[float, None], source:int):
+    if traceFile is None:
+        return
+    content = EncodeTimestamp() + struct.pack("<fdB", latency, math.nan if evalValue is None else evalValue, source) + EncodeVarint(len(multiPath))
+    for path in multiPath:
+        content += EncodeVarint(path)
+    WriteRecord(TRACE_DECISION, content)
+
+# 記録したファイルを読み，レコードを順番に返す
+# ("session", 開始時刻, 探索の設定の辞書)
+# ("game", 時刻(ms))
+# ("snapshot", 時刻(ms), mainBoard, 現在のミノ, ネクストのリスト, holdのミノ)
+# ("decision", 時刻(ms), 経路のリスト, 思考時間(s), 評価値(ないときはNone), どこで決めたか)
+# 途中で書き込みが終わっている最後のレコードは読まない
+def ReadTrace (path:str):
+    with open(path, "rb") as f:
+        data = f.read()
+    if not data.startswith(TRACE_MAGIC):
+        Error("%s is not a trace file." % path)
+
+    pos = len(TRACE_MAGIC)
+    mainBoard = [0 for _ in range(BOARD_HEIGHT)]
+    while pos < len(data):
+        try:
+            recordType = data[pos]
+            pos += 1
+            if recordType == TRACE_SESSION:
+                startTime, = struct.unpack_from("<d", data, pos)
+                configLength, pos = DecodeVarint(data, pos + 8)
+                config = json.loads(data[pos:pos + configLength].decode())
+                pos += configLength
+                mainBoard = [0 for _ in range(BOARD_HEIGHT)]
+                record = ("session", startTime, config)
+            elif recordType == TRACE_GAME:
+                timestamp, pos = DecodeVarint(data, pos)
+                record = ("game", timestamp)
+            elif recordType == TRACE_SNAPSHOT:
+                timestamp, pos = DecodeVarint(data, pos)
+                changedRowMask, pos = DecodeVarint(data, pos)
+                mainBoard = list(mainBoard)
+                for rowIdx in range(BOARD_HEIGHT):
+                    if changedRowMask >> rowIdx & 1:
+                        mainBoard[rowIdx], = struct.unpack_from("<H", data, pos)
+                        pos += 2
+                currentMino, holdMino = data[pos] >> 4, data[pos] & 0xf
+                followingCount, pos = DecodeVarint(data, pos + 1)
+                followingMinos = []
+                for i in range(followingCount):
+                    packed = data[pos + i // 2]
+                    followingMinos.append(packed >> 4 if i % 2 == 0 else packed & 0xf)
+                pos += (followingCount + 1) // 2
+                record = ("snapshot", timestamp, mainBoard, currentMino, followingMinos, holdMino)
+            elif recordType == TRACE_DECISION:
+                timestamp, pos = DecodeVarint(data, pos)
+                latency, evalValue, source = struct.unpack_from("<fdB", data, pos)
+                pathCount, pos = DecodeVarint(data, pos + struct.calcsize("<fdB"))
+                multiPath = []
+                for _ in range(pathCount):
+                    path, pos = DecodeVarint(data, pos)
+                    multiPath.append(path)
+                record = ("decision", timestamp, multiPath, latency, None if math.isnan(evalValue) else evalValue, source)
+            else:
+                Error("Unknown trace record type %d in %s." % (recordType, path))
+        except (IndexError, ValueError, struct.error):
+            # 途中で書き込みが終わっている
+            return
+        if pos > len(data):
+            return
+        yield record
+
+# 記録した盤面から，appモードと同じようにBoardを作る
+def MakeObservedBoard (mainBoard:List[int], currentMino:MinoInt, followingMinos:List[MinoInt], holdMino:MinoInt) -> Board:
+    # 各列において，上から順に見ていって，一番最初にブロックがある部分のrowIdxを格納する
+    topRowIdx = [BOARD_HEIGHT for _ in range(BOARD_WIDTH)]
+    for rowIdx in range(BOARD_HEIGHT-1, -1, -1):
+        for colIdx in range(BOARD_WIDTH):
+            if mainBoard[rowIdx] & (0b1000000000 >> colIdx) > 0:
+                topRowIdx[colIdx] = rowIdx
+    return Board(
+        list(mainBoard),
+        DirectedMino(
+            currentMino,
+            FIRST_MINO_DIRECTION,
+            FIRST_MINO_POS
+        ),
+        list(followingMinos),
+        holdMino,
+        True,
+        topRowIdx,
+        0,
+        False,
+        0
+    )
+
+# 記録したファイルの意思決定を，記録した盤面で今の探索の設定でやり直す
+# 先読み(ponder)は行わず，テンプレを狙えない時は探索する
+# ゲームが始まるたびに探索の設定(SEARCH_LIMIT, BEAM_WIDTH)を戻して探索木を捨てる
+# timeLimitを与えた時は，appモードと同じように1回の意思決定の時間制限にする
+# 意思決定ごとにonDecision(結果の辞書)を呼び，最後に集計した結果を返す
+def ReplayTrace (
+    path:str,
+    searchLimit:int,
+    beamWidth:List[int],
+    reuseTree:bool=False,
+    timeLimit:Union[float, None]=None,
+    onDecision:Union[Callable[[Dict], None], None]=None
+) -> Dict:
+    snapshot = None
+    sessionConfigs = []
+    results = []
+    gameIdx = -1
+    for record in ReadTrace(path):
+        recordType = record[0]
+        if recordType == "session" or recordType == "game":
+            if recordType == "session":
+                sessionConfigs.append(record[2])
+            else:
+                gameIdx += 1
+            benchmark.ResetSearch(searchLimit, beamWidth)
+            snapshot = None
+        elif recordType == "snapshot":
+            snapshot = record
+        elif recordType == "decision" and snapshot is not None:
+            _, _, mainBoard, currentMino, followingMinos, holdMino = snapshot
+            _, timestamp, recordedMultiPath, recordedLatency, recordedEval, recordedSource = record
+            board = MakeObservedBoard(mainBoard, currentMino, followingMinos, holdMino)
+
+            deadline = None if timeLimit is None else time.time() + timeLimit
+            decisionMaker.lastSearchValue = None
+            decideTimer = Timer()
+            multiPath = simulator.DecideMultiPath(board, reuseTree, deadline)
+            latency = decideTimer.Stop()
+
+            result = {
+                "decision": len(results),
+                "game": gameIdx,
+                "timestamp": timestamp,
+                "recordedSource": TRACE_SOURCE_NAMES[recordedSource],
+                "recordedLatency": recordedLatency,
+                "latency": latency,
+                "recordedEval": recordedEval,
+                "eval": decisionMaker.lastSearchValue,
+                "samePlan": multiPath == recordedMultiPath,
+                "sameFirstMove": bool(multiPath) and bool(recordedMultiPath) and multiPath[0] == recordedMultiPath[0],
+            }
+            results.append(result)
+            if onDecision is not None:
+                onDecision(result)
+            snapshot = None
+
+    benchmark.ResetSearch(searchLimit, beamWidth)
+    slowest = sorted(results, key=lambda result: result["recordedLatency"], reverse=True)[:5]
+    return {
+        "decisions": len(results),
+        "games": gameIdx + 1,
+        "samePlan": sum(1 for result in results if result["samePlan"]),
+        "sameFirstMove": sum(1 for result in results if result["sameFirstMove"]),
+        "recordedSeconds": sum(result["recordedLatency"] for result in results),
+        "seconds": sum(result["latency"] for result in results),
+        "slowestRecorded": [result["decision"] for result in slowest],
+        "sessionConfigs": sessionConfigs,
+        "config": decisionMaker.DescribeSearchConfig(),
+    }
+
+# 記録したファイルの意思決定をやり直し，意思決定ごとの結果と最後に集計した結果を1行ずつJSONで出力する
+def PrintReplay (path:str, searchLimit:int, beamWidth:List[int], **kwargs):
+    def WriteLine (record:Dict):
+        print(json.dumps(record), flush=True)
+
+    WriteLine(ReplayTrace(path, searchLimit, beamWidth, onDecision=WriteLine, **kwargs))
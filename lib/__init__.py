@@ -6,7 +6,7 @@ import pyautogui
 import mss
 import mss.tools
 from PIL import Image
-from typing import List, Set, Tuple, Union, Dict
+from typing import List, Set, Tuple, Union, Dict, Callable
 from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
 
 # my own modules
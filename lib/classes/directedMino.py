@@ -3,6 +3,12 @@ from lib.constants import *
 # 1つのミノの情報を，方角と中心位置で持つクラス
 # 注意：Iミノは4×4の格子上に中心があるので，そのすぐ左上の点を中心の点としてみなしてデータを持つことにする
 class DirectedMino ():
+    # 回転した結果のミノには，何番目のkickで回転したかをkickIdxに記録する
+    # 置き場所を求めたときのTミノには，Tスピンの種類spinと最後の回転のkickIdxを記録する
+    # それ以外のミノは初期値のまま（インスタンスには持たせない）
+    spin = SPIN.NONE
+    kickIdx = None
+
     def __init__(self, mino:MinoInt, direction:DirectionInt, pos:Tuple[int]):
         self.mino = mino
         self.direction = direction
@@ -6,8 +6,10 @@ from .color import *
 from .direction import *
 from .mino import *
 from .move import *
+from .moveGen import *
 from .name import *
 from .position import *
 from .rotateOffset import *
 from .shape import *
+from .spin import *
 from .score import *
@@ -0,0 +1,19 @@
+# MOVEGENはクラス定数
+# 置き場所の求め方（下のものほど多くの置き場所を見つけるが，時間がかかる）
+# HARD_DROP : 最上部で回転と左右移動をしてそのまま落とす（形が同じになる向きは省く）
+# T_SPIN : HARD_DROPに加えて，Tミノだけ落とした後に回転してTスピンになる置き場所を考える
+# QUICK : HARD_DROPに加えて，Tミノだけ落とした後に回転できるところまで回転する
+# FULL : 全てのミノで4方角を落として，落とした後に回転できるところまで回転する
+# COMPLETE : 幅優先探索で到達できる置き場所をすべて列挙する
+class MOVEGEN():
+    HARD_DROP = 0
+    T_SPIN = 1
+    QUICK = 2
+    FULL = 3
+    COMPLETE = 4
+
+# intのエイリアスとしてMoveGenIntを定義
+MoveGenInt = int
+
+# コマンドラインなどで使う名前
+MOVEGEN_NAMES = ["hardDrop", "tSpin", "quick", "full", "complete"]
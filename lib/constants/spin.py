@@ -0,0 +1,9 @@
+# SPINはクラス定数
+# ミノを置いたときのTスピンの種類
+class SPIN():
+    NONE = 0
+    MINI = 1
+    FULL = 2
+
+# intのエイリアスとしてSpinIntを定義
+SpinInt = int
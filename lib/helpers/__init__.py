@@ -1,4 +1,5 @@
 # project's own modules
+from .bag import *
 from .check import *
 from .color import *
 from .debug import *
@@ -8,8 +9,10 @@ from .hold import *
 from .input import *
 from .joinMino import *
 from .lineClear import *
+from .path import *
 from .position import *
 from .printBoard import *
 from .rotate import *
 from .timer import *
 from .warning import *
+from .zobrist import *
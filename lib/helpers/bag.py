@@ -0,0 +1,31 @@
+from lib.classes import *
+
+# 出てきた順番のミノの列を受け取って，7種1巡の法則のもとで次に出てきうるミノを返す
+# どこで巡が区切られているかはわからないので，ミノの列と矛盾しない区切り方を全て考える
+# どの区切り方でも矛盾する場合（読み取りミスなど）は全てのミノを返す
+def GetNextMinoCandidates(minoSequence:List[MinoInt]) -> List[MinoInt]:
+    fullBag = ReturnFullBag()
+    bagSize = len(fullBag)
+    candidates = set()
+    for offset in range(bagSize):
+        # offset番目から新しい巡が始まるとする
+        bagStartIdxs = [0] + list(range(offset, len(minoSequence), bagSize))
+        isConsistent = True
+        for startIdx, endIdx in zip(bagStartIdxs, bagStartIdxs[1:] + [len(minoSequence)]):
+            bag = minoSequence[startIdx:endIdx]
+            if len(set(bag)) != len(bag):
+                isConsistent = False
+                break
+        if not isConsistent:
+            continue
+
+        # 次のミノが含まれる巡で，すでに出てきたミノ
+        lastBagStartIdx = max(idx for idx in bagStartIdxs if idx <= len(minoSequence))
+        if (len(minoSequence) - offset) % bagSize == 0:
+            lastBagStartIdx = len(minoSequence)
+        usedMinos = set(minoSequence[lastBagStartIdx:])
+        candidates |= set(mino for mino in fullBag if mino not in usedMinos)
+
+    if not candidates:
+        return fullBag
+    return [mino for mino in fullBag if mino in candidates]
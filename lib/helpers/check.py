@@ -1,25 +1,95 @@
 from lib.classes import *
 
-# 占有しようとしている場所がちゃんと空白になっているかチェックする
-def isValidPlace(mainBoard:List[int], occupiedPositions:List[Tuple[int]]) -> bool:
-    for pos0, pos1 in occupiedPositions:
-        # 盤面の左右の外にはみ出ていないこと
-        if not 0 <= pos0 < BOARD_WIDTH:
-            return False
-        # 盤面の上下の外にはみ出ていないこと
-        if not 0 <= pos1 < BOARD_HEIGHT:
-            return False
-        # posの場所が空白であること
-        if mainBoard[pos1] & (0b1000000000 >> pos0) > 0:
+# ミノの位置の判定を高速化するために、ミノを行ごとのbitmaskにして前計算しておく。
+# globalCollisionRows[mino][direction][pos0 + COLLISION_POS0_OFFSET] = ((dy, mask), ...)
+# dyはミノの中心から見た行のずれ、maskはmainBoardの行と同じ10bitの形式にしたもの
+# 左右の壁にはみ出る場合はNoneを入れておく
+# globalCollisionPos1Range[mino][direction] = (minPos1, maxPos1) は上下の壁にはみ出ないpos1の範囲
+COLLISION_POS0_OFFSET = 4
+globalCollisionRows = []
+globalCollisionPos1Range = []
+def InitCollisionTable ():
+    # 他のモジュールからimportされた参照が切れないように、中身だけを入れ替える
+    globalCollisionRows[:] = [[[None for _ in range(BOARD_WIDTH + 2 * COLLISION_POS0_OFFSET)]
+                                  for _ in range(4)]
+                                  for _ in range(7)]
+    globalCollisionPos1Range[:] = [[None for _ in range(4)] for _ in range(7)]
+
+    for mino in range(7):
+        for direction in range(4):
+            # 中心が(0, 0)にあるときに占領する位置からミノの形を求める
+            shape = GetOccupiedPositions(DirectedMino(mino, direction, (0, 0)))
+            dys = sorted(set(dy for _, dy in shape))
+            globalCollisionPos1Range[mino][direction] = (-dys[0], BOARD_HEIGHT - 1 - dys[-1])
+
+            for pos0 in range(-COLLISION_POS0_OFFSET, BOARD_WIDTH + COLLISION_POS0_OFFSET):
+                if not all(0 <= pos0 + dx < BOARD_WIDTH for dx, _ in shape):
+                    continue
+                rows = []
+                for dy in dys:
+                    mask = 0
+                    for dx, shapeDy in shape:
+                        if shapeDy == dy:
+                            mask |= 0b1000000000 >> (pos0 + dx)
+                    rows.append((dy, mask))
+                globalCollisionRows[mino][direction][pos0 + COLLISION_POS0_OFFSET] = tuple(rows)
+
+    InitCanonicalPlacementTable()
+
+# 方向が異なっても同じ場所を占領するミノの状態(例えばZミノのNとS)を1つにまとめるための前計算
+# globalCanonicalPlacements[EncodeDirectedMino(directedMino)] = 同じ場所を占領する状態のうちEncodeDirectedMinoが最小のもの
+# 盤面の外にはみ出る状態は自分自身にしておく
+globalCanonicalPlacements = []
+def InitCanonicalPlacementTable ():
+    posSize = BOARD_HEIGHT + 2
+    directionSize = (BOARD_WIDTH + 2) * posSize
+    canonicalPlacements = list(range(7 * 4 * directionSize))
+    for mino in range(7):
+        # 占領する場所のbitと，最初に見つかった状態を結ぶ辞書
+        firstEncodedMinos = {}
+        for direction in range(4):
+            minPos1, maxPos1 = globalCollisionPos1Range[mino][direction]
+            for pos0 in range(-1, BOARD_WIDTH + 1):
+                if globalCollisionRows[mino][direction][pos0 + COLLISION_POS0_OFFSET] is None:
+                    continue
+                for pos1 in range(max(minPos1, -1), min(maxPos1, BOARD_HEIGHT) + 1):
+                    encodedMino = (mino * 4 + direction) * directionSize + (pos0 + 1) * posSize + pos1 + 1
+                    placementBits = GetPlacementBits(mino, direction, pos0, pos1)
+                    canonicalPlacements[encodedMino] = firstEncodedMinos.setdefault(placementBits, encodedMino)
+    # 他のモジュールからimportされた参照が切れないように、中身だけを入れ替える
+    globalCanonicalPlacements[:] = canonicalPlacements
+
+# (mino, direction, pos)の位置にミノが存在できるかどうかをbitmaskの比較だけで判定する
+def IsValidPosition(mainBoard:List[int], mino:MinoInt, direction:DirectionInt, pos0:int, pos1:int) -> bool:
+    # 盤面の上下の外にはみ出ていないこと
+    minPos1, maxPos1 = globalCollisionPos1Range[mino][direction]
+    if not minPos1 <= pos1 <= maxPos1:
+        return False
+    # 盤面の左右の外にはみ出ていないこと
+    if not 0 <= pos0 + COLLISION_POS0_OFFSET < BOARD_WIDTH + 2 * COLLISION_POS0_OFFSET:
+        return False
+    rows = globalCollisionRows[mino][direction][pos0 + COLLISION_POS0_OFFSET]
+    if rows is None:
+        return False
+    # 各行でブロックと重なっていないこと
+    for dy, mask in rows:
+        if mainBoard[pos1 + dy] & mask:
             return False
-    
     return True
 
+# directedMinoがmainBoard上に存在できるかをチェックする
+def IsValidDirectedMino(mainBoard:List[int], directedMino:DirectedMino) -> bool:
+    return IsValidPosition(mainBoard, directedMino.mino, directedMino.direction, directedMino.pos[0], directedMino.pos[1])
+
 # おこうとしている位置のどこかのブロックの下にちゃんと既存のブロックがあって，おくことができる場所であるかをチェックする
-def CanPut(mainBoard:List[int], occupiedPositions:List[Tuple[int]]) -> bool:
-    for pos0, pos1 in occupiedPositions:
-        if pos1 + 1 < BOARD_HEIGHT and mainBoard[pos1+1] & (0b1000000000 >> pos0) > 0:
-            return True
-        elif pos1 + 1 == BOARD_HEIGHT:
-            return True
-    return False
+# 1マス下に動かせないことと同値なので、bitmaskで判定する
+def CanPut(mainBoard:List[int], directedMino:DirectedMino) -> bool:
+    return not IsValidPosition(mainBoard, directedMino.mino, directedMino.direction, directedMino.pos[0], directedMino.pos[1] + 1)
+
+# (mino, direction, pos)の位置にあるミノが占領する場所を、盤面全体を1つの整数とみなしたbitで表す
+# 方向が異なっても占領する場所が同じであれば同じ値になる
+def GetPlacementBits(mino:MinoInt, direction:DirectionInt, pos0:int, pos1:int) -> int:
+    placementBits = 0
+    for dy, mask in globalCollisionRows[mino][direction][pos0 + COLLISION_POS0_OFFSET]:
+        placementBits |= mask << (BOARD_WIDTH * (pos1 + dy))
+    return placementBits
@@ -1,5 +1,5 @@
 from lib.classes import *
-from lib.helpers.check import isValidPlace
+from lib.helpers.check import globalCollisionRows, globalCollisionPos1Range, COLLISION_POS0_OFFSET
 
 # 受け取ったdirectedMinoをいけるところまで下に落とす。何個分おとせるかを返す
 # 高速化のため、ミノが今積まれている盤面より上にあるという制約をつける。
@@ -19,19 +19,20 @@ def DropFromTop(mainBoard:List[int], topRowIdx:List[int], directedMino:DirectedM
 # 受け取ったdirectedMinoをいけるところまで下に落とす。何個分おとせるかを返す
 # こちらの関数は上の関数とは異なり、制約をつけない。
 def Drop(mainBoard:List[int], directedMino:DirectedMino) -> int:
+    return DropPosition(mainBoard, directedMino.mino, directedMino.direction, directedMino.pos[0], directedMino.pos[1])
+
+# (mino, direction, pos)の位置にあるミノを何個分おとせるかを返す
+# DirectedMinoを作らずに済むように、値をそのまま受け取る
+def DropPosition(mainBoard:List[int], mino:MinoInt, direction:DirectionInt, pos0:int, pos1:int) -> int:
+    # 前計算しておいたbitmaskを使って、一つずつ下に落とせるかを確かめる
+    _, maxPos1 = globalCollisionPos1Range[mino][direction]
+    rows = globalCollisionRows[mino][direction][pos0 + COLLISION_POS0_OFFSET]
     dropCount = 0
-    occupiedPositions = GetOccupiedPositions(directedMino)
-    occupiedPositions = copy.copy(occupiedPositions)
+    while pos1 + dropCount < maxPos1:
+        nextPos1 = pos1 + dropCount + 1
+        for dy, mask in rows:
+            if mainBoard[nextPos1 + dy] & mask:
+                return dropCount
+        dropCount += 1
 
-    while True:
-        # occupiedPostionsの全ての要素を一つずつ下に落とす
-        for i in range(len(occupiedPositions)):
-            occupiedPositions[i] = (occupiedPositions[i][0], occupiedPositions[i][1] + 1)
-        
-        # 一つずつ下に落としたときに，その場所にミノが存在することができればドロップできていることになるのでcountをインクリメントする
-        if isValidPlace(mainBoard, occupiedPositions):
-            dropCount += 1
-        else:
-            break
-    
     return dropCount
@@ -1,14 +1,18 @@
 from lib.classes import *
 
 try:
+    import multiprocessing
     import vgamepad as vg
-    gamepad = vg.VX360Gamepad()
-    print("Waiting for vgamepad connected...", flush=True)
 
-    # gamepadの起動を待つ
-    time.sleep(5)
+    # 探索用に起動したプロセスではgamepadを作らない
+    if multiprocessing.parent_process() is None:
+        gamepad = vg.VX360Gamepad()
+        print("Waiting for vgamepad connected...", flush=True)
 
-    print("Done.", flush=True)
+        # gamepadの起動を待つ
+        time.sleep(5)
+
+        print("Done.", flush=True)
 except:
     pass
 
@@ -0,0 +1,132 @@
+from lib.classes import *
+
+# 経路(MOVEの列)をrun-length encodingして1つの整数に詰めたもの
+# 同じ操作が連続する部分(run)を8bitで表し，最初のrunが一番上位に，最後のrunが一番下位にくるように並べる
+# runの上位3bitが操作，下位5bitが連続する回数(1~31)で，31回を超える場合はrunを分ける
+# 先頭・末尾への操作の追加や，先頭・末尾の操作の取得は経路の長さによらず定数回の整数演算でできる
+# 探索の中ではこの形式のまま扱い，実際に入力する時(minoMover.InputMove, simulator.PutMino)だけExpandPathでlistに戻す
+PathInt = int
+EMPTY_PATH = 0
+PATH_RUN_BITS = 8
+PATH_COUNT_BITS = 5
+PATH_RUN_MASK = (1 << PATH_RUN_BITS) - 1
+PATH_COUNT_MASK = (1 << PATH_COUNT_BITS) - 1
+
+# 経路に含まれるrunの数
+def GetPathRunCount (path:PathInt) -> int:
+    return (path.bit_length() + PATH_RUN_BITS - 1) // PATH_RUN_BITS
+
+# moveをcount回繰り返す経路
+def MakePath (move:MoveInt, count:int=1) -> PathInt:
+    return AppendMoves(EMPTY_PATH, move, count)
+
+# pathの末尾にmoveをcount回追加した経路
+def AppendMoves (path:PathInt, move:MoveInt, count:int=1) -> PathInt:
+    while count > 0:
+        lastRun = path & PATH_RUN_MASK
+        if path and lastRun >> PATH_COUNT_BITS == move and lastRun & PATH_COUNT_MASK < PATH_COUNT_MASK:
+            addCount = min(count, PATH_COUNT_MASK - (lastRun & PATH_COUNT_MASK))
+            path += addCount
+        else:
+            addCount = min(count, PATH_COUNT_MASK)
+            path = (path << PATH_RUN_BITS) | (move << PATH_COUNT_BITS) | addCount
+        count -= addCount
+    return path
+
+# pathの先頭にmoveをcount回追加した経路
+# 同じ経路が同じ整数になるように，先頭で同じ操作が続くrunはAppendMovesと同じ分け方で作り直す
+def PrependMoves (path:PathInt, move:MoveInt, count:int=1) -> PathInt:
+    if count <= 0:
+        return path
+    runCount = GetPathRunCount(path)
+    while runCount > 0:
+        shift = (runCount - 1) * PATH_RUN_BITS
+        firstRun = path >> shift
+        if firstRun >> PATH_COUNT_BITS != move:
+            break
+        count += firstRun & PATH_COUNT_MASK
+        path &= (1 << shift) - 1
+        runCount -= 1
+    return (MakePath(move, count) << (runCount * PATH_RUN_BITS)) | path
+
+# 経路を(操作, 連続する回数)のリストにする
+def GetPathRuns (path:PathInt) -> List[Tuple[MoveInt, int]]:
+    runs = []
+    while path:
+        run = path & PATH_RUN_MASK
+        runs.append((run >> PATH_COUNT_BITS, run & PATH_COUNT_MASK))
+        path >>= PATH_RUN_BITS
+    runs.reverse()
+    return runs
+
+# path1の後にpath2を続けた経路
+def ConcatPaths (path1:PathInt, path2:PathInt) -> PathInt:
+    for move, count in GetPathRuns(path2):
+        path1 = AppendMoves(path1, move, count)
+    return path1
+
+# 経路をMOVEのlistに戻す
+def ExpandPath (path:PathInt) -> List[MoveInt]:
+    moveList = []
+    for move, count in GetPathRuns(path):
+        moveList += [move for _ in range(count)]
+    return moveList
+
+# MOVEのlistを経路にする
+def CompressPath (moveList:List[MoveInt]) -> PathInt:
+    path = EMPTY_PATH
+    for move in moveList:
+        path = AppendMoves(path, move)
+    return path
+
+# 経路の最初の操作（空の経路のときはNone）
+def GetFirstMove (path:PathInt) -> Union[MoveInt, None]:
+    if not path:
+        return None
+    return path >> ((GetPathRunCount(path) - 1) * PATH_RUN_BITS + PATH_COUNT_BITS)
+
+# 経路の最後の操作（空の経路のときはNone）
+def GetLastMove (path:PathInt) -> Union[MoveInt, None]:
+    if not path:
+        return None
+    return (path & PATH_RUN_MASK) >> PATH_COUNT_BITS
+
+# 経路から最初の操作を取り除いた経路
+def RemoveFirstMove (path:PathInt) -> PathInt:
+    if not path:
+        return path
+    shift = (GetPathRunCount(path) - 1) * PATH_RUN_BITS
+    if (path >> shift) & PATH_COUNT_MASK == 1:
+        return path & ((1 << shift) - 1)
+    return path - (1 << shift)
+
+# 経路から最後の操作を取り除いた経路
+def RemoveLastMove (path:PathInt) -> PathInt:
+    if not path:
+        return path
+    if path & PATH_COUNT_MASK == 1:
+        return path >> PATH_RUN_BITS
+    return path - 1
+
+# 経路にmoveが含まれるか
+def PathContainsMove (path:PathInt, move:MoveInt) -> bool:
+    while path:
+        if (path & PATH_RUN_MASK) >> PATH_COUNT_BITS == move:
+            return True
+        path >>= PATH_RUN_BITS
+    return False
+
+# 経路の操作の数
+def GetPathLength (path:PathInt) -> int:
+    length = 0
+    while path:
+        length += path & PATH_COUNT_MASK
+        path >>= PATH_RUN_BITS
+    return length
+
+# MOVE.DROPを使うことにより，pathの簡易化を行う
+# 最後には必ずMOVE.DROPをつけるので，最後の連続するMOVE.DOWNは消去できる
+def SimplifyPath (path:PathInt) -> PathInt:
+    while path and (path & PATH_RUN_MASK) >> PATH_COUNT_BITS == MOVE.DOWN:
+        path >>= PATH_RUN_BITS
+    return AppendMoves(path, MOVE.DROP)
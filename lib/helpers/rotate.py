@@ -1,7 +1,28 @@
 from lib.classes import *
-from lib.helpers.check import isValidPlace
+from lib.helpers.check import globalCollisionRows, globalCollisionPos1Range, COLLISION_POS0_OFFSET
+
+# SRSの回転入れを高速化するために，回転後の方角とオフセットの候補を起動時に平坦な表にしておく
+# globalRotationTable[GetRotationTableIdx(mino, direction, move)] = (回転後の方角, ((offset0, offset1, kickの番号), ...))
+# オフセットの候補は試す順番に並んでいて，kickの番号はその中での添字
+def GetRotationTableIdx (mino:MinoInt, direction:DirectionInt, move:MoveInt) -> int:
+    return (mino * 4 + direction) * 2 + move - MOVE.R_ROT
+
+def BuildRotationTable () -> List[Tuple[DirectionInt, Tuple[Tuple[int, int, int], ...]]]:
+    rotationTable = [None for _ in range(7 * 4 * 2)]
+    for mino in range(7):
+        offsetsOfMino = OFFSETS_I if mino is MINO.I else OFFSETS_EXCEPT_I
+        for direction in range(4):
+            for move in (MOVE.R_ROT, MOVE.L_ROT):
+                rotationTable[GetRotationTableIdx(mino, direction, move)] = (
+                    GetNewDirection(direction, move),
+                    tuple((offset0, offset1, kickIdx) for kickIdx, (offset0, offset1) in enumerate(offsetsOfMino[direction][move]))
+                )
+    return rotationTable
+
+globalRotationTable = BuildRotationTable()
 
 # moveの方向にdirectedMinoを回転しようとしたとき，directedMinoが回転成功するならば実行後のdirectedMinoを，回転失敗するならばNoneを返す
+# 実行後のdirectedMinoのkickIdxには，何番目のkickで回転したかを記録する
 def Rotate (directedMino:DirectedMino, move:MoveInt, mainBoard:List[int]) -> Union[None, DirectedMino]:
     """
     以下，Tetris Design GuidelineにおけるSRSの内容を要約したものである。
@@ -19,47 +40,53 @@ def Rotate (directedMino:DirectedMino, move:MoveInt, mainBoard:List[int]) -> Uni
     Iミノの場合も同様だが，やや違いがある。詳しくはガイドラインを参照。
     """
 
-    # Iミノの回転入れ
-    if directedMino.mino is MINO.I:
-        offsets = OFFSETS_I[directedMino.direction][move]
-    # Iミノ以外のミノの回転入れ
-    else:
-        offsets = OFFSETS_EXCEPT_I[directedMino.direction][move]
+    rotated = RotatePosition(directedMino.mino, directedMino.direction, directedMino.pos[0], directedMino.pos[1], move, mainBoard)
+    if rotated is None:
+        return None
+    newDirection, newPos0, newPos1, kickIdx = rotated
+    rotatedMino = DirectedMino(
+        directedMino.mino,
+        newDirection,
+        (newPos0, newPos1)
+    )
+    rotatedMino.kickIdx = kickIdx
+    return rotatedMino
+
+# Rotateと同じ処理を，DirectedMinoを作らずに値だけで行う
+# 回転成功するならば(direction, pos0, pos1, 何番目のkickで成功したか)を，回転失敗するならばNoneを返す
+def RotatePosition (mino:MinoInt, direction:DirectionInt, pos0:int, pos1:int, move:MoveInt, mainBoard:List[int]) -> Union[None, Tuple[int, int, int, int]]:
+    newDirection, kicks = globalRotationTable[(mino * 4 + direction) * 2 + move - MOVE.R_ROT]
+    collisionRows = globalCollisionRows[mino][newDirection]
+    minPos1, maxPos1 = globalCollisionPos1Range[mino][newDirection]
 
     # SRSに従って上記の1~5を順番に実行する
-    for offset0, offset1 in offsets:
-        newDirectedMino = DirectedMino(
-            directedMino.mino,
-            GetNewDirection(directedMino.direction, move),
-            (directedMino.pos[0] + offset0, directedMino.pos[1] + offset1)
-        )
-        occupiedPositons = GetOccupiedPositions(newDirectedMino)
-        if isValidPlace(mainBoard, occupiedPositons):
-            return newDirectedMino
+    # IsValidPositionと同じ判定を，回転後の方角の表を引いたまま行う
+    for offset0, offset1, kickIdx in kicks:
+        newPos1 = pos1 + offset1
+        if not minPos1 <= newPos1 <= maxPos1:
+            continue
+        colIdx = pos0 + offset0 + COLLISION_POS0_OFFSET
+        if not 0 <= colIdx < BOARD_WIDTH + 2 * COLLISION_POS0_OFFSET:
+            continue
+        rows = collisionRows[colIdx]
+        if rows is None:
+            continue
+        for dy, mask in rows:
+            if mainBoard[newPos1 + dy] & mask:
+                break
+        else:
+            return newDirection, pos0 + offset0, newPos1, kickIdx
     
     # どれも失敗してしまった場合
     return None
 
-# 何番目の回転が成功したかを返す
-# どの回転も成功しない場合Noneを返す
-def GetRotateNum (directedMino:DirectedMino, move:MoveInt, mainBoard:List[int]) -> Union[None, int]:
-    # Iミノの回転入れ
-    if directedMino.mino is MINO.I:
-        offsets = OFFSETS_I[directedMino.direction][move]
-    # Iミノ以外のミノの回転入れ
-    else:
-        offsets = OFFSETS_EXCEPT_I[directedMino.direction][move]
-
-    # SRSに従って上記の1~5を順番に実行する
-    for i in range(len(offsets)):
-        newDirectedMino = DirectedMino(
-            directedMino.mino,
-            GetNewDirection(directedMino.direction, move),
-            (directedMino.pos[0] + offsets[i][0], directedMino.pos[1] + offsets[i][1])
-        )
-        occupiedPositons = GetOccupiedPositions(newDirectedMino)
-        if isValidPlace(mainBoard, occupiedPositons):
-            return i
-    
-    # どれも失敗してしまった場合
-    return None
\ No newline at end of file
+# 1回の置き場所の探索の中で，同じ状態からの回転の結果を覚えておいて使い回すRotate
+# memoは探索ごとに新しく作った辞書を渡す（盤面が変わると結果も変わるため）
+# 返り値のDirectedMinoは使い回されるので，変更しないこと
+def RotateWithMemo (directedMino:DirectedMino, move:MoveInt, mainBoard:List[int], memo:dict) -> Union[None, DirectedMino]:
+    key = (directedMino.mino, directedMino.direction, directedMino.pos, move)
+    if key in memo:
+        return memo[key]
+    rotatedMino = Rotate(directedMino, move, mainBoard)
+    memo[key] = rotatedMino
+    return rotatedMino
@@ -0,0 +1,46 @@
+import random
+from lib.classes import *
+from lib.helpers.check import globalCollisionRows, COLLISION_POS0_OFFSET
+
+# Zobrist hashで使う乱数表
+# 盤面は行ごとに，その行の値に対して乱数を割り当ててXORをとる
+# 空の行は0にしておき，空の行が何行あってもハッシュに影響しないようにする
+# プロセスが違っても同じ値になるようにseedを固定する
+ZOBRIST_SEED = 0
+zobristRandom = random.Random(ZOBRIST_SEED)
+ZOBRIST_ROWS = [[0] + [zobristRandom.getrandbits(64) for _ in range((1 << BOARD_WIDTH) - 1)] for _ in range(BOARD_HEIGHT)]
+ZOBRIST_HOLD = [zobristRandom.getrandbits(64) for _ in range(MINO.NONE + 1)]
+ZOBRIST_QUEUE = [zobristRandom.getrandbits(64) for _ in range(FOLLOWING_MINOS_COUNT + 3)]
+
+# mainBoard全体のハッシュを計算する
+def HashMainBoard(mainBoard:List[int]) -> int:
+    boardHash = 0
+    for rowIdx in range(BOARD_HEIGHT):
+        boardHash ^= ZOBRIST_ROWS[rowIdx][mainBoard[rowIdx]]
+    return boardHash
+
+# directedMinoを埋め込む前の盤面のハッシュから，埋め込んだ後の盤面のハッシュを計算する
+# joinedMainBoardはdirectedMinoを埋め込んだ後の盤面で，ミノが占領する行だけを更新する
+def HashJoinedMainBoard(boardHash:int, joinedMainBoard:List[int], directedMino:DirectedMino) -> int:
+    pos0, pos1 = directedMino.pos
+    for dy, mask in globalCollisionRows[directedMino.mino][directedMino.direction][pos0 + COLLISION_POS0_OFFSET]:
+        row = joinedMainBoard[pos1 + dy]
+        boardHash ^= ZOBRIST_ROWS[pos1 + dy][row ^ mask] ^ ZOBRIST_ROWS[pos1 + dy][row]
+    return boardHash
+
+# ラインを消去した後の盤面のハッシュを，実際に盤面を作らずに計算する
+def HashClearedMainBoard(joinedMainBoard:List[int]) -> int:
+    boardHash = 0
+    newRowIdx = BOARD_HEIGHT - 1
+    for rowIdx in range(BOARD_HEIGHT - 1, -1, -1):
+        row = joinedMainBoard[rowIdx]
+        if row == 0b1111111111:
+            continue
+        boardHash ^= ZOBRIST_ROWS[newRowIdx][row]
+        newRowIdx -= 1
+    return boardHash
+
+# 盤面のハッシュに，holdしているミノとネクストを何個消費したかを加えたハッシュを返す
+# 同じ探索の中では，消費したネクストの数がわかれば現在のミノとネクストも決まる
+def HashSearchState(boardHash:int, holdMino:MinoInt, consumedMinoCount:int) -> int:
+    return boardHash ^ ZOBRIST_HOLD[holdMino] ^ ZOBRIST_QUEUE[consumedMinoCount]
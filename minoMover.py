@@ -51,15 +51,8 @@ def GetMovedDirectedMino (move:MoveInt, directedMino:DirectedMino, mainBoard:Lis
     else:
         Error("Invalid move from GetMovedDirectedMinoPos")
 
-# moveListとdirectedMinoを受け取って、その通りに入力を行う
-# moveList = [downが入っていないfirstHalfMove] + [downの連続列] + [secondHalfMove(downが入るうるが、長押しはしない)]の形のみに対応している
-# directedMinoをmoveListに従って動かした結果の移動先のdirectedMinoを返す
-# 置きミスしたときは、Noneを返す
-# todo: より一般的なmoveListに対しても動くようにする
-def InputMove (moveList:List[MoveInt], directedMino:DirectedMino, mainBoard:List[int]) -> Union[DirectedMino, None]:
-    nextDirectedMino = directedMino
-
-    # moveList = [firstHalfMove] + [downの連続列] + [secondHalfMove]に分割する
+# moveList = [downが入っていないfirstHalfMove] + [downの連続列] + [secondHalfMove]に分割して，(firstHalfMove, downの個数, secondHalfMove)を返す
+def SplitMoveList (moveList:List[MoveInt]) -> Tuple[List[MoveInt], int, List[MoveInt]]:
     if MOVE.DOWN in moveList:
         downStartIdx = 0
         while True:
@@ -80,6 +73,39 @@ def InputMove (moveList:List[MoveInt], directedMino:DirectedMino, mainBoard:List
         firstHalfMove = moveList
         downCount = 0
         secondHalfMove = []
+    return firstHalfMove, downCount, secondHalfMove
+
+# InputMoveで入力したときに，directedMinoがどこに移動するかを返す
+# downの連続列を長押しするときは，置ける場所まで落ちるものとする
+# 途中で動かせない操作がある時はNoneを返す
+# 探索で求めた経路が，InputMoveで入力できるかを確かめるのに使う
+def GetInputMoveResult (path:PathInt, directedMino:DirectedMino, mainBoard:List[int]) -> Union[DirectedMino, None]:
+    firstHalfMove, downCount, secondHalfMove = SplitMoveList(ExpandPath(path))
+    nextDirectedMino = directedMino
+    for move in firstHalfMove:
+        nextDirectedMino = GetMovedDirectedMino(move, nextDirectedMino, mainBoard)
+        if nextDirectedMino is None or not IsValidDirectedMino(mainBoard, nextDirectedMino):
+            return None
+    if downCount > 0:
+        # 長押しする時は，置ける場所まで落ちる
+        downCount = min(downCount, Drop(mainBoard, nextDirectedMino))
+        nextDirectedMino = DirectedMino(nextDirectedMino.mino, nextDirectedMino.direction, (nextDirectedMino.pos[0], nextDirectedMino.pos[1] + downCount))
+    for move in secondHalfMove:
+        nextDirectedMino = GetMovedDirectedMino(move, nextDirectedMino, mainBoard)
+        if nextDirectedMino is None or not IsValidDirectedMino(mainBoard, nextDirectedMino):
+            return None
+    return nextDirectedMino
+
+# moveListとdirectedMinoを受け取って、その通りに入力を行う
+# moveList = [downが入っていないfirstHalfMove] + [downの連続列] + [secondHalfMove(downが入るうるが、長押しはしない)]の形のみに対応している
+# downの連続列が置ける場所まで届かない時（途中まで落としてから回転などをする時）は，長押しせずにその回数だけ下を押す
+# directedMinoをmoveListに従って動かした結果の移動先のdirectedMinoを返す
+# 置きミスしたときは、Noneを返す
+# todo: より一般的なmoveListに対しても動くようにする
+# 探索で求めた経路(PathInt)はここでlistに戻して入力する
+def InputMove (path:PathInt, directedMino:DirectedMino, mainBoard:List[int]) -> Union[DirectedMino, None]:
+    nextDirectedMino = directedMino
+    firstHalfMove, downCount, secondHalfMove = SplitMoveList(ExpandPath(path))
 
     # firstHalfMoveを入力
     for move in firstHalfMove:
@@ -87,7 +113,12 @@ def InputMove (moveList:List[MoveInt], directedMino:DirectedMino, mainBoard:List
         nextDirectedMino = GetMovedDirectedMino(move, nextDirectedMino, mainBoard)
     
     # downを入力
-    if downCount > 0:
+    if 0 < downCount < Drop(mainBoard, nextDirectedMino):
+        # 途中まで落とす時は，1回ずつ押す
+        for _ in range(downCount):
+            Move(MOVE.DOWN)
+            nextDirectedMino = GetMovedDirectedMino(MOVE.DOWN, nextDirectedMino, mainBoard)
+    elif downCount > 0:
         HoldDown() # 目的の場所にたどり着くまで下を押し続ける
         nextDirectedMino = DirectedMino(nextDirectedMino.mino, nextDirectedMino.direction, (nextDirectedMino.pos[0], nextDirectedMino.pos[1] + downCount))
         count = 0
@@ -64,7 +64,7 @@ def ExistsTemplateOnMainBoard(template:Template, mainBoard:List[int]) -> bool:
     return True
 
 # 第2引数のtemplateに対応するMOVEが存在するならそれを返す。
-def GetTemplateMove(board:Board, template:Template) -> List[List[MoveInt]]:
+def GetTemplateMove(board:Board, template:Template) -> List[PathInt]:
 
     # boardsは(盤面、それに至るミノの動き)のリスト
     boards = [(board, [])]
@@ -85,7 +85,7 @@ def GetTemplateMove(board:Board, template:Template) -> List[List[MoveInt]]:
                     # もしHoldをしていたらその操作だけ行った後の盤面
                     # そうではないときは元の盤面
                     boardAfterHold = board
-                    if path[0] is MOVE.HOLD:
+                    if GetFirstMove(path) is MOVE.HOLD:
                         boardAfterHold = BoardAfterHold(board)
 
                     nextBoard = Board(
@@ -235,7 +235,7 @@ DT23 = Template([DirectedMino(MINO.L, DIRECTION.W, (3, 34)),
 DT3 = Template([DirectedMino(MINO.T, DIRECTION.S, (2, 37))],
                 [])
 
-def GetDTMove(board:Board) -> List[List[MoveInt]]:
+def GetDTMove(board:Board) -> List[PathInt]:
     move1 = GetTemplateMove(board, DT11)
     if move1:
         return move1
@@ -250,7 +250,7 @@ def GetDTMove(board:Board) -> List[List[MoveInt]]:
 
     return []
 
-def GetDT2Move(board:Board) -> List[List[MoveInt]]:
+def GetDT2Move(board:Board) -> List[PathInt]:
     move1 = GetTemplateMove(board, DT21)
     if move1:
         return move1
@@ -268,7 +268,7 @@ def GetDT2Move(board:Board) -> List[List[MoveInt]]:
 
     return []
 
-def GetDT3Move(board:Board) -> List[List[MoveInt]]:
+def GetDT3Move(board:Board) -> List[PathInt]:
     move = GetTemplateMove(board, DT3)
     return move
 
@@ -287,7 +287,7 @@ def GetGasshoTSDMove(board:Board):
     return GetTemplateMove(board, GasshoTSD1)
     
 ### Customize Template
-def GetCustomTemplateMove(board:Board) -> List[List[MoveInt]]:
+def GetCustomTemplateMove(board:Board) -> List[PathInt]:
 
     # DT　
     multipath = GetDTMove(board)
@@ -0,0 +1,214 @@
+from lib import *
+import decisionMaker
+import benchmark
+import minoMover
+import json
+
+# 置き場所の求め方の検証と速さの測定（チェスのperftと同じように，決まった盤面から決まった深さまでの数を数える）
+# benchmark.BENCHMARK_BOARDSのそれぞれから，ネクストの順番にミノを置いていき（holdも含む），深さごとに
+#   placements: GetNextMovesで見つけた置き場所の数の合計
+#   boards: 置いた後の盤面（holdのミノとネクストも含む）の種類の数
+# を数え，PERFT_EXPECTEDに記録した値と比べる
+# 同じ盤面からは1回だけ展開するので，placementsは違う盤面ごとの置き場所の数の合計になる
+# 置き場所の求め方を速くした時に，結果が変わっていないかを確かめるのと，1秒あたりに求められる置き場所の数を測るのに使う
+# 記録した値は置き場所の求め方自体が正しいことは保証しないので，completeでは，fullで見つかる置き場所を全て見つけているかも確かめる
+# また，どの置き場所の経路も，実機でminoMover.InputMoveで入力した時にその置き場所に置けるかを確かめる
+
+PERFT_DEPTH = 2
+
+# 記録した値 PERFT_EXPECTED[置き場所の求め方の名前][盤面の番号] = (深さごとのplacements, 深さごとのboards)
+# 置き場所の求め方を変えて結果が変わるのが正しい時は，--perftRecordで出力した値で置き換える
+PERFT_EXPECTED = {
+    "hardDrop": [
+        ([51, 1615], [51, 1615]),
+        ([51, 2890], [51, 2883]),
+        ([26, 1190], [26, 1088]),
+        ([68, 3468], [68, 2764]),
+        ([51, 2312], [51, 1627]),
+        ([51, 1615], [51, 1615]),
+        ([34, 1156], [34, 986]),
+    ],
+    "tSpin": [
+        ([51, 1615], [51, 1615]),
+        ([51, 2890], [51, 2883]),
+        ([26, 1235], [26, 1133]),
+        ([68, 3468], [68, 2764]),
+        ([51, 2316], [51, 1627]),
+        ([51, 1615], [51, 1615]),
+        ([34, 1156], [34, 986]),
+    ],
+    "quick": [
+        ([51, 1615], [51, 1615]),
+        ([51, 2890], [51, 2883]),
+        ([26, 1241], [26, 1139]),
+        ([68, 3468], [68, 2764]),
+        ([51, 2347], [51, 1627]),
+        ([51, 1615], [51, 1615]),
+        ([34, 1156], [34, 986]),
+    ],
+    "full": [
+        ([51, 1623], [51, 1623]),
+        ([51, 2901], [51, 2894]),
+        ([26, 1242], [26, 1139]),
+        ([73, 3977], [73, 3116]),
+        ([51, 2365], [51, 1627]),
+        ([51, 1621], [51, 1621]),
+        ([34, 1190], [34, 1000]),
+    ],
+    "complete": [
+        ([51, 1637], [51, 1637]),
+        ([51, 2925], [51, 2918]),
+        ([26, 1247], [26, 1144]),
+        ([76, 4277], [76, 3283]),
+        ([51, 2389], [51, 1627]),
+        ([51, 1636], [51, 1636]),
+        ([34, 1196], [34, 1001]),
+    ],
+}
+
+# boardでmino, pathを実行してラインを消去し，次のミノを出した盤面を返す（スコアなどは計算しない）
+def PlayPlacement (board:Board, mino:DirectedMino, path:PathInt) -> Board:
+    if GetFirstMove(path) is MOVE.HOLD:
+        board = BoardAfterHold(board)
+    joinedMainBoard, joinedTopRowIdx = JoinDirectedMinoToBoard(mino, board.mainBoard, board.topRowIdx)
+    newMainBoard, newTopRowIdx, _ = ClearLines(joinedMainBoard, joinedTopRowIdx)
+    return Board(
+        newMainBoard,
+        DirectedMino(
+            board.followingMinos[0],
+            FIRST_MINO_DIRECTION,
+            FIRST_MINO_POS
+        ),
+        board.followingMinos[1:] + [MINO.NONE],
+        board.holdMino,
+        True,
+        newTopRowIdx
+    )
+
+# 同じ盤面かどうかを判定するためのキー
+def GetPositionKey (board:Board) -> Tuple:
+    return (tuple(board.mainBoard), board.currentMino.mino, board.holdMino, tuple(board.followingMinos))
+
+# 同じ置き場所かどうかを判定するためのキー（holdしたかどうかと，ミノが占めるマス）
+def GetPlacementKey (mino:DirectedMino, path:PathInt) -> Tuple:
+    return (GetFirstMove(path) is MOVE.HOLD, tuple(sorted(GetOccupiedPositions(mino))))
+
+# possibleMovesに含まれない，fullで見つかる置き場所の数を返す
+def CountMissingFullPlacements (board:Board, possibleMoves:List[Tuple[DirectedMino, PathInt]]) -> int:
+    placementKeys = {GetPlacementKey(mino, path) for mino, path in possibleMoves}
+    fullPlacementKeys = {GetPlacementKey(mino, path) for mino, path in decisionMaker.GetNextMoves(board, None, MOVEGEN.FULL)}
+    return len(fullPlacementKeys - placementKeys)
+
+# possibleMovesのうち，minoMover.InputMoveで経路を入力した時にその置き場所に置けないものの数を返す
+def CountUninputtablePlacements (board:Board, possibleMoves:List[Tuple[DirectedMino, PathInt]]) -> int:
+    count = 0
+    for mino, path in possibleMoves:
+        inputBoard = board
+        if GetFirstMove(path) is MOVE.HOLD:
+            inputBoard = BoardAfterHold(board)
+            path = RemoveFirstMove(path)
+        inputMino = minoMover.GetInputMoveResult(path, inputBoard.currentMino, inputBoard.mainBoard)
+        if inputMino is None or sorted(GetOccupiedPositions(inputMino)) != sorted(GetOccupiedPositions(mino)):
+            count += 1
+    return count
+
+# boardからdepthの深さまで，置き場所の求め方policyで数える
+# (深さごとのplacements, 深さごとのboards, 置き場所を求めるのにかかった時間(s), 見つからなかったfullの置き場所の数, 入力できない置き場所の数)を返す
+# 見つからなかったfullの置き場所の数は，policyがcompleteの時だけ数える（それ以外の時は0）
+def Perft (board:Board, depth:int, policy:MoveGenInt) -> Tuple[List[int], List[int], float, int, int]:
+    assert depth <= FOLLOWING_MINOS_COUNT
+    placementCounts = []
+    boardCounts = []
+    moveGenTime = 0.0
+    missingFullPlacements = 0
+    uninputtablePlacements = 0
+    positions = {GetPositionKey(board): board}
+    for _ in range(depth):
+        nextPositions = {}
+        placementCount = 0
+        for position in positions.values():
+            moveGenTimer = Timer()
+            possibleMoves = decisionMaker.GetNextMoves(position, None, policy)
+            moveGenTime += moveGenTimer.Stop()
+            placementCount += len(possibleMoves)
+            if policy is MOVEGEN.COMPLETE:
+                missingFullPlacements += CountMissingFullPlacements(position, possibleMoves)
+            uninputtablePlacements += CountUninputtablePlacements(position, possibleMoves)
+            for mino, path in possibleMoves:
+                nextBoard = PlayPlacement(position, mino, path)
+                nextPositions.setdefault(GetPositionKey(nextBoard), nextBoard)
+        placementCounts.append(placementCount)
+        boardCounts.append(len(nextPositions))
+        positions = nextPositions
+    return placementCounts, boardCounts, moveGenTime, missingFullPlacements, uninputtablePlacements
+
+# 全ての盤面で，policyNamesのそれぞれの置き場所の求め方で数え，記録した値と比べた結果の辞書を返す
+# 置き場所を求める速さを測るために，数えている間は置き場所のキャッシュを使わない
+def RunPerft (depth:int=PERFT_DEPTH, policyNames:Union[List[str], None]=None) -> Dict:
+    if policyNames is None:
+        policyNames = MOVEGEN_NAMES
+    placementCacheSize = decisionMaker.PLACEMENT_CACHE_SIZE
+    decisionMaker.PLACEMENT_CACHE_SIZE = 0
+    results = {}
+    try:
+        for policyName in policyNames:
+            policy = MOVEGEN_NAMES.index(policyName)
+            counts = []
+            mismatches = []
+            missingFullPlacements = 0
+            uninputtablePlacements = 0
+            unverified = 0
+            totalPlacements = 0
+            totalTime = 0.0
+            for boardIdx, boardSetting in enumerate(benchmark.BENCHMARK_BOARDS):
+                placementCounts, boardCounts, moveGenTime, missingCount, uninputtableCount = Perft(benchmark.MakeBenchmarkBoard(*boardSetting), depth, policy)
+                counts.append((placementCounts, boardCounts))
+                totalPlacements += sum(placementCounts)
+                totalTime += moveGenTime
+                missingFullPlacements += missingCount
+                uninputtablePlacements += uninputtableCount
+
+                expected = PERFT_EXPECTED.get(policyName)
+                if expected is None or boardIdx >= len(expected) or len(expected[boardIdx][0]) < depth:
+                    unverified += 1
+                    continue
+                expectedPlacements, expectedBoards = expected[boardIdx]
+                if placementCounts != expectedPlacements[:depth] or boardCounts != expectedBoards[:depth]:
+                    mismatches.append({
+                        "board": boardIdx,
+                        "placements": placementCounts,
+                        "expectedPlacements": expectedPlacements[:depth],
+                        "boards": boardCounts,
+                        "expectedBoards": expectedBoards[:depth],
+                    })
+            results[policyName] = {
+                "counts": counts,
+                "mismatches": mismatches,
+                "missingFullPlacements": missingFullPlacements,
+                "uninputtablePlacements": uninputtablePlacements,
+                "unverified": unverified,
+                "placements": totalPlacements,
+                "seconds": totalTime,
+                "placementsPerSecond": totalPlacements / totalTime if totalTime > 0 else None,
+            }
+    finally:
+        decisionMaker.PLACEMENT_CACHE_SIZE = placementCacheSize
+    return results
+
+# perftを行い，置き場所の求め方ごとの結果を1行ずつJSONで出力する
+# recordがTrueのときは，PERFT_EXPECTEDとして記録するための値を最後に出力する
+# 記録した値と違う結果があった時や，completeでfullの置き場所が見つからなかった時，入力できない置き場所があった時はFalseを返す
+def PrintPerft (depth:int=PERFT_DEPTH, policyNames:Union[List[str], None]=None, record:bool=False) -> bool:
+    results = RunPerft(depth, policyNames)
+    for policyName, result in results.items():
+        print(json.dumps(dict(
+            {key: value for key, value in result.items() if key != "counts"},
+            moveGen=policyName,
+            depth=depth
+        )), flush=True)
+    if record:
+        print(json.dumps({policyName: result["counts"] for policyName, result in results.items()}), flush=True)
+    return all(
+        not result["mismatches"] and result["missingFullPlacements"] == 0 and result["uninputtablePlacements"] == 0
+        for result in results.values()
+    )
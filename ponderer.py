@@ -0,0 +1,161 @@
+from lib import *
+import decisionMaker
+import minoMover
+import concurrent.futures
+
+# 決めた手を入力している間に，置いた後の盤面での探索を先に行っておく
+# 置いた後に5番目のネクストに入ってくるミノはわからないので，7種1巡の法則から出てきうるミノごとに探索する
+
+# 先読み用のプロセスプール（Noneのときは先読みしない）
+ponderPool = None
+
+# 出てきた順番のミノの列（7種1巡の区切りを推測するために使う）
+minoSequence = []
+
+# 先読みしている盤面（5番目のネクストはMINO.NONE）と，出てきうるミノごとの探索のfuture
+ponderedBoard = None
+ponderFutures = {}
+
+# 先読み用のプロセスプールを作って，全てのプロセスを起動しておく
+def InitPonder (processCount:int):
+    global ponderPool
+    if processCount <= 0:
+        return
+    ponderPool = ProcessPoolExecutor(processCount, initializer=decisionMaker.InitSearchWorker)
+    list(ponderPool.map(decisionMaker.WarmUpSearchWorker, range(processCount)))
+
+# 新しいゲームが始まったときに呼ぶ
+def ResetPonder ():
+    global minoSequence
+    minoSequence = []
+    CancelPonder()
+
+# ネクストが変化したときに呼び，新しく出てきたミノを記録する
+# 空のholdにholdした時などは1回の変化でネクストが2つ以上進むので，前回のネクストと重なるようにずらして進んだ個数を求める
+# どれだけずらしても重ならない時（変化を見逃した時など）は，それまでの記録を捨てて今のネクストから記録し直す
+def ObserveFollowingMinos (followingMinos:List[MinoInt]):
+    global minoSequence
+    previousFollowingMinos = minoSequence[-len(followingMinos):]
+    if len(previousFollowingMinos) == len(followingMinos):
+        for shift in range(1, len(followingMinos)):
+            if previousFollowingMinos[shift:] == followingMinos[:-shift]:
+                minoSequence.extend(followingMinos[-shift:])
+                return
+    minoSequence = list(followingMinos)
+
+# 先読み用のプロセスで，盤面から複数手の探索を行う
+# 時間制限は，探索を始めた時から数える（他のミノの探索の後に待たされていても，1回の探索は時間制限内に終わる）
+def PonderWorker (args) -> Union[List[PathInt], None]:
+    config, timeLimit, board = args
+    decisionMaker.SetSearchConfig(config)
+    decisionMaker.SEARCH_TIME_LIMIT = timeLimit
+    try:
+        _, multiPath = decisionMaker.SearchMultiPath(board)
+    except AssertionError:
+        return None
+    return multiPath
+
+# boardにpathを実行したあとの盤面を返す（5番目のネクストはMINO.NONEにする）
+# holdによってネクストが2つ以上わからなくなる場合はNoneを返す
+def PredictBoard (board:Board, path:PathInt) -> Union[Board, None]:
+    if GetFirstMove(path) is MOVE.HOLD:
+        if board.holdMino is MINO.NONE:
+            return None
+        board = BoardAfterHold(board)
+        path = RemoveFirstMove(path)
+
+    # pathに従って1つずつ動かしていく
+    directedMino = board.currentMino
+    for move in ExpandPath(path):
+        directedMino = minoMover.MoveOneStep(move, directedMino, board)
+        if directedMino is None:
+            return None
+
+    joinedMainBoard = JoinDirectedMinoToBoardWithoutTopRowIdx(directedMino, board.mainBoard)
+    newMainBoard, _ = ClearLinesWithoutTopRowIdx(joinedMainBoard)
+
+    # 各列において，上から順に見ていって，一番最初にブロックがある部分のrowIdxを格納する
+    newTopRowIdx = [BOARD_HEIGHT for _ in range(BOARD_WIDTH)]
+    for rowIdx in range(BOARD_HEIGHT-1, -1, -1):
+        for colIdx in range(BOARD_WIDTH):
+            if newMainBoard[rowIdx] & (0b1000000000 >> colIdx) > 0:
+                newTopRowIdx[colIdx] = rowIdx
+    return Board(
+        newMainBoard,
+        DirectedMino(
+            board.followingMinos[0],
+            FIRST_MINO_DIRECTION,
+            FIRST_MINO_POS
+        ),
+        board.followingMinos[1:] + [MINO.NONE],
+        board.holdMino,
+        True,
+        newTopRowIdx,
+        board.score,
+        board.backToBack,
+        board.ren,
+        board.minoBagContents
+    )
+
+# 先読みを中止する
+def CancelPonder ():
+    global ponderedBoard, ponderFutures
+    for future in ponderFutures.values():
+        future.cancel()
+    ponderedBoard = None
+    ponderFutures = {}
+
+# boardでpathを実行し始めるときに呼び，実行後の盤面での探索を始める
+def StartPonder (board:Board, path:PathInt):
+    global ponderedBoard, ponderFutures
+    if ponderPool is None:
+        return
+    CancelPonder()
+
+    predictedBoard = PredictBoard(board, path)
+    if predictedBoard is None:
+        return
+
+    config = decisionMaker.GetSearchConfig()
+    for mino in GetNextMinoCandidates(minoSequence):
+        candidateBoard = Board(
+            predictedBoard.mainBoard,
+            predictedBoard.currentMino,
+            predictedBoard.followingMinos[:-1] + [mino],
+            predictedBoard.holdMino,
+            predictedBoard.canHold,
+            predictedBoard.topRowIdx,
+            predictedBoard.score,
+            predictedBoard.backToBack,
+            predictedBoard.ren,
+            predictedBoard.minoBagContents
+        )
+        ponderFutures[mino] = ponderPool.submit(PonderWorker, (config, decisionMaker.SEARCH_TIME_LIMIT, candidateBoard))
+    ponderedBoard = predictedBoard
+
+# 実際の盤面が先読みしていた盤面と一致する場合は，先読みの結果の経路のリストを返す
+# 一致しない場合や，deadline(time.time()の値)までに先読みの探索が終わらない場合はNoneを返す
+def TakePonderResult (board:Board, deadline:Union[float, None]=None) -> Union[List[PathInt], None]:
+    if ponderedBoard is None:
+        return None
+
+    future = None
+    if (
+        board.mainBoard == ponderedBoard.mainBoard and
+        board.currentMino.mino == ponderedBoard.currentMino.mino and
+        board.holdMino == ponderedBoard.holdMino and
+        board.followingMinos[:-1] == ponderedBoard.followingMinos[:-1]
+    ):
+        future = ponderFutures.pop(board.followingMinos[-1], None)
+    CancelPonder()
+
+    if future is None:
+        return None
+    if deadline is None:
+        return future.result()
+    try:
+        return future.result(timeout=max(0.0, deadline - time.time()))
+    except concurrent.futures.TimeoutError:
+        # 実行中の探索は止められないので，結果を使わずに捨てる
+        future.cancel()
+        return None
@@ -0,0 +1,186 @@
+from lib import *
+import decisionMaker
+import evaluator
+import openTemplateMaker
+import json
+
+# 意思決定のどこに時間がかかっているかを調べるための計測
+# EnableProfilerを呼んだ時だけ，計測する関数を計測用の関数で置き換えるので，呼ばない時は探索の速さに影響しない
+# 意思決定の最初にStartDecision，最後にFinishDecisionを呼ぶと，その間の計測結果を1行のJSONで出力する
+# 各区間の時間は，その中で呼ばれた他の区間の時間も含む（例えばmoveGenはrotateとdropを含む）
+# 探索を並列に行うときは，他のプロセスでの計測は含まれない
+# 計測用の関数の呼び出しにも時間がかかるので，rotateやdropのように何度も呼ばれる区間の時間は実際より長くなる
+
+# 計測する関数（区間の名前, モジュールかクラス, 関数の名前）
+# 同じ区間の名前の関数は，まとめて数える
+PROFILE_TARGETS = [
+    ("template", openTemplateMaker, "GetCustomTemplateMove"),
+    ("nextMoves", decisionMaker, "GetNextMoves"),
+    ("moveGen", decisionMaker, "GetPossibleMovesUncached"),
+    ("rotate", decisionMaker, "Rotate"),
+    ("rotate", decisionMaker, "RotateWithMemo"),
+    ("rotate", decisionMaker, "RotatePosition"),
+    ("drop", decisionMaker, "DropFromTop"),
+    ("drop", decisionMaker, "DropPosition"),
+    ("nextStates", decisionMaker.State, "NextStates"),
+    ("stateInit", decisionMaker.State, "__init__"),
+    ("transit", decisionMaker.State, "Transit"),
+    ("calcFeatures", evaluator, "CalcBoardFeatures"),
+    ("updateFeatures", evaluator, "UpdateBoardFeatures"),
+    ("evalBoard", evaluator, "EvalBoardFeatures"),
+    ("evalBoardBatch", evaluator, "EvalMainBoardBatch"),
+    ("evalPath", evaluator, "EvalPath"),
+]
+
+MINO_NAMES = {MINO.T: "T", MINO.O: "O", MINO.Z: "Z", MINO.I: "I", MINO.L: "L", MINO.S: "S", MINO.J: "J"}
+
+profileEnabled = False
+# 出力先のファイル（Noneのときは標準出力）
+profileOutputPath = None
+# Trueのときは，区間ごとに1回の呼び出しにかかった時間のヒストグラムも出力する
+profileHistogram = False
+
+# 置き換える前の関数 [(モジュールかクラス, 関数の名前, 元の関数)]
+originalFunctions = []
+
+# 区間ごとの[呼び出し回数, 時間(s)]
+phaseStats = {}
+# 区間ごとのヒストグラム
+# i番目の数は，1回の呼び出しにかかった時間が2^(i-1)μs以上2^iμs未満だった回数（0番目は1μs未満）
+phaseHistograms = {}
+# 計測結果以外の数
+# nodesGenerated: 生成した状態の数，nodesExpanded: 展開した状態の数，duplicates: 置換表で省いた状態の数，evaluations: 盤面の評価の数
+profileCounters = {}
+# ミノの種類ごとに見つけた置き場所の数（キャッシュから返した分は含まない）
+placementsByMino = {}
+
+decisionStartTime = None
+decisionPlacementCacheStats = None
+decisionCount = 0
+
+# 計測用の関数を作る
+# onReturnを与えた時は，(引数, 返り値)を受け取って計測結果以外の数を数える
+def MakeProfiledFunction (phase:str, func, onReturn=None):
+    stats = phaseStats.setdefault(phase, [0, 0.0])
+    histogram = phaseHistograms.setdefault(phase, [])
+    perfCounter = time.perf_counter
+
+    def ProfiledFunction (*args, **kwargs):
+        startTime = perfCounter()
+        result = func(*args, **kwargs)
+        elapsedTime = perfCounter() - startTime
+        stats[0] += 1
+        stats[1] += elapsedTime
+        if profileHistogram:
+            bucketIdx = int(elapsedTime * 1000000).bit_length()
+            while len(histogram) <= bucketIdx:
+                histogram.append(0)
+            histogram[bucketIdx] += 1
+        if onReturn is not None:
+            onReturn(args, result)
+        return result
+
+    ProfiledFunction.__wrapped__ = func
+    return ProfiledFunction
+
+def CountMoveGen (args, possibleMoves):
+    mino = MINO_NAMES[args[1].mino]
+    placementsByMino[mino] = placementsByMino.get(mino, 0) + len(possibleMoves)
+
+def CountStateInit (args, _):
+    profileCounters["nodesGenerated"] += 1
+    if args[0].isDuplicate:
+        profileCounters["duplicates"] += 1
+
+def CountNextStates (args, _):
+    profileCounters["nodesExpanded"] += 1
+
+def CountEvalBoard (args, _):
+    profileCounters["evaluations"] += 1
+
+def CountEvalBatch (args, _):
+    profileCounters["evaluations"] += len(args[0])
+
+PROFILE_COUNTERS = {
+    "moveGen": CountMoveGen,
+    "stateInit": CountStateInit,
+    "nextStates": CountNextStates,
+    "evalBoard": CountEvalBoard,
+    "evalBoardBatch": CountEvalBatch,
+}
+
+# 計測結果を空にする
+def ClearProfile ():
+    for stats in phaseStats.values():
+        stats[:] = [0, 0.0]
+    for histogram in phaseHistograms.values():
+        histogram.clear()
+    for name in ("nodesGenerated", "nodesExpanded", "duplicates", "evaluations"):
+        profileCounters[name] = 0
+    placementsByMino.clear()
+
+# 計測を始める
+# outputPathは出力先のファイル（Noneのときは標準出力），histogramがTrueのときはヒストグラムも出力する
+def EnableProfiler (outputPath:Union[str, None]=None, histogram:bool=False):
+    global profileEnabled, profileOutputPath, profileHistogram
+    profileOutputPath = outputPath
+    profileHistogram = histogram
+    if profileEnabled:
+        return
+    profileEnabled = True
+    ClearProfile()
+    for phase, owner, name in PROFILE_TARGETS:
+        func = getattr(owner, name)
+        originalFunctions.append((owner, name, func))
+        setattr(owner, name, MakeProfiledFunction(phase, func, PROFILE_COUNTERS.get(phase)))
+
+# 計測をやめて，元の関数に戻す
+def DisableProfiler ():
+    global profileEnabled
+    for owner, name, func in reversed(originalFunctions):
+        setattr(owner, name, func)
+    originalFunctions.clear()
+    profileEnabled = False
+
+# 意思決定を始める時に呼ぶ（計測していない時は何もしない）
+def StartDecision ():
+    global decisionStartTime, decisionPlacementCacheStats
+    if not profileEnabled:
+        return
+    ClearProfile()
+    decisionPlacementCacheStats = decisionMaker.GetPlacementCacheStats()
+    decisionStartTime = time.perf_counter()
+
+# 意思決定が終わった時に呼び，StartDecisionからの計測結果を1行のJSONで出力する（計測していない時は何もしない）
+def FinishDecision ():
+    global decisionStartTime, decisionCount
+    if not profileEnabled or decisionStartTime is None:
+        return
+    elapsedTime = time.perf_counter() - decisionStartTime
+    decisionStartTime = None
+    cacheStats = decisionMaker.GetPlacementCacheStats()
+
+    record = {
+        "decision": decisionCount,
+        "seconds": elapsedTime,
+        "phases": {
+            phase: {"calls": calls, "seconds": seconds}
+            for phase, (calls, seconds) in phaseStats.items() if calls > 0
+        },
+        "counters": dict(
+            profileCounters,
+            placementCacheHits=cacheStats["hits"] - decisionPlacementCacheStats["hits"],
+            placementCacheMisses=cacheStats["misses"] - decisionPlacementCacheStats["misses"],
+            placementsByMino=dict(placementsByMino)
+        ),
+    }
+    if profileHistogram:
+        record["histograms"] = {phase: list(histogram) for phase, histogram in phaseHistograms.items() if histogram}
+    decisionCount += 1
+
+    line = json.dumps(record)
+    if profileOutputPath is None:
+        print(line, flush=True)
+    else:
+        with open(profileOutputPath, "a") as f:
+            f.write(line + "\n")
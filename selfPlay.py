@@ -0,0 +1,146 @@
+from lib import *
+import decisionMaker
+import simulator
+import functools
+import json
+import math
+from concurrent.futures import as_completed
+
+# seedを固定したゲームを複数のプロセスで並列に行い，結果を集計する
+# 評価関数のパラメータやBEAM_WIDTHを変えた時に，強くなったかどうかを多くのゲームで確かめるために使う
+# 各ゲームはsimulator.PlayHeadlessGameで行い，ミノの生成はゲームごとにseedで初期化するので，
+# 同じ設定とseedであれば，どのプロセスで行っても，何個のプロセスで行っても同じゲームになる
+
+# 1ゲームで置くミノの数の上限
+SELF_PLAY_PIECE_COUNT = 500
+
+# 思考時間のヒストグラムの区切り(s)
+# i番目の数は，LATENCY_BUCKETS[i-1] <= 思考時間 < LATENCY_BUCKETS[i] となった回数で，最後の数はそれ以上の回数
+LATENCY_BUCKETS = [0.01, 0.02, 0.05, 0.1, 0.2, 0.5, 1.0, 2.0, 5.0, 10.0]
+
+# 思考時間のリストからヒストグラムを作る
+def MakeLatencyHistogram (decideTimes:List[float]) -> List[int]:
+    histogram = [0 for _ in range(len(LATENCY_BUCKETS) + 1)]
+    for decideTime in decideTimes:
+        bucketIdx = 0
+        while bucketIdx < len(LATENCY_BUCKETS) and decideTime >= LATENCY_BUCKETS[bucketIdx]:
+            bucketIdx += 1
+        histogram[bucketIdx] += 1
+    return histogram
+
+# 自己対戦用のプロセスで最初に1回だけ行う前計算
+# fork で親プロセスの探索用のプロセスプールを引き継いでも使わないようにする
+def InitSelfPlayWorker ():
+    decisionMaker.InitSearchWorker()
+    decisionMaker.searchPool = None
+    decisionMaker.searchProcessCount = 0
+
+# 探索の設定configのもとで，seedのゲームをpieceCount個置くか積みあがるまで行い，結果の辞書を返す
+# 探索の設定やキャッシュは前のゲームから引き継がないように，ゲームごとに初期化する
+def PlaySelfPlayGame (config, seed:int, pieceCount:int, reuseTree:bool) -> Dict:
+    decisionMaker.SetSearchConfig(config)
+    # Holdした後にBEAM_WIDTHが延ばされても，configのリストが変わらないようにcopyする
+    decisionMaker.BEAM_WIDTH = list(decisionMaker.BEAM_WIDTH)
+    decisionMaker.firstHold = True
+    decisionMaker.ClearPlacementCache()
+    decisionMaker.ClearRetainedTree()
+    simulator.SeedMinoGenerator(seed)
+
+    summary = simulator.PlayHeadlessGame(functools.partial(simulator.DecideMultiPath, reuseTree=reuseTree), pieceCount)
+    summary["seed"] = seed
+    summary["latencyHistogram"] = MakeLatencyHistogram(summary.pop("decideTimes"))
+    return summary
+
+# プロセスプールに渡すための関数
+def SelfPlayWorker (args) -> Dict:
+    return PlaySelfPlayGame(*args)
+
+# ゲームの結果のリストを集計する
+# 途中でエラーになったゲーム("error"を持つもの)は数だけ数えて，集計には含めない
+def AggregateSelfPlayResults (results:List[Dict]) -> Dict:
+    games = [result for result in results if "error" not in result]
+    aggregate = {
+        "games": len(games),
+        "errors": len(results) - len(games),
+        "toppedOut": sum(1 for game in games if game["toppedOut"]),
+        "decisions": sum(game["decisions"] for game in games),
+        "decideTime": sum(game["decideTime"] for game in games),
+        "latencyHistogram": [sum(counts) for counts in zip(*(game["latencyHistogram"] for game in games))],
+        "latencyBuckets": LATENCY_BUCKETS,
+    }
+    if not games:
+        return aggregate
+
+    for key in ("pieces", "score", "lines", "tSpins", "tSpinMinis", "tetrises", "maxHeight"):
+        values = [game[key] for game in games]
+        mean = sum(values) / len(values)
+        aggregate[key + "Mean"] = mean
+        # 平均の標準誤差（設定の間で差があるかどうかの目安）
+        if len(values) > 1:
+            variance = sum((value - mean) ** 2 for value in values) / (len(values) - 1)
+            aggregate[key + "StdErr"] = math.sqrt(variance / len(values))
+    aggregate["latencyMean"] = aggregate["decideTime"] / aggregate["decisions"] if aggregate["decisions"] > 0 else None
+    return aggregate
+
+# seedsのそれぞれでゲームを行い，集計した結果を返す
+# processCountが2以上のときはその数のプロセスで並列に行い，終わったゲームから順にonResult(ゲームの結果)を呼ぶ
+# 探索の設定は今のdecisionMakerの設定(GetSearchConfig)を使う
+def RunSelfPlay (
+    seeds:List[int],
+    pieceCount:int=SELF_PLAY_PIECE_COUNT,
+    processCount:int=1,
+    reuseTree:bool=False,
+    onResult:Union[Callable[[Dict], None], None]=None
+) -> Dict:
+    assert pieceCount > 0
+    config = decisionMaker.GetSearchConfig()
+    results = []
+
+    def Collect (gameIdx:int, result:Dict):
+        result["game"] = gameIdx
+        results.append(result)
+        if onResult is not None:
+            onResult(result)
+
+    if processCount <= 1:
+        for gameIdx, seed in enumerate(seeds):
+            try:
+                result = PlaySelfPlayGame(config, seed, pieceCount, reuseTree)
+            except Exception as e:
+                result = {"seed": seed, "error": repr(e)}
+            Collect(gameIdx, result)
+        # 最後のゲームの設定が残らないように戻す
+        decisionMaker.SetSearchConfig(config)
+        return AggregateSelfPlayResults(results)
+
+    pool = ProcessPoolExecutor(processCount, initializer=InitSelfPlayWorker)
+    try:
+        futures = {
+            pool.submit(SelfPlayWorker, (config, seed, pieceCount, reuseTree)): (gameIdx, seed)
+            for gameIdx, seed in enumerate(seeds)
+        }
+        for future in as_completed(futures):
+            gameIdx, seed = futures[future]
+            try:
+                result = future.result()
+            except Exception as e:
+                result = {"seed": seed, "error": repr(e)}
+            Collect(gameIdx, result)
+    finally:
+        # 中断された時は，まだ始まっていないゲームを取り消してから終了する
+        pool.shutdown(wait=True, cancel_futures=True)
+
+    return AggregateSelfPlayResults(results)
+
+# 自己対戦を行い，ゲームごとの結果と最後に集計した結果を1行ずつJSONで出力する（outputPathを与えた時はそのファイルの最後に追記する）
+def PrintSelfPlay (seeds:List[int], outputPath:Union[str, None]=None, **kwargs):
+    def WriteLine (record:Dict):
+        line = json.dumps(record)
+        if outputPath is None:
+            print(line, flush=True)
+        else:
+            with open(outputPath, "a") as f:
+                f.write(line + "\n")
+
+    aggregate = RunSelfPlay(seeds, onResult=WriteLine, **kwargs)
+    WriteLine({"aggregate": aggregate, "config": decisionMaker.DescribeSearchConfig()})
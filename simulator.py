@@ -1,30 +1,43 @@
 from lib import *
 import minoMover
 import evaluator
+import decisionMaker
+import openTemplateMaker
+import profiler
 
 DISPLAY_DELTA_TIME = 0.02
 
+# Trueのときは盤面を出力せず，待たずに進める（ベンチマークなどで使う）
+headless = False
+
 # 1つのnowDirectedMinoを置く動きを再現して出力
-# 返り値としておいた後のboardを返す
-def PutMino (moveList:List[MoveInt], board:Board) -> Tuple[Board, bool, bool]:
+# 返り値としておいた後のboardとTスピンの種類を返す
+def PutMino (path:PathInt, board:Board) -> Tuple[Board, SpinInt]:
 
-    if moveList[0] is MOVE.HOLD:
-        PrintBoardWithDirectedMino(board, board.currentMino, True)
-        moveList = moveList[1:]
+    if GetFirstMove(path) is MOVE.HOLD:
+        if not headless:
+            PrintBoardWithDirectedMino(board, board.currentMino, True)
+        path = RemoveFirstMove(path)
         board = BoardAfterHold(board)
 
-    # moveListに従って1つずつ動かしていく
+    # pathに従って1つずつ動かしていく
+    # 最後の回転で何番目のkickを使ったかも記録する
     nextDirectedMino = board.currentMino
-    for move in moveList:
-        PrintBoardWithDirectedMino(board, nextDirectedMino, True)
+    kickIdx = None
+    for move in ExpandPath(path):
+        if not headless:
+            PrintBoardWithDirectedMino(board, nextDirectedMino, True)
         nextDirectedMino = minoMover.MoveOneStep(move, nextDirectedMino, board)
-        time.sleep(DISPLAY_DELTA_TIME)
+        if move is MOVE.R_ROT or move is MOVE.L_ROT:
+            kickIdx = nextDirectedMino.kickIdx
+        if not headless:
+            time.sleep(DISPLAY_DELTA_TIME)
     
     # 最終状態の出力
-    PrintBoardWithDirectedMino(board, nextDirectedMino, True)
+    if not headless:
+        PrintBoardWithDirectedMino(board, nextDirectedMino, True)
 
-    isTspin = evaluator.IsTSpin(board.mainBoard, nextDirectedMino, moveList)
-    isTspinmini = isTspin and evaluator.IsTSpinMini(board.mainBoard, nextDirectedMino, moveList)
+    spin = evaluator.GetSpin(board.mainBoard, nextDirectedMino, path, kickIdx)
 
     joinedMainBoard, joinedTopRowIdx = JoinDirectedMinoToBoard(nextDirectedMino, board.mainBoard, board.topRowIdx)
     return Board(
@@ -38,11 +51,13 @@ def PutMino (moveList:List[MoveInt], board:Board) -> Tuple[Board, bool, bool]:
         board.backToBack,
         board.ren,
         board.minoBagContents
-    ), isTspin, isTspinmini
+    ), spin
 
 # ラインをクリアする
 def ClearLinesOfBoard(board:Board) -> Tuple[List[MinoInt], List[MinoInt], int]:
     newMainBoard, newTopRowIdx, clearedRowCount = ClearLines(board.mainBoard, board.topRowIdx)
+    if headless:
+        return newMainBoard, newTopRowIdx, clearedRowCount
     time.sleep(DISPLAY_DELTA_TIME)
     PrintBoard(Board(
         newMainBoard,
@@ -59,6 +74,105 @@ def ClearLinesOfBoard(board:Board) -> Tuple[List[MinoInt], List[MinoInt], int]:
     time.sleep(DISPLAY_DELTA_TIME)
     return newMainBoard, newTopRowIdx, clearedRowCount
 
+# boardでpathを実行してラインを消去し，スコアを計算してから次のミノを出した盤面を返す
+# 消去したラインの数とTスピンの種類も返す
+def PlayPath (board:Board, path:PathInt) -> Tuple[Board, int, SpinInt]:
+    board, spin = PutMino(path, board)
+
+    newMainBoard, newTopRowIdx, clearedRowCount = ClearLinesOfBoard(board)
+    scoreAdd, backToBack, ren = evaluator.Score(spin, clearedRowCount, board.backToBack, board.ren)
+
+    board = Board(
+        newMainBoard,
+        None,
+        board.followingMinos,
+        board.holdMino,
+        True,
+        newTopRowIdx,
+        board.score + scoreAdd,
+        backToBack,
+        ren,
+        board.minoBagContents
+    )
+    return AddFollowingMino(board), clearedRowCount, spin
+
+# simulatorで使う思考ルーチンで，続けて実行する経路のリストを返す
+# テンプレを狙える時は狙う
+# reuseTreeがTrueのときは，探索木を再利用して1手ずつ決める
+# deadline(time.time()の値)を与えた時は，それまでに探索できた一番深い結果から手を決める
+def DecideMultiPath (board:Board, reuseTree:bool=False, deadline:Union[float, None]=None) -> List[PathInt]:
+    profiler.StartDecision()
+    multipath = openTemplateMaker.GetCustomTemplateMove(board)
+    if not multipath:
+        if reuseTree:
+            multipath = decisionMaker.MultiDecideWithTreeReuse(board, deadline)[:1]
+        else:
+            multipath = decisionMaker.MultiDecide(board, deadline)
+    profiler.FinishDecision()
+    return multipath
+
+# 盤面を出力せず，待たずに1ゲームを進めて，ゲームの結果をまとめた辞書を返す
+# SeedMinoGeneratorでseedを固定していれば，同じdecideに対して毎回同じゲームになる
+# 空の盤面から始めて，pieceCount個置くか，積みあがってミノが出てこられなくなるまで続ける（pieceCountがNoneのときは積みあがるまで）
+# decideは盤面を受け取って，続けて実行する経路のリストを返す関数
+# decideTimesは1回ごとのdecideにかかった時間(s)のリスト
+def PlayHeadlessGame (decide:Callable[[Board], List[PathInt]], pieceCount:Union[int, None]=None) -> Dict:
+    global headless
+    wasHeadless = headless
+    headless = True
+
+    summary = {
+        "pieces": 0,
+        "score": 0,
+        "lines": 0,
+        "tSpins": 0,
+        "tSpinMinis": 0,
+        "tetrises": 0,
+        "maxHeight": 0,
+        "toppedOut": False,
+        "decisions": 0,
+        "decideTime": 0.0,
+        "decideTimes": [],
+    }
+    try:
+        board = NewGameBoard()
+        while pieceCount is None or summary["pieces"] < pieceCount:
+            # 積みあがってミノが出てこられない
+            if not IsValidDirectedMino(board.mainBoard, board.currentMino):
+                summary["toppedOut"] = True
+                break
+
+            decideTimer = Timer()
+            multiPath = decide(board)
+            summary["decideTimes"].append(decideTimer.Stop())
+
+            for path in multiPath:
+                if pieceCount is not None and summary["pieces"] >= pieceCount:
+                    break
+                board, clearedRowCount, spin = PlayPath(board, path)
+                summary["pieces"] += 1
+                summary["lines"] += clearedRowCount
+                if clearedRowCount > 0 and spin is SPIN.FULL:
+                    summary["tSpins"] += 1
+                elif clearedRowCount > 0 and spin is SPIN.MINI:
+                    summary["tSpinMinis"] += 1
+                elif clearedRowCount == 4:
+                    summary["tetrises"] += 1
+                summary["maxHeight"] = max(summary["maxHeight"], BOARD_HEIGHT - min(board.topRowIdx))
+    finally:
+        headless = wasHeadless
+
+    summary["score"] = board.score
+    summary["decisions"] = len(summary["decideTimes"])
+    summary["decideTime"] = sum(summary["decideTimes"])
+    return summary
+
+# 空の盤面にネクストを並べて，新しいゲームを始めた盤面を返す
+def NewGameBoard () -> Board:
+    board = Board()
+    board.followingMinos = [GenerateMino() for _ in range(FOLLOWING_MINOS_COUNT)]
+    return AddFollowingMino(board)
+
 # 次のミノを付け足し，押し出してネクストのミノをcurrentMinoにする
 # Holdができるようになったのでミノを2個付け足す場合がある。
 def AddFollowingMino (board:Board) -> Board:
@@ -83,6 +197,13 @@ def AddFollowingMino (board:Board) -> Board:
         board.minoBagContents
     )
 
+# ミノの生成に使う乱数（SeedMinoGeneratorでseedを固定すると，毎回同じ順番でミノが出てくる）
+minoRandom = random.Random()
+def SeedMinoGenerator (seed:int):
+    global bags
+    minoRandom.seed(seed)
+    bags = []
+
 # 7種1巡の法則に従ってランダムでミノを生成する
 bags = []
 def GenerateMino () -> MinoInt:
@@ -90,7 +211,7 @@ def GenerateMino () -> MinoInt:
 
     # bagsが空であれば，7種類のミノをランダムに生成してbagsに入れる
     if not bags:
-        bags = random.sample([
+        bags = minoRandom.sample([
             MINO.I,
             MINO.J,
             MINO.L,